@@ -1,17 +1,26 @@
+"""
+ASGI config for Yanzi Parcels.
+
+Serves the REST API over HTTP and real-time chat over WebSockets.
+"""
 import os
 
-from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
-from fastparcel.urls import websocket_urlpatterns
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Yanzi.settings')
+
+# Initialise Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanziparcels.settings')
+from core.middleware import JWTAuthMiddleware
+from core.routing import websocket_urlpatterns
 
 application = ProtocolTypeRouter({
-    "http":get_asgi_application(),
-    "websocket":AuthMiddlewareStack(
-        URLRouter(websocket_urlpatterns)
-    )
- 
-})
\ No newline at end of file
+    "http": django_asgi_app,
+    "websocket": AuthMiddlewareStack(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
@@ -45,6 +45,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.BusinessAPILogMiddleware',
+    'core.middleware.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Yanzi.wsgi.application'
+ASGI_APPLICATION = 'Yanzi.asgi.application'
 
 
 # Database
@@ -79,6 +83,97 @@ DATABASES = {
     }
 }
 
+# Optional read replica for heavy read-only endpoints (see core/routers.py)
+if os.environ.get('REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': os.environ.get('REPLICA_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ['REPLICA_DB_NAME'],
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+
+# Seconds a client stays on the primary after writing, to cover replication lag
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# URL names whose GET requests may read from the replica
+REPLICA_READ_VIEWS = [
+    'api_business_dashboard',
+    'api_business_analytics',
+    'api_hub_dashboard',
+    'api_hub_stats',
+    'api_courier_archived',
+    'api_public_tracking',
+    'api_courier_ratings',
+    'api_my_ratings',
+    'api_hub_ratings',
+    'api_customer_jobs_export',
+    'api_wallet_transactions_export',
+    'api_hub_transactions_export',
+    'api_bulk_order_export',
+]
+
+# Business API audit log, buffered in memory and written in batches by a background thread
+# (API_LOG_ASYNC); with it off, each row is written during its request
+API_LOG_ASYNC = os.environ.get('API_LOG_ASYNC', 'True').lower() == 'true'
+API_LOG_PATHS = ['/api/business/']  # Requests carrying an API key are logged wherever they go
+API_LOG_BUFFER_SIZE = int(os.environ.get('API_LOG_BUFFER_SIZE', 10000))
+API_LOG_FLUSH_SECONDS = int(os.environ.get('API_LOG_FLUSH_SECONDS', 5))
+API_LOG_FLUSH_BATCH = int(os.environ.get('API_LOG_FLUSH_BATCH', 500))
+
+# Seconds a business API key lookup is cached (entries are dropped when the account changes)
+API_KEY_CACHE_SECONDS = int(os.environ.get('API_KEY_CACHE_SECONDS', 300))
+
+# Business tier quotas: monthly usage counters live in the cache and are saved every USAGE_FLUSH_SECONDS
+# Without REDIS_URL the cache is per process, so each worker enforces the quota on its own count
+# With USAGE_FLUSH_ASYNC off, usage is saved during the request instead of by a background thread
+USAGE_FLUSH_ASYNC = os.environ.get('USAGE_FLUSH_ASYNC', 'True').lower() == 'true'
+USAGE_FLUSH_SECONDS = int(os.environ.get('USAGE_FLUSH_SECONDS', 10))
+USAGE_CACHE_SECONDS = int(os.environ.get('USAGE_CACHE_SECONDS', 300))
+
+# Reference-data endpoints (categories, vehicle types, ...): server cache lifetime and client max-age
+REFERENCE_CACHE_SECONDS = int(os.environ.get('REFERENCE_CACHE_SECONDS', 3600))
+REFERENCE_MAX_AGE = int(os.environ.get('REFERENCE_MAX_AGE', 300))
+
+# Threads per process writing resized, EXIF-free copies of uploaded photos
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+
+# Cache and channel layer
+# Redis is shared by all workers; without it each process keeps its own in-memory copy
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+
+# Token-bucket throttling per URL name: a steady `rate` with room for `burst` requests at once.
+# Clients are identified by a known API key, access token user or IP; buckets are shared through Redis when available.
+THROTTLE_BUDGETS = {
+    'api_courier_location': {'rate': '12/min', 'burst': 6},
+    'api_public_tracking': {'rate': '30/min', 'burst': 10},
+    'api_validate_referral': {'rate': '10/min', 'burst': 5},
+}
+THROTTLE_SHARED = bool(REDIS_URL)
+# Reverse proxies (IPs or CIDR ranges, comma separated in the env) whose X-Forwarded-For is believed when
+# identifying clients by IP. Leave empty when clients connect directly, otherwise anyone could pick their IP;
+# set it behind a load balancer, or every anonymous client shares the proxy's bucket.
+THROTTLE_TRUSTED_PROXIES = [proxy.strip() for proxy in os.environ.get('THROTTLE_TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,6 +200,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files (user uploads)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# Media URLs in API responses are signed and stay valid for between one and two of these windows
+MEDIA_URL_SECONDS = int(os.environ.get('MEDIA_URL_SECONDS', 3600))
+
+# How authorized media downloads are sent: 'accel' for nginx X-Accel-Redirect to MEDIA_ACCEL_PREFIX
+# (an internal location aliasing MEDIA_ROOT), 'sendfile' for X-Sendfile, or '' to stream from Django
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Chunked pickup/delivery photo uploads are assembled here until finalized
+PHOTO_UPLOAD_DIR = os.environ.get('PHOTO_UPLOAD_DIR', os.path.join(MEDIA_ROOT, 'partial'))
+PHOTO_UPLOAD_MAX_BYTES = int(os.environ.get('PHOTO_UPLOAD_MAX_BYTES', 25 * 1024 * 1024))
+
+# Uploads are stored once per distinct content; see core.storage and the collect_media command
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.DedupFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
 
 
 # =============================================================================
@@ -112,7 +224,8 @@ MEDIA_URL = '/media/'
 # =============================================================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ProfileJWTAuthentication',
+        'core.authentication.BusinessAPIKeyAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -165,3 +278,10 @@ GOOGLE_MAPS_API_KEY = GOOGLE_MAP_API_KEY  # Alias
 PAYPAL_MODE = os.environ.get('PAYPAL_MODE', 'sandbox')
 PAYPAL_CLIENT_ID = os.environ.get('PAYPAL_CLIENT_ID', 'Af8gMF1YL8g-SyYdyaQGyW_IwzPyTdOjnZjkmXB8qwhgSmItVLZ7beKoltcPIdBdF4dbVq-gVUy05pdY')
 PAYPAL_CLIENT_SECRET = os.environ.get('PAYPAL_CLIENT_SECRET', 'EITj72I0l1RZzYVc-CZK2m-3jvLQuzKFFv4bH8Dmhxx8xjnQ5WmpxNJnZoE48RcRvF-rGURX9__A1Lgv')
+
+# Courier payouts: 'paypal', or 'fake' to record payouts locally without sending money
+PAYOUT_BACKEND = os.environ.get('PAYOUT_BACKEND', 'paypal')
+PAYOUT_CURRENCY = os.environ.get('PAYOUT_CURRENCY', 'USD')
+# Couriers per provider request (PayPal accepts up to 15,000) and requests sent at once
+PAYOUT_CHUNK_SIZE = int(os.environ.get('PAYOUT_CHUNK_SIZE', 1000))
+PAYOUT_WORKERS = int(os.environ.get('PAYOUT_WORKERS', 4))
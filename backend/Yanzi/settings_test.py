@@ -0,0 +1,17 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=Yanzi.settings_test
+"""
+from Yanzi.settings import *  # noqa: F401,F403
+from Yanzi.settings import BASE_DIR, DATABASES
+
+# A second SQLite database standing in for a replica (core/tests/test_routers.py)
+DATABASES['test_replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'test_replica.sqlite3',
+}
+
+# Write API logs and quota usage during the request, so nothing is left to flush after the test database is gone
+API_LOG_ASYNC = False
+USAGE_FLUSH_ASYNC = False
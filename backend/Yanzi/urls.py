@@ -6,7 +6,8 @@ The frontend is a separate React application.
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.api.media import MediaView
 
 urlpatterns = [
     # Django Admin
@@ -14,8 +15,7 @@ urlpatterns = [
     
     # REST API endpoints
     path('api/', include('core.api.urls')),
-]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Uploaded files, through the signed URLs the API hands out (sent by the web server when MEDIA_SERVE_MODE is set)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:name>", MediaView.as_view(), name='media'),
+]
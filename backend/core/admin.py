@@ -1,63 +1,29 @@
-import random
-from string import ascii_uppercase
 from django.contrib import admin,messages
-from django.conf import settings
-from paypalrestsdk import configure, Payout
+from django.db.models import Q, Sum
 
 
 from core.models import *
-
-configure({
-    "mode": settings.PAYPAL_MODE,
-    "client_id": settings.PAYPAL_CLIENT_ID,
-    "client_secret": settings.PAYPAL_CLIENT_SECRET,
-})
+from core.utils import payouts
 
 def payout_to_courier(modeladmin, request, queryset):
-    payout_items = []
-    transaction_querysets = []
-
-    # Step 1 - Get all the valid couriers in queryset
-    for courier in queryset:
-        if courier.paypal_email:
-            courier_in_transactions = Transaction.objects.filter(
-                job__courier=courier,  # Use job__courier instead of job_courier
-                status=Transaction.IN_STATUS
-            )
-            if courier_in_transactions:
-                transaction_querysets.append(courier_in_transactions)
-                balance = sum(i.amount for i in courier_in_transactions)
-                payout_items.append({
-                    "recipient_type": "EMAIL",  # Corrected the typo in "recipient_type"
-                    "amount": {
-                        "value": "{:.2f}".format(balance * 0.8),
-                        "currency": "USD"
-                    },
-                    "receiver": courier.paypal_email,
-                    "note": "Thank you",
-                    "sender_item_id": str(courier.id)  # Corrected the syntax for string formatting
-                })
-
-    # Step 2 - Send payout batch + email to receivers
-    sender_batch_id = ''.join(random.choice(ascii_uppercase) for i in range(12))
-    payout = Payout({
-        "sender_batch_header": {
-            "sender_batch_id": sender_batch_id,
-            "email_subject": "You have a payment"
-        },
-        "items": payout_items
-    })
-
-    # Step 3 - Update transactions status to "OUT" if success
-    try:
-        if payout.create():
-            for t in transaction_querysets:
-                t.update(status=Transaction.OUT_STATUS)
-                messages.success(request, "payout[%s] created successfully" % payout.batch_header.payout)
-        else:
-            messages.error(request, payout.error)
-    except Exception as e:
-        messages.error(request, str(e))
+    # Step 1 - Claim the couriers' unpaid transactions and total them per courier
+    batch = payouts.create_batch(queryset.values_list('id', flat=True), created_by=request.user)
+    if batch is None:
+        messages.warning(request, "No unpaid transactions for the selected couriers")
+        return
+
+    # Step 2 - Send the payouts in provider-sized chunks; sent transactions are marked "OUT"
+    report_payout(request, batch, payouts.send_batch(batch))
+
+
+def report_payout(request, batch, status):
+    if status == CourierPayoutBatch.STATUS_COMPLETED:
+        messages.success(request, "payout[%s] sent %s to %d couriers" % (batch.id, batch.total_amount, batch.courier_count))
+    elif status == CourierPayoutBatch.STATUS_PARTIAL:
+        messages.warning(request, "payout[%s] partially sent; retry it from Courier payout batches" % batch.id)
+    else:
+        error = batch.items.exclude(error='').values_list('error', flat=True).first()
+        messages.error(request, "payout[%s] failed: %s" % (batch.id, error))
 
 
 payout_to_courier.short_description = "Payout to couriers"
@@ -66,11 +32,42 @@ class CourierAdmin(admin.ModelAdmin):
     list_display =['user_full_name','paypal_email','balance']
     actions = [payout_to_courier]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').annotate(
+            unpaid_total=Sum('job__transaction__amount', filter=Q(job__transaction__status=Transaction.IN_STATUS))
+        )
+
     def user_full_name(self,obj):
         return obj.user.get_full_name()
     
     def balance(self, obj):
-        return round(sum(t.amount for t in Transaction.objects.filter(job__courier=obj, status=Transaction.IN_STATUS)) * 0.8, 2)
+        return round((obj.unpaid_total or 0) * 0.8, 2)
+
+
+def retry_payout(modeladmin, request, queryset):
+    for batch in queryset.exclude(status=CourierPayoutBatch.STATUS_COMPLETED):
+        report_payout(request, batch, payouts.send_batch(batch))
+
+retry_payout.short_description = "Send unsent payouts again"
+
+
+class CourierPayoutItemInline(admin.TabularInline):
+    model = CourierPayoutItem
+    fields = ['courier', 'paypal_email', 'amount', 'transaction_count', 'chunk', 'status', 'provider_batch_id', 'error']
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class CourierPayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'courier_count', 'total_amount', 'currency', 'created_by', 'created_at', 'completed_at']
+    list_filter = ['status']
+    readonly_fields = ['status', 'courier_count', 'total_amount', 'currency', 'created_by', 'created_at', 'completed_at']
+    inlines = [CourierPayoutItemInline]
+    actions = [retry_payout]
 
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['stripe_payment_intent_id', 'courier_paypal_email', 'customer', 'courier_job', 'amount', 'status', 'created_at']
@@ -94,4 +91,5 @@ admin.site.register(Courier,CourierAdmin)
 admin.site.register(Category)
 admin.site.register(Job)
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(CourierPayoutBatch, CourierPayoutBatchAdmin)
  
\ No newline at end of file
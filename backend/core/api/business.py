@@ -1,6 +1,4 @@
 """B2B Business Portal API Views"""
-import csv
-import io
 from decimal import Decimal
 from datetime import timedelta
 
@@ -8,22 +6,25 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Max, Q
 
 from core.models import (
-    BusinessAccount, BulkOrder, BulkDeliveryItem, BusinessCredit,
+    BusinessAccount, BulkOrder, BulkDeliveryItem, BulkUpload, BusinessCredit,
     BusinessCreditTransaction, BusinessInvoice, BusinessAPILog,
     Job, Category, Courier
 )
 from core.serializers import (
     BusinessAccountSerializer, BusinessAccountCreateSerializer,
-    BulkOrderSerializer, BulkOrderCreateSerializer, BulkDeliveryItemSerializer,
+    BulkOrderSerializer, BulkOrderCreateSerializer, BulkDeliveryItemSerializer, BulkUploadSerializer,
     BusinessCreditSerializer, BusinessCreditTransactionSerializer,
     BusinessInvoiceSerializer, BusinessAPILogSerializer
 )
-from core.utils.pricing import calculate_price
+from core.utils import bulk_import, invoices, quotas
+from core.utils.exports import export_queryset, export_response
+from core.utils.ledger import BUSINESS_CREDIT
 
 
 class BusinessAccountViewSet(viewsets.ModelViewSet):
@@ -69,6 +70,15 @@ class BusinessAccountViewSet(viewsets.ModelViewSet):
             'message': 'API key regenerated successfully'
         })
     
+    @action(detail=True, methods=['get'])
+    def usage(self, request, pk=None):
+        """Deliveries used against the tier's monthly quota"""
+        business = self.get_object()
+        if business.owner != request.user and not request.user.is_staff:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(quotas.usage(business))
+    
     @action(detail=True, methods=['get'])
     def dashboard(self, request, pk=None):
         """Get business dashboard metrics"""
@@ -76,15 +86,16 @@ class BusinessAccountViewSet(viewsets.ModelViewSet):
         if business.owner != request.user and not request.user.is_staff:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        month_start = timezone.now().replace(day=1)
-        month_deliveries = business.bulk_orders.filter(
-            created_at__gte=month_start,
-            status=BulkOrder.STATUS_COMPLETED
-        ).count()
-        
-        total_cost = business.bulk_orders.filter(
-            created_at__gte=month_start
-        ).aggregate(total=Sum('actual_cost'))['total'] or 0
+        month_start = timezone.localdate().replace(day=1)
+        totals = business.daily_stats.aggregate(
+            total_orders=Sum('orders'),
+            total_items=Sum('items'),
+            month_delivered_items=Sum('delivered_items', filter=Q(date__gte=month_start)),
+            # Deliveries are bulk orders; the month's count is those placed this month and completed
+            month_deliveries=Sum('completed_orders', filter=Q(date__gte=month_start)),
+            total_spent=Sum('actual_cost'),
+            month_spent=Sum('actual_cost', filter=Q(date__gte=month_start)),
+        )
         
         pending_orders = business.bulk_orders.filter(
             status__in=[BulkOrder.STATUS_PENDING, BulkOrder.STATUS_PROCESSING]
@@ -95,10 +106,12 @@ class BusinessAccountViewSet(viewsets.ModelViewSet):
         return Response({
             'business_name': business.business_name,
             'tier': business.get_tier_display(),
-            'total_deliveries': business.bulk_orders.count(),
-            'month_deliveries': month_deliveries,
-            'total_spent': float(total_cost),
-            'month_spent': float(total_cost),
+            'total_deliveries': totals['total_orders'] or 0,
+            'month_deliveries': totals['month_deliveries'] or 0,
+            'total_items': totals['total_items'] or 0,
+            'month_delivered_items': totals['month_delivered_items'] or 0,
+            'total_spent': float(totals['total_spent'] or 0),
+            'month_spent': float(totals['month_spent'] or 0),
             'pending_orders': pending_orders,
             'credit_balance': float(credit_balance),
             'discount_percentage': business.discount_percentage,
@@ -111,32 +124,23 @@ class BusinessAccountViewSet(viewsets.ModelViewSet):
         if business.owner != request.user and not request.user.is_staff:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        month_start = timezone.now().replace(day=1)
+        month_start = timezone.localdate().replace(day=1)
         
         # Monthly stats
-        orders = business.bulk_orders.filter(created_at__gte=month_start)
-        
-        total_items = BulkDeliveryItem.objects.filter(
-            bulk_order__business=business,
-            bulk_order__created_at__gte=month_start
-        ).aggregate(total=Sum('estimated_cost'))['total'] or 0
-        
-        completed_items = BulkDeliveryItem.objects.filter(
-            bulk_order__business=business,
-            bulk_order__created_at__gte=month_start,
-            status=BulkDeliveryItem.STATUS_DELIVERED
-        ).count()
+        totals = business.daily_stats.filter(date__gte=month_start).aggregate(
+            orders=Sum('orders'),
+            delivered_items=Sum('delivered_items'),
+            subtotal=Sum('billed_cost'),
+        )
         
-        # Cost breakdown
-        subtotal = orders.aggregate(total=Sum('estimated_cost'))['total'] or 0
-        discount = Decimal(str(float(subtotal) * business.discount_percentage / 100))
-        tax = (subtotal - discount) * Decimal('0.16')  # 16% VAT
-        total = subtotal - discount + tax
+        # Cost breakdown, billed the way the month's invoice will be
+        subtotal = totals['subtotal'] or Decimal('0')
+        discount, tax, total = invoices.charges(subtotal, business.discount_percentage)
         
         return Response({
             'period': f"{month_start.strftime('%B %Y')}",
-            'total_orders': orders.count(),
-            'total_items': completed_items,
+            'total_orders': totals['orders'] or 0,
+            'total_items': totals['delivered_items'] or 0,
             'cost_breakdown': {
                 'subtotal': float(subtotal),
                 'discount': float(discount),
@@ -144,22 +148,65 @@ class BusinessAccountViewSet(viewsets.ModelViewSet):
                 'total': float(total),
             },
             'top_routes': self._get_top_routes(business),
+            'top_areas': self._get_top_areas(business),
         })
     
     def _get_top_routes(self, business, limit=5):
-        """Get top delivery routes"""
-        items = BulkDeliveryItem.objects.filter(
-            bulk_order__business=business
-        ).values('delivery_address').annotate(
-            count=Count('id')
+        """Get top delivery addresses from the route rollups"""
+        routes = business.route_stats.order_by('-items')[:limit]
+        
+        return [
+            {'address': route.delivery_address, 'count': route.items}
+            for route in routes
+        ]
+    
+    def _get_top_areas(self, business, limit=5):
+        """Get top delivery areas from the area rollups"""
+        areas = business.area_stats.values('area_id').annotate(
+            area_name=Max('area_name'),
+            count=Sum('items')
         ).order_by('-count')[:limit]
         
         return [
-            {'address': item['delivery_address'], 'count': item['count']}
-            for item in items
+            {'area_id': area['area_id'], 'area_name': area['area_name'], 'count': area['count']}
+            for area in areas
         ]
 
 
+BULK_ITEM_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('customer_name', 'customer_name'),
+    ('customer_phone', 'customer_phone'),
+    ('customer_email', 'customer_email'),
+    ('delivery_address', 'delivery_address'),
+    ('delivery_lat', 'delivery_lat'),
+    ('delivery_lng', 'delivery_lng'),
+    ('item_name', 'item_name'),
+    ('weight_kg', 'weight_kg'),
+    ('size', 'size'),
+    ('status', 'status'),
+    ('estimated_cost', 'estimated_cost'),
+    ('actual_cost', 'actual_cost'),
+    ('job_id', 'job_id'),
+    ('created_at', 'created_at'),
+    ('assigned_at', 'assigned_at'),
+    ('completed_at', 'completed_at'),
+]
+
+
+INVOICE_ITEM_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('bulk_order_id', 'bulk_order_id'),
+    ('customer_name', 'customer_name'),
+    ('delivery_address', 'delivery_address'),
+    ('item_name', 'item_name'),
+    ('weight_kg', 'weight_kg'),
+    ('size', 'size'),
+    ('completed_at', 'completed_at'),
+    ('billed_cost', 'billed_cost'),
+]
+
+
 class BulkOrderViewSet(viewsets.ModelViewSet):
     """Bulk order management"""
     permission_classes = [IsAuthenticated]
@@ -181,6 +228,11 @@ class BulkOrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            quotas.check(business)
+        except quotas.QuotaExceeded as e:
+            return Response({'error': str(e), 'usage': e.usage}, status=status.HTTP_403_FORBIDDEN)
+        
         serializer = BulkOrderCreateSerializer(data=request.data)
         if serializer.is_valid():
             bulk_order = serializer.save(business=business, status=BulkOrder.STATUS_PENDING)
@@ -192,7 +244,7 @@ class BulkOrderViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def upload_csv(self, request):
-        """Upload and validate CSV file"""
+        """Accept a CSV file and ingest it in the background"""
         csv_file = request.FILES.get('csv_file')
         if not csv_file:
             return Response(
@@ -209,108 +261,76 @@ class BulkOrderViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            csv_file.seek(0)
-            reader = csv.DictReader(
-                io.StringIO(csv_file.read().decode('utf-8'))
-            )
-            
-            required_fields = [
-                'customer_name', 'customer_phone', 'delivery_address',
-                'item_name', 'weight_kg', 'size'
-            ]
-            
-            if not reader.fieldnames:
-                return Response(
-                    {'error': 'CSV file is empty'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            missing_fields = [f for f in required_fields if f not in reader.fieldnames]
-            if missing_fields:
-                return Response({
-                    'error': 'CSV missing required fields',
-                    'missing_fields': missing_fields,
-                    'required_fields': required_fields,
-                    'provided_fields': list(reader.fieldnames)
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Parse and create bulk order
-            order_name = request.data.get('order_name', 'Bulk Order')
-            bulk_order = BulkOrder.objects.create(
-                business=business,
-                order_name=order_name,
-                status=BulkOrder.STATUS_PROCESSING
+            quotas.check(business)
+        except quotas.QuotaExceeded as e:
+            return Response({'error': str(e), 'usage': e.usage}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            fieldnames = bulk_import.read_header(csv_file)
+        except UnicodeDecodeError:
+            return Response(
+                {'error': 'CSV file must be UTF-8 encoded'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            csv_file.seek(0)
-            rows = list(csv.DictReader(
-                io.StringIO(csv_file.read().decode('utf-8'))
-            ))
-            
-            total_cost = 0
-            item_count = 0
-            
-            for row in rows:
-                try:
-                    # Calculate cost
-                    weight = float(row.get('weight_kg', 1))
-                    size = row.get('size', 'small')
-                    
-                    price = calculate_price(
-                        distance=5,  # Default estimate
-                        item_size=size,
-                        vehicle_type='car'
-                    )
-                    
-                    # Apply business discount
-                    discount_factor = 1 - (business.discount_percentage / 100)
-                    price = price * discount_factor
-                    
-                    item = BulkDeliveryItem.objects.create(
-                        bulk_order=bulk_order,
-                        customer_name=row['customer_name'],
-                        customer_phone=row['customer_phone'],
-                        customer_email=row.get('customer_email', ''),
-                        pickup_address=business.business_address,
-                        pickup_phone=business.contact_phone,
-                        pickup_lat=Decimal(str(business.business_lat or 0)),
-                        pickup_lng=Decimal(str(business.business_lng or 0)),
-                        delivery_address=row['delivery_address'],
-                        delivery_phone=row['customer_phone'],
-                        delivery_lat=Decimal(row.get('delivery_lat', 0)),
-                        delivery_lng=Decimal(row.get('delivery_lng', 0)),
-                        item_name=row['item_name'],
-                        item_description=row.get('item_description', ''),
-                        weight_kg=Decimal(str(weight)),
-                        size=size,
-                        estimated_cost=Decimal(str(price)),
-                        special_instructions=row.get('special_instructions', '')
-                    )
-                    
-                    total_cost += float(price)
-                    item_count += 1
-                    
-                except Exception as e:
-                    print(f"Error processing row: {e}")
-                    continue
-            
-            bulk_order.total_items = item_count
-            bulk_order.estimated_cost = Decimal(str(total_cost))
-            bulk_order.status = BulkOrder.STATUS_PROCESSING
-            bulk_order.save()
-            
-            return Response({
-                'success': True,
-                'bulk_order': BulkOrderSerializer(bulk_order).data,
-                'items_created': item_count,
-                'estimated_total_cost': float(total_cost)
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
+        
+        if not fieldnames:
             return Response(
-                {'error': str(e)},
+                {'error': 'CSV file is empty'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        missing_fields = [f for f in bulk_import.REQUIRED_FIELDS if f not in fieldnames]
+        if missing_fields:
+            return Response({
+                'error': 'CSV missing required fields',
+                'missing_fields': missing_fields,
+                'required_fields': bulk_import.REQUIRED_FIELDS,
+                'provided_fields': fieldnames
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Rows are validated, priced and created by the background worker
+        with transaction.atomic():
+            bulk_order = BulkOrder.objects.create(
+                business=business,
+                order_name=request.data.get('order_name', 'Bulk Order'),
+                status=BulkOrder.STATUS_PROCESSING,
+                csv_file=csv_file
+            )
+            upload = BulkUpload.objects.create(bulk_order=bulk_order)
+            bulk_import.start(upload.id)
+        
+        return Response({
+            'success': True,
+            'bulk_order': BulkOrderSerializer(bulk_order).data,
+            'upload': BulkUploadSerializer(upload).data
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def upload_status(self, request, pk=None):
+        """Progress of the bulk order's CSV ingestion"""
+        bulk_order = self.get_object()
+        upload = get_object_or_404(BulkUpload, bulk_order=bulk_order)
+        return Response(BulkUploadSerializer(upload).data)
+    
+    @action(detail=True, methods=['get'])
+    def upload_errors(self, request, pk=None):
+        """Download the rows that could not be imported, with the reason for each"""
+        bulk_order = self.get_object()
+        upload = get_object_or_404(BulkUpload, bulk_order=bulk_order)
+        
+        header, rows = bulk_import.error_report(upload)
+        return export_response(request, header, rows, f'bulk-order-{bulk_order.id}-errors')
+    
+    @action(detail=True, methods=['get'])
+    def export_items(self, request, pk=None):
+        """Download every item in the bulk order as CSV or NDJSON"""
+        bulk_order = self.get_object()
+        return export_queryset(
+            request,
+            bulk_order.items.order_by('created_at'),
+            BULK_ITEM_EXPORT_COLUMNS,
+            f'bulk-order-{bulk_order.id}-items'
+        )
     
     @action(detail=True, methods=['post'])
     def assign_couriers(self, request, pk=None):
@@ -391,7 +411,6 @@ class BusinessCreditViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            from core.models import BusinessCredit
             return BusinessCredit.objects.all()
         return BusinessCredit.objects.filter(business__owner=user)
     
@@ -406,24 +425,18 @@ class BusinessCreditViewSet(viewsets.ReadOnlyModelViewSet):
         if amount <= 0:
             return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create transaction
-        transaction = BusinessCreditTransaction.objects.create(
-            credit_account=credit_account,
+        # Post to the credit ledger
+        credit_transaction = BUSINESS_CREDIT.credit(
+            credit_account.pk,
+            amount,
             transaction_type=BusinessCreditTransaction.TRANSACTION_PURCHASE,
-            amount=amount,
-            description=f'Credit purchase of KES {amount}',
-            balance_before=credit_account.balance,
-            balance_after=credit_account.balance + amount
+            description=f'Credit purchase of KES {amount}'
         )
         
-        credit_account.balance += amount
-        credit_account.total_purchased += amount
-        credit_account.save()
-        
         return Response({
             'message': 'Credits purchased successfully',
-            'new_balance': float(credit_account.balance),
-            'transaction': BusinessCreditTransactionSerializer(transaction).data
+            'new_balance': float(credit_transaction.balance_after),
+            'transaction': BusinessCreditTransactionSerializer(credit_transaction).data
         })
     
     @action(detail=True, methods=['get'])
@@ -463,3 +476,14 @@ class BusinessInvoiceViewSet(viewsets.ReadOnlyModelViewSet):
         invoice.save()
         
         return Response(BusinessInvoiceSerializer(invoice).data)
+    
+    @action(detail=True, methods=['get'])
+    def items(self, request, pk=None):
+        """Download the delivered items billed on the invoice as CSV or NDJSON"""
+        invoice = self.get_object()
+        return export_queryset(
+            request,
+            invoices.invoice_items(invoice).order_by('completed_at'),
+            INVOICE_ITEM_EXPORT_COLUMNS,
+            f'invoice-{invoice.invoice_number}-items'
+        )
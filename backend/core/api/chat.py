@@ -5,6 +5,8 @@ Includes real-time messaging, quick messages, and masked phone calling.
 import random
 import hashlib
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 
@@ -12,16 +14,30 @@ from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from core.models import Job, Message, QuickMessage, MaskedPhoneSession
+from core.models import ChatUnreadCount, Job, Message, QuickMessage, MaskedPhoneSession
 from core.serializers import (
     MessageSerializer,
     SendMessageSerializer,
     QuickMessageSerializer,
     ChatInfoSerializer,
 )
+from core.utils.chat import CHAT_STATUSES, broadcast, get_chat_job, get_sender_type, post_message
+from core.utils.reference_cache import cached_reference
 
 
-class ChatMessagesView(APIView):
+class ChatAccessMixin:
+    """Access rules shared by the chat views"""
+
+    def _get_job(self, request, job_id):
+        """Get job if user has access (customer or assigned courier)"""
+        return get_chat_job(request.user, job_id)
+
+    def _get_user_type(self, request):
+        """Determine if user is customer or courier"""
+        return get_sender_type(request.user)
+
+
+class ChatMessagesView(ChatAccessMixin, APIView):
     """Get chat history and send messages for a job"""
     permission_classes = [permissions.IsAuthenticated]
 
@@ -37,7 +53,8 @@ class ChatMessagesView(APIView):
             # Mark messages as read for the current user
             user_type = self._get_user_type(request)
             opposite_type = 'courier' if user_type == 'customer' else 'customer'
-            messages.filter(sender_type=opposite_type, is_read=False).update(is_read=True)
+            updated = messages.filter(sender_type=opposite_type, is_read=False).update(is_read=True)
+            ChatUnreadCount.clear(job.id, request.user.id, count=updated)
             
             serializer = MessageSerializer(messages, many=True)
             
@@ -69,87 +86,103 @@ class ChatMessagesView(APIView):
 
             user_type = self._get_user_type(request)
             
-            message = Message.objects.create(
-                job=job,
-                sender_type=user_type,
-                sender_user=request.user,
-                content=serializer.validated_data['content'],
+            # Saves, pushes to live chat sockets and notifies the other party
+            message = post_message(
+                job,
+                request.user,
+                user_type,
+                serializer.validated_data['content'],
                 is_quick_message=serializer.validated_data.get('is_quick_message', False),
             )
 
-            # Send push notification to the other party
-            self._send_notification(job, message, user_type)
-
             return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    def _get_job(self, request, job_id):
-        """Get job if user has access (customer or assigned courier)"""
-        try:
-            job = Job.objects.get(id=job_id)
-            
-            # Check if user is the customer
-            if hasattr(request.user, 'customer') and job.customer == request.user.customer:
-                return job
-            
-            # Check if user is the assigned courier
-            if hasattr(request.user, 'courier') and job.courier == request.user.courier:
-                return job
-            
-            return None
-        except Job.DoesNotExist:
-            return None
 
-    def _get_user_type(self, request):
-        """Determine if user is customer or courier"""
-        if hasattr(request.user, 'customer'):
-            return Message.SENDER_CUSTOMER
-        elif hasattr(request.user, 'courier'):
-            return Message.SENDER_COURIER
-        return None
-
-    def _send_notification(self, job, message, sender_type):
-        """Send push notification to the other party"""
-        try:
-            from firebase_admin import messaging
-            
-            # Determine recipient
-            if sender_type == Message.SENDER_CUSTOMER:
-                # Notify courier
-                if job.courier and job.courier.fcm_token:
-                    token = job.courier.fcm_token
-                    title = f"Message from {job.customer.user.get_full_name()}"
-                else:
-                    return
-            else:
-                # Notify customer - we'd need FCM token for customer too
-                # For now, skip customer notification
-                return
-
-            notification = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=message.content[:100],
-                ),
-                data={
-                    'type': 'chat_message',
-                    'job_id': str(job.id),
-                    'message_id': str(message.id),
-                },
-                token=token,
+class ChatSyncView(ChatAccessMixin, APIView):
+    """Incremental chat polling: messages after a cursor plus the unread count"""
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_MESSAGES = 200
+
+    def get(self, request, job_id):
+        """
+        Get messages newer than ?after=<message id> (all messages if omitted).
+        Returned messages from the other party are marked read unless ?mark_read=false.
+        """
+        job = self._get_job(request, job_id)
+        if not job:
+            return Response({'error': 'Job not found or access denied'}, status=status.HTTP_404_NOT_FOUND)
+
+        messages = Message.objects.filter(job=job)
+        after = request.query_params.get('after')
+        if after:
+            try:
+                cursor = Message.objects.filter(job=job, id=after).values('created_at', 'id').first()
+            except ValidationError:
+                cursor = None
+            if not cursor:
+                return Response({'error': 'Unknown cursor'}, status=status.HTTP_400_BAD_REQUEST)
+            messages = messages.filter(
+                Q(created_at__gt=cursor['created_at']) |
+                Q(created_at=cursor['created_at'], id__gt=cursor['id'])
             )
-            messaging.send(notification)
-        except Exception as e:
-            print(f"Failed to send chat notification: {e}")
+
+        new_messages = list(
+            messages.select_related('sender_user').order_by('created_at', 'id')[:self.MAX_MESSAGES + 1]
+        )
+        has_more = len(new_messages) > self.MAX_MESSAGES
+        new_messages = new_messages[:self.MAX_MESSAGES]
+
+        user_type = self._get_user_type(request)
+        opposite_type = 'courier' if user_type == 'customer' else 'customer'
+        if request.query_params.get('mark_read', 'true').lower() != 'false':
+            incoming = [m.id for m in new_messages if m.sender_type == opposite_type and not m.is_read]
+            if incoming:
+                updated = Message.objects.filter(id__in=incoming, is_read=False).update(is_read=True)
+                ChatUnreadCount.clear(job.id, request.user.id, count=updated)
+
+        unread_count = ChatUnreadCount.for_job(job.id, request.user.id)
+
+        return Response({
+            'messages': MessageSerializer(new_messages, many=True).data,
+            'cursor': str(new_messages[-1].id) if new_messages else after,
+            'has_more': has_more,
+            'unread_count': unread_count,
+            'job_status': job.status,
+            'can_chat': job.status in [Job.PICKING_STATUS, Job.DELIVERING_STATUS],
+        })
+
+
+class AllUnreadCountsView(APIView):
+    """Get unread message counts for all of the user's active chats"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        counts = dict(
+            ChatUnreadCount.objects.filter(
+                user=request.user,
+                count__gt=0,
+                job__status__in=CHAT_STATUSES
+            ).values_list('job_id', 'count')
+        )
+        return Response({
+            'unread_counts': {str(job_id): count for job_id, count in counts.items()},
+            'total': sum(counts.values()),
+        })
+
+
+def quick_message_user_type(request):
+    return 'customer' if hasattr(request.user, 'customer') else 'courier'
 
 
 class QuickMessagesView(APIView):
     """Get pre-defined quick messages"""
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_reference('quick_messages', vary=quick_message_user_type, private=True)
     def get(self, request):
-        user_type = 'customer' if hasattr(request.user, 'customer') else 'courier'
+        user_type = quick_message_user_type(request)
         
         messages = QuickMessage.objects.filter(
             is_active=True
@@ -169,19 +202,13 @@ class UnreadCountView(APIView):
         try:
             job = Job.objects.get(id=job_id)
             
-            # Determine user type and count unread from opposite party
-            if hasattr(request.user, 'customer') and job.customer == request.user.customer:
-                opposite_type = Message.SENDER_COURIER
-            elif hasattr(request.user, 'courier') and job.courier == request.user.courier:
-                opposite_type = Message.SENDER_CUSTOMER
-            else:
+            # Verify access
+            is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
+            is_courier = hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id
+            if not (is_customer or is_courier):
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
-            unread_count = Message.objects.filter(
-                job=job,
-                sender_type=opposite_type,
-                is_read=False
-            ).count()
+            unread_count = ChatUnreadCount.for_job(job.id, request.user.id)
 
             return Response({'unread_count': unread_count})
         except Job.DoesNotExist:
@@ -198,8 +225,8 @@ class MaskedPhoneView(APIView):
             job = Job.objects.get(id=job_id)
             
             # Verify access
-            is_customer = hasattr(request.user, 'customer') and job.customer == request.user.customer
-            is_courier = hasattr(request.user, 'courier') and job.courier == request.user.courier
+            is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
+            is_courier = hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id
             
             if not (is_customer or is_courier):
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
@@ -268,15 +295,14 @@ class ChatInfoView(APIView):
             job = Job.objects.get(id=job_id)
             
             # Verify access and determine user type
-            is_customer = hasattr(request.user, 'customer') and job.customer == request.user.customer
-            is_courier = hasattr(request.user, 'courier') and job.courier == request.user.courier
+            is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
+            is_courier = hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id
             
             if not (is_customer or is_courier):
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
             # Get other party info
             if is_customer:
-                opposite_type = Message.SENDER_COURIER
                 if job.courier:
                     other_name = job.courier.user.get_full_name()
                     other_avatar = None  # Couriers don't have avatars in current model
@@ -284,16 +310,11 @@ class ChatInfoView(APIView):
                     other_name = 'Courier (Not assigned)'
                     other_avatar = None
             else:
-                opposite_type = Message.SENDER_CUSTOMER
                 other_name = job.customer.user.get_full_name()
                 other_avatar = job.customer.avatar.url if job.customer.avatar else None
 
             # Get unread count
-            unread_count = Message.objects.filter(
-                job=job,
-                sender_type=opposite_type,
-                is_read=False
-            ).count()
+            unread_count = ChatUnreadCount.for_job(job.id, request.user.id)
 
             # Get last message
             last_message = Message.objects.filter(job=job).last()
@@ -330,19 +351,25 @@ class MarkMessagesReadView(APIView):
             job = Job.objects.get(id=job_id)
             
             # Verify access and determine opposite party
-            if hasattr(request.user, 'customer') and job.customer == request.user.customer:
+            if hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id:
                 opposite_type = Message.SENDER_COURIER
-            elif hasattr(request.user, 'courier') and job.courier == request.user.courier:
+            elif hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id:
                 opposite_type = Message.SENDER_CUSTOMER
             else:
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
 
             # Mark all messages from opposite party as read
-            updated = Message.objects.filter(
+            unread = Message.objects.filter(
                 job=job,
                 sender_type=opposite_type,
                 is_read=False
-            ).update(is_read=True)
+            )
+            message_ids = [str(message_id) for message_id in unread.values_list('id', flat=True)]
+            updated = unread.filter(id__in=message_ids).update(is_read=True)
+            ChatUnreadCount.clear(job.id, request.user.id, count=updated)
+
+            if message_ids:
+                broadcast(job.id, {'type': 'chat.read', 'message_ids': message_ids})
 
             return Response({'marked_read': updated})
         except Job.DoesNotExist:
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.conf import settings
 from django.utils import timezone
 from asgiref.sync import async_to_sync
@@ -8,7 +10,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from core.models import Courier, Job
+from core.models import BulkDeliveryItem, Courier, Job
 from core.serializers import (
     CourierProfileSerializer,
     JobListSerializer,
@@ -146,6 +148,61 @@ class CurrentJobView(APIView):
         return Response({'job': None})
 
 
+def confirm_pickup(job, photo):
+    """Attach the pickup photo and move the job on to delivering"""
+    job.pickup_photo = photo
+    job.pickedup_at = timezone.now()
+    job.status = Job.DELIVERING_STATUS
+    job.save()
+
+    # Notify via WebSocket
+    try:
+        layer = get_channel_layer()
+        async_to_sync(layer.group_send)(
+            f"job_{job.id}",
+            {
+                'type': 'job_update',
+                'job': {
+                    'status': job.get_status_display(),
+                    'pickup_photo': job.pickup_photo.url,
+                    'pickedup_at': str(job.pickedup_at)
+                }
+            }
+        )
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+
+
+def confirm_delivery(job, photo):
+    """Attach the delivery photo and complete the job"""
+    job.delivery_photo = photo
+    job.delivered_at = timezone.now()
+    job.status = Job.COMPLETED_STATUS
+    job.save()
+
+    # Close out the business order item, if this job came from one
+    bulk_item = BulkDeliveryItem.objects.filter(job=job).select_related('bulk_order').first()
+    if bulk_item:
+        bulk_item.mark_delivered(actual_cost=Decimal(str(job.price)))
+
+    # Notify via WebSocket
+    try:
+        layer = get_channel_layer()
+        async_to_sync(layer.group_send)(
+            f"job_{job.id}",
+            {
+                'type': 'job_update',
+                'job': {
+                    'status': job.get_status_display(),
+                    'delivery_photo': job.delivery_photo.url,
+                    'delivered_at': str(job.delivered_at)
+                }
+            }
+        )
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+
+
 class CurrentJobUpdateView(APIView):
     """Update current job status (pickup/delivery photos)"""
     permission_classes = [permissions.IsAuthenticated, IsCourier]
@@ -167,28 +224,7 @@ class CurrentJobUpdateView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                job.pickup_photo = request.FILES['pickup_photo']
-                job.pickedup_at = timezone.now()
-                job.status = Job.DELIVERING_STATUS
-                job.save()
-
-                # Notify via WebSocket
-                try:
-                    layer = get_channel_layer()
-                    async_to_sync(layer.group_send)(
-                        f"job_{job.id}",
-                        {
-                            'type': 'job_update',
-                            'job': {
-                                'status': job.get_status_display(),
-                                'pickup_photo': job.pickup_photo.url,
-                                'pickedup_at': str(job.pickedup_at)
-                            }
-                        }
-                    )
-                except Exception as e:
-                    print(f"WebSocket error: {e}")
-
+                confirm_pickup(job, request.FILES['pickup_photo'])
                 return Response({
                     'message': 'Pickup confirmed',
                     'job': JobDetailSerializer(job).data
@@ -202,28 +238,7 @@ class CurrentJobUpdateView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                job.delivery_photo = request.FILES['delivery_photo']
-                job.delivered_at = timezone.now()
-                job.status = Job.COMPLETED_STATUS
-                job.save()
-
-                # Notify via WebSocket
-                try:
-                    layer = get_channel_layer()
-                    async_to_sync(layer.group_send)(
-                        f"job_{job.id}",
-                        {
-                            'type': 'job_update',
-                            'job': {
-                                'status': job.get_status_display(),
-                                'delivery_photo': job.delivery_photo.url,
-                                'delivered_at': str(job.delivered_at)
-                            }
-                        }
-                    )
-                except Exception as e:
-                    print(f"WebSocket error: {e}")
-
+                confirm_delivery(job, request.FILES['delivery_photo'])
                 return Response({
                     'message': 'Delivery completed',
                     'job': JobDetailSerializer(job).data
@@ -11,7 +11,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 
 from firebase_admin import auth as firebase_auth
 
-from core.models import Customer, Job, Transaction, Category, Courier
+from core.models import Customer, Job, Transaction, Category, Courier, BusinessAccount
 from core.serializers import (
     CustomerProfileSerializer,
     JobListSerializer,
@@ -21,6 +21,9 @@ from core.serializers import (
     JobCreateStep3Serializer,
     CategorySerializer,
 )
+from core.utils import quotas
+from core.utils.reference_cache import cached_reference
+from core.utils.exports import export_queryset, month_bounds
 
 stripe.api_key = settings.STRIPE_API_SECRET_KEY
 
@@ -71,6 +74,7 @@ class CategoryListView(APIView):
     """List all categories - public endpoint"""
     permission_classes = [permissions.AllowAny]
 
+    @cached_reference('categories')
     def get(self, request):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
@@ -102,6 +106,51 @@ class CustomerJobListView(APIView):
         return Response(serializer.data)
 
 
+class CustomerJobExportView(APIView):
+    """Download jobs as CSV or NDJSON, the customer's own or all of them for staff"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    COLUMNS = [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('status', 'status'),
+        ('name', 'name'),
+        ('description', 'description'),
+        ('category', 'category__name'),
+        ('size', 'size'),
+        ('weight', 'weight'),
+        ('quantity', 'quantity'),
+        ('vehicle_type', 'vehicle_type'),
+        ('pickup_address', 'pickup_address'),
+        ('delivery_address', 'delivery_address'),
+        ('distance', 'distance'),
+        ('duration', 'duration'),
+        ('price', 'price'),
+        ('customer_id', 'customer_id'),
+        ('courier_id', 'courier_id'),
+        ('pickedup_at', 'pickedup_at'),
+        ('delivered_at', 'delivered_at'),
+    ]
+
+    def get(self, request):
+        if request.user.is_staff:
+            jobs = Job.objects.all()
+        elif hasattr(request.user, 'customer'):
+            jobs = Job.objects.filter(customer=request.user.customer)
+        else:
+            return Response({'error': 'Customer account required'}, status=status.HTTP_403_FORBIDDEN)
+
+        month = request.query_params.get('month')
+        if month:
+            try:
+                start, end = month_bounds(month)
+            except ValueError:
+                return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+            jobs = jobs.filter(created_at__gte=start, created_at__lt=end)
+
+        return export_queryset(request, jobs.order_by('created_at'), self.COLUMNS, f"jobs-{month or 'all'}")
+
+
 class CustomerJobDetailView(APIView):
     """Get job details"""
     permission_classes = [permissions.IsAuthenticated, IsCustomer]
@@ -363,6 +412,15 @@ class JobCreateView(APIView):
             creating_job.price = pricing['final_price']
             creating_job.save()
 
+            # Jobs placed by business owners count against their tier's monthly quota. It is
+            # taken right before the block that gives it back if anything below fails
+            business = BusinessAccount.objects.filter(owner=request.user).order_by('created_at').first()
+            if business:
+                try:
+                    quotas.consume(business)
+                except quotas.QuotaExceeded as e:
+                    return Response({'error': str(e), 'usage': e.usage}, status=status.HTTP_403_FORBIDDEN)
+
             # PAYMENT BYPASSED FOR DEVELOPMENT
             # TODO: Re-enable Stripe payment processing for production
             try:
@@ -461,6 +519,8 @@ class JobCreateView(APIView):
                 })
 
             except Exception as e:
+                if business:
+                    quotas.release(business, 1)
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'error': 'Invalid step'}, status=status.HTTP_400_BAD_REQUEST)
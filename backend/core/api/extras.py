@@ -20,6 +20,7 @@ from core.serializers import (
     InsuranceClaimSerializer, InsuranceClaimCreateSerializer,
     ReorderJobSerializer, JobDetailSerializer
 )
+from core.utils.reference_cache import cached_reference
 
 
 # =============================================================================
@@ -37,8 +38,8 @@ class CreateTrackingLinkView(APIView):
             job = get_object_or_404(Job, id=job_id)
             
             # Verify user owns this job
-            is_customer = hasattr(request.user, 'customer') and job.customer == request.user.customer
-            is_courier = hasattr(request.user, 'courier') and job.courier == request.user.courier
+            is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
+            is_courier = hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id
             
             if not (is_customer or is_courier):
                 return Response(
@@ -73,8 +74,8 @@ class TrackingLinkListView(APIView):
         job = get_object_or_404(Job, id=job_id)
         
         # Verify access
-        is_customer = hasattr(request.user, 'customer') and job.customer == request.user.customer
-        is_courier = hasattr(request.user, 'courier') and job.courier == request.user.courier
+        is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
+        is_courier = hasattr(request.user, 'courier') and job.courier_id == request.user.courier.id
         
         if not (is_customer or is_courier):
             return Response(
@@ -154,7 +155,7 @@ class ShareTrackingView(APIView):
         job = get_object_or_404(Job, id=job_id)
         
         # Verify access
-        is_customer = hasattr(request.user, 'customer') and job.customer == request.user.customer
+        is_customer = hasattr(request.user, 'customer') and job.customer_id == request.user.customer.id
         
         if not is_customer:
             return Response(
@@ -278,6 +279,7 @@ class InsuranceTiersView(APIView):
     """Get available insurance tiers"""
     permission_classes = [AllowAny]
 
+    @cached_reference('insurance_tiers', static=True)
     def get(self, request):
         tiers = [
             {
@@ -326,7 +328,7 @@ class JobInsuranceView(APIView):
         job = get_object_or_404(Job, id=job_id)
         
         # Verify ownership
-        if not hasattr(request.user, 'customer') or job.customer != request.user.customer:
+        if not hasattr(request.user, 'customer') or job.customer_id != request.user.customer.id:
             return Response(
                 {"error": "Only job owner can add insurance"},
                 status=status.HTTP_403_FORBIDDEN
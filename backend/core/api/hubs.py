@@ -5,8 +5,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Sum, Count
+import uuid
 from decimal import Decimal
+from datetime import timedelta
 
 from core.models import (
     Hub, HubDelivery, HubTransaction, HubRating, HubPayout, Job
@@ -14,8 +17,14 @@ from core.models import (
 from core.serializers import (
     HubSerializer, HubCreateSerializer, HubDeliverySerializer,
     HubDeliveryCreateSerializer, HubTransactionSerializer,
-    HubRatingSerializer, HubPayoutSerializer
+    HubRatingSerializer, HubPayoutSerializer, HubDailyStatsSerializer
 )
+from core.utils.codes import HUB_CODES, PICKUP_CODES
+from core.utils.exports import export_queryset, month_bounds
+from core.utils.ledger import HUB_EARNINGS
+
+
+MAX_STATS_DAYS = 365  # Longest history the stats endpoint returns
 
 
 class HubViewSet(viewsets.ModelViewSet):
@@ -37,15 +46,9 @@ class HubViewSet(viewsets.ModelViewSet):
         """Register new hub"""
         serializer = HubCreateSerializer(data=request.data)
         if serializer.is_valid():
-            # Generate hub code
-            import random
-            hub_code = f"HUB{random.randint(1000, 9999)}"
-            while Hub.objects.filter(hub_code=hub_code).exists():
-                hub_code = f"HUB{random.randint(1000, 9999)}"
-            
             hub = serializer.save(
                 partner=request.user,
-                hub_code=hub_code,
+                hub_code=HUB_CODES.next(),
                 status=Hub.STATUS_PENDING
             )
             
@@ -115,27 +118,21 @@ class HubViewSet(viewsets.ModelViewSet):
         if hub.partner != request.user and not request.user.is_staff:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Today's stats
-        today = timezone.now().date()
-        today_deliveries = hub.deliveries.filter(
-            arrived_at_hub__date=today
-        ).count()
+        # Today's and this month's stats from the daily rollups
+        today = timezone.localdate()
+        month_stats = hub.daily_stats.filter(date__gte=today.replace(day=1)).aggregate(
+            today_deliveries=Sum('arrivals', filter=Q(date=today)),
+            month_deliveries=Sum('arrivals'),
+            month_earnings=Sum('commissions'),
+        )
+        today_deliveries = month_stats['today_deliveries'] or 0
+        month_deliveries = month_stats['month_deliveries'] or 0
+        month_earnings = month_stats['month_earnings'] or 0
         
         pending_pickups = hub.deliveries.filter(
             status__in=[HubDelivery.STATUS_AT_HUB, HubDelivery.STATUS_READY_FOR_PICKUP]
         ).count()
         
-        # Month stats
-        month_start = timezone.now().replace(day=1)
-        month_deliveries = hub.deliveries.filter(
-            arrived_at_hub__gte=month_start
-        ).count()
-        
-        month_earnings = hub.transactions.filter(
-            created_at__gte=month_start,
-            transaction_type=HubTransaction.TRANSACTION_COMMISSION
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
         return Response({
             'hub_name': hub.hub_name,
             'hub_code': hub.hub_code,
@@ -151,6 +148,26 @@ class HubViewSet(viewsets.ModelViewSet):
             'average_rating': float(hub.average_rating),
         })
     
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Daily activity and occupancy history"""
+        hub = self.get_object()
+        if hub.partner != request.user and not request.user.is_staff:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be a whole number'}, status=status.HTTP_400_BAD_REQUEST)
+        days = min(max(days, 1), MAX_STATS_DAYS)
+        since = timezone.localdate() - timedelta(days=days - 1)
+        daily_stats = hub.daily_stats.filter(date__gte=since).order_by('date')
+        
+        return Response({
+            'hub_code': hub.hub_code,
+            'days': HubDailyStatsSerializer(daily_stats, many=True).data,
+        })
+    
     @action(detail=True, methods=['post'])
     def verify_pickup(self, request, pk=None):
         """Verify pickup code and release parcel"""
@@ -176,23 +193,21 @@ class HubViewSet(viewsets.ModelViewSet):
                 delivery.job.status = Job.COMPLETED_STATUS
                 delivery.job.save()
             
-            # Record commission if not paid
+            # Record commission if not paid, claiming it first so it is only paid once
             if not delivery.commission_paid and delivery.hub_commission > 0:
-                HubTransaction.objects.create(
-                    hub=hub,
-                    hub_delivery=delivery,
-                    transaction_type=HubTransaction.TRANSACTION_COMMISSION,
-                    amount=delivery.hub_commission,
-                    description=f'Commission for delivery {delivery.id}',
-                    balance_before=hub.total_earnings,
-                    balance_after=hub.total_earnings + delivery.hub_commission
-                )
-                
-                hub.total_earnings += delivery.hub_commission
-                hub.save()
-                
+                with transaction.atomic():
+                    claimed = HubDelivery.objects.filter(
+                        pk=delivery.pk, commission_paid=False
+                    ).update(commission_paid=True)
+                    if claimed:
+                        HUB_EARNINGS.credit(
+                            hub.pk,
+                            delivery.hub_commission,
+                            hub_delivery=delivery,
+                            transaction_type=HubTransaction.TRANSACTION_COMMISSION,
+                            description=f'Commission for delivery {delivery.id}'
+                        )
                 delivery.commission_paid = True
-                delivery.save()
             
             return Response({
                 'message': 'Pickup verified successfully',
@@ -222,10 +237,7 @@ class HubDeliveryViewSet(viewsets.ModelViewSet):
         """Create hub delivery"""
         serializer = HubDeliveryCreateSerializer(data=request.data)
         if serializer.is_valid():
-            delivery = serializer.save()
-            
-            # Generate pickup code
-            delivery.generate_pickup_code()
+            delivery = serializer.save(pickup_code=PICKUP_CODES.next())
             
             # Calculate commission
             job = delivery.job
@@ -285,11 +297,50 @@ class HubTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = HubTransactionSerializer
     
+    EXPORT_COLUMNS = [
+        ('id', 'id'),
+        ('hub_code', 'hub__hub_code'),
+        ('hub_name', 'hub__hub_name'),
+        ('transaction_type', 'transaction_type'),
+        ('amount', 'amount'),
+        ('balance_before', 'balance_before'),
+        ('balance_after', 'balance_after'),
+        ('description', 'description'),
+        ('hub_delivery_id', 'hub_delivery_id'),
+        ('mpesa_receipt', 'mpesa_receipt'),
+        ('created_at', 'created_at'),
+    ]
+    
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
             return HubTransaction.objects.all()
         return HubTransaction.objects.filter(hub__partner=user)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Download hub transactions as CSV or NDJSON, optionally for one hub and month"""
+        transactions = self.get_queryset()
+        
+        hub_id = request.query_params.get('hub_id')
+        if hub_id:
+            try:
+                transactions = transactions.filter(hub_id=uuid.UUID(hub_id))
+            except ValueError:
+                return Response({'error': 'hub_id must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        month = request.query_params.get('month')
+        if month:
+            try:
+                start, end = month_bounds(month)
+            except ValueError:
+                return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+            transactions = transactions.filter(created_at__gte=start, created_at__lt=end)
+        
+        return export_queryset(
+            request, transactions.order_by('created_at'), self.EXPORT_COLUMNS,
+            f"hub-transactions-{month or 'all'}"
+        )
 
 
 class HubRatingViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,26 @@
+"""
+Media downloads.
+Files are served to anyone holding a URL the API signed for them: the API
+only hands a file's URL to users allowed to see the object referencing it
+(the parties to a job, couriers offered an available job, viewers of a
+public tracking link, the partner of a hub, the owner of a business, staff),
+and the signature runs out after an hour or two. Unsigned, tampered or
+expired URLs get a 404, so names cannot be probed, and no database lookup
+is needed to serve a file.
+"""
+from django.http import Http404
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from core.utils.media import has_valid_signature, media_response
+
+
+class MediaView(APIView):
+    """Serve an uploaded file through a signed URL"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, name):
+        if not has_valid_signature(name, request.GET.get('expires'), request.GET.get('signature')):
+            raise Http404
+        return media_response(request, name)
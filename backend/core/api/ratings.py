@@ -7,17 +7,17 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Avg, Count
 
 from core.models import (
     Rating, ReferralCode, Referral, Wallet, WalletTransaction,
-    Job, Courier, Customer
+    Job, Courier, Customer, CourierRatingSummary
 )
 from core.serializers import (
     RatingSerializer, RatingCreateSerializer, CourierRatingResponseSerializer,
     ReferralCodeSerializer, ReferralSerializer, ApplyReferralCodeSerializer,
     WalletSerializer, WalletTransactionSerializer
 )
+from core.utils.exports import export_queryset, month_bounds
 
 
 # =============================================================================
@@ -126,36 +126,30 @@ class CourierRatingsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, courier_id):
-        courier = get_object_or_404(Courier, id=courier_id)
-        ratings = courier.ratings_received.filter(is_public=True).order_by('-created_at')
-        
-        # Get statistics
-        stats = ratings.aggregate(
-            avg_overall=Avg('overall_rating'),
-            avg_speed=Avg('speed_rating'),
-            avg_communication=Avg('communication_rating'),
-            avg_care=Avg('care_rating'),
-            total_count=Count('id')
+        courier = get_object_or_404(
+            Courier.objects.select_related('user', 'rating_summary'),
+            id=courier_id
         )
+        ratings = courier.ratings_received.filter(is_public=True).order_by('-created_at')
         
-        # Get rating distribution
-        distribution = {}
-        for i in range(1, 6):
-            distribution[str(i)] = ratings.filter(overall_rating=i).count()
+        # Statistics and distribution come from the running summary row
+        try:
+            summary = courier.rating_summary
+        except CourierRatingSummary.DoesNotExist:
+            summary = CourierRatingSummary(courier=courier)
+        averages = summary.averages()
         
         return Response({
             'courier_id': courier_id,
             'courier_name': courier.user.get_full_name(),
-            'overall_rating': round(stats['avg_overall'] or 0, 1),
-            'total_ratings': stats['total_count'],
-            'statistics': {
-                'overall': round(stats['avg_overall'] or 0, 1),
-                'speed': round(stats['avg_speed'] or 0, 1),
-                'communication': round(stats['avg_communication'] or 0, 1),
-                'care': round(stats['avg_care'] or 0, 1),
-            },
-            'distribution': distribution,
-            'recent_reviews': RatingSerializer(ratings[:10], many=True).data
+            'overall_rating': averages['overall'],
+            'total_ratings': summary.rating_count,
+            'statistics': averages,
+            'distribution': summary.distribution(),
+            'recent_reviews': RatingSerializer(
+                ratings.select_related('customer__user', 'courier__user', 'job')[:10],
+                many=True
+            ).data
         })
 
 
@@ -394,3 +388,34 @@ class WalletTransactionsView(APIView):
             'balance': wallet.balance,
             'transactions': serializer.data
         })
+
+
+class WalletTransactionExportView(APIView):
+    """Download the full wallet history as CSV or NDJSON"""
+    permission_classes = [IsAuthenticated]
+
+    COLUMNS = [
+        ('id', 'id'),
+        ('transaction_type', 'transaction_type'),
+        ('amount', 'amount'),
+        ('description', 'description'),
+        ('job_id', 'job_id'),
+        ('referral_id', 'referral_id'),
+        ('created_at', 'created_at'),
+    ]
+
+    def get(self, request):
+        transactions = WalletTransaction.objects.filter(wallet__user=request.user)
+
+        month = request.query_params.get('month')
+        if month:
+            try:
+                start, end = month_bounds(month)
+            except ValueError:
+                return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+            transactions = transactions.filter(created_at__gte=start, created_at__lt=end)
+
+        return export_queryset(
+            request, transactions.order_by('created_at'), self.COLUMNS,
+            f"wallet-transactions-{month or 'all'}"
+        )
@@ -7,9 +7,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-from core.models import ScheduledDelivery, Job, Category
+from core.models import ScheduledDelivery
 from core.serializers import (
     ScheduledDeliverySerializer, ScheduledDeliveryCreateSerializer
 )
@@ -68,32 +68,7 @@ class ScheduledDeliveryListView(APIView):
 
     def calculate_next_delivery(self, schedule):
         """Calculate the next delivery date based on frequency"""
-        now = timezone.now()
-        start = datetime.combine(schedule.start_date, schedule.preferred_time or datetime.min.time())
-        start = timezone.make_aware(start) if timezone.is_naive(start) else start
-        
-        if start > now:
-            return start
-        
-        if schedule.frequency == ScheduledDelivery.FREQUENCY_ONCE:
-            return start
-        
-        # Calculate next occurrence
-        delta_days = {
-            ScheduledDelivery.FREQUENCY_DAILY: 1,
-            ScheduledDelivery.FREQUENCY_WEEKLY: 7,
-            ScheduledDelivery.FREQUENCY_BIWEEKLY: 14,
-            ScheduledDelivery.FREQUENCY_MONTHLY: 30,
-        }
-        
-        days = delta_days.get(schedule.frequency, 7)
-        
-        # Find next occurrence after now
-        next_date = start
-        while next_date <= now:
-            next_date += timedelta(days=days)
-        
-        return next_date
+        return schedule.next_occurrence()
 
 
 class ScheduledDeliveryDetailView(APIView):
@@ -225,38 +200,11 @@ class ScheduledDeliveryTriggerView(APIView):
             )
         
         # Create a job from the schedule
-        job = Job.objects.create(
-            customer=schedule.customer,
-            name=schedule.name,
-            description=schedule.description,
-            category=schedule.category,
-            size=schedule.size,
-            weight=schedule.weight,
-            vehicle_type=schedule.vehicle_type,
-            pickup_address=schedule.pickup_address,
-            pick_lat=schedule.pickup_lat,
-            pick_up=schedule.pickup_lng,  # Note: field name is pick_up for lng
-            pickup_name=schedule.pickup_name,
-            pickup_phone=schedule.pickup_phone,
-            delivery_address=schedule.delivery_address,
-            delivery_lat=schedule.delivery_lat,
-            delivery_lng=schedule.delivery_lng,
-            delivery_name=schedule.delivery_name,
-            delivery_phone=schedule.delivery_phone,
-            status=Job.PROCESSING_STATUS
-        )
-        
-        # Update schedule stats
-        schedule.last_delivery_date = timezone.now()
-        schedule.deliveries_completed += 1
-        
-        # Check if max deliveries reached
-        if schedule.max_deliveries and schedule.deliveries_completed >= schedule.max_deliveries:
-            schedule.status = ScheduledDelivery.STATUS_COMPLETED
-        else:
-            # Calculate next delivery
-            schedule.next_delivery_date = ScheduledDeliveryListView().calculate_next_delivery(schedule)
+        job = schedule.build_job()
+        job.save()
         
+        # Update schedule stats and move to the next delivery
+        schedule.advance()
         schedule.save()
         
         # Update recipient if linked
@@ -0,0 +1,219 @@
+"""
+Resumable pickup/delivery photo uploads for couriers on poor connections.
+
+1. POST courier/jobs/current/<job_id>/photo-uploads/ with {size, filename, sha256}
+   starts an upload (or returns the unfinished one for the same photo).
+2. PATCH courier/photo-uploads/<id>/?offset=N with raw bytes as the body
+   appends a chunk. Bytes are streamed to disk as they arrive, and whatever
+   arrived before a dropped connection is kept. GET returns the offset to
+   resume from, so a retry only sends what is missing.
+3. POST courier/photo-uploads/<id>/finalize/ attaches the file to the job and
+   advances it, exactly like CurrentJobUpdateView.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from rest_framework import status, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.api.courier import IsCourier, confirm_delivery, confirm_pickup
+from core.models import Job, PhotoUpload
+from core.serializers import JobDetailSerializer, PhotoUploadCreateSerializer, PhotoUploadSerializer
+
+
+BLOCK_SIZE = 64 * 1024
+
+# Job status each kind of photo is taken in
+KIND_STATUSES = {
+    PhotoUpload.KIND_PICKUP: Job.PICKING_STATUS,
+    PhotoUpload.KIND_DELIVERY: Job.DELIVERING_STATUS,
+}
+
+
+class PhotoUploadStartView(APIView):
+    """Start a chunked pickup or delivery photo upload for the current job"""
+    permission_classes = [permissions.IsAuthenticated, IsCourier]
+
+    def post(self, request, job_id):
+        courier = request.user.courier
+        job = Job.objects.filter(
+            id=job_id, courier=courier, status__in=KIND_STATUSES.values()
+        ).only('id', 'status').first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = PhotoUploadCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        kind = PhotoUpload.KIND_PICKUP if job.status == Job.PICKING_STATUS else PhotoUpload.KIND_DELIVERY
+
+        # The app may have restarted mid-upload; carry on with the same file
+        existing = PhotoUpload.objects.filter(
+            job=job, courier=courier, kind=kind, size=data['size'], sha256=data['sha256'].lower(),
+            status=PhotoUpload.STATUS_UPLOADING,
+        ).order_by('-created_at').first()
+        if existing and os.path.exists(existing.path):
+            return Response(PhotoUploadSerializer(existing).data)
+
+        upload = PhotoUpload.objects.create(
+            job=job, courier=courier, kind=kind, filename=data['filename'],
+            size=data['size'], sha256=data['sha256'].lower(),
+        )
+        os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+        open(upload.path, 'wb').close()
+        return Response(PhotoUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class PhotoUploadView(APIView):
+    """Check progress of, or append a chunk to, a photo upload"""
+    permission_classes = [permissions.IsAuthenticated, IsCourier]
+
+    def get_upload(self, request, upload_id):
+        return PhotoUpload.objects.filter(id=upload_id, courier=request.user.courier).first()
+
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PhotoUploadSerializer(upload).data)
+
+    def patch(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload is None or upload.status != PhotoUpload.STATUS_UPLOADING:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            offset = int(request.query_params['offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'offset is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if offset != upload.received:
+            return Response(
+                {'error': 'Chunk does not start at the current offset', 'offset': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # Never touch request.data here: the parsers would buffer the whole body
+        stream = request.stream
+        if stream is None:
+            return Response(
+                {'error': 'Content-Length is required', 'offset': upload.received},
+                status=status.HTTP_411_LENGTH_REQUIRED
+            )
+
+        remaining = upload.size - offset
+        written = 0
+        too_large = False
+        with open(upload.path, 'r+b') as part:
+            part.seek(offset)
+            try:
+                while True:
+                    block = stream.read(min(BLOCK_SIZE, remaining - written + 1))
+                    if not block:
+                        break
+                    if written + len(block) > remaining:
+                        too_large = True
+                        break
+                    part.write(block)
+                    written += len(block)
+            except (OSError, UnreadablePostError):
+                pass  # Connection dropped; keep what arrived so the retry resumes after it
+
+        # Only one request may advance from a given offset
+        advanced = PhotoUpload.objects.filter(id=upload.id, received=offset).update(
+            received=offset + written, updated_at=timezone.now()
+        )
+        upload.refresh_from_db()
+        if too_large:
+            return Response(
+                {'error': 'Chunk runs past the declared size', 'offset': upload.received},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not advanced:
+            return Response(
+                {'error': 'Chunk does not start at the current offset', 'offset': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(PhotoUploadSerializer(upload).data)
+
+
+class PhotoUploadFinalizeView(APIView):
+    """Attach a fully uploaded photo to its job and advance the job"""
+    permission_classes = [permissions.IsAuthenticated, IsCourier]
+
+    def post(self, request, upload_id):
+        upload = PhotoUpload.objects.filter(id=upload_id, courier=request.user.courier).first()
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if upload.status == PhotoUpload.STATUS_COMPLETED:
+            # The response to an earlier finalize was lost; report the same outcome
+            return Response({
+                'message': 'Photo already attached',
+                'job': JobDetailSerializer(upload.job).data
+            })
+
+        if upload.received != upload.size:
+            return Response(
+                {'error': 'Upload is incomplete', 'offset': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if upload.sha256 and file_sha256(upload.path) != upload.sha256:
+            # Start over rather than attach a corrupted proof of delivery
+            PhotoUpload.objects.filter(id=upload.id).update(received=0, updated_at=timezone.now())
+            open(upload.path, 'wb').close()
+            return Response(
+                {'error': 'Checksum mismatch, upload the photo again', 'offset': 0},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # Of two finalize requests racing, only the one that completes the upload attaches the photo
+            claimed = PhotoUpload.objects.filter(id=upload.id, status=PhotoUpload.STATUS_UPLOADING).update(
+                status=PhotoUpload.STATUS_COMPLETED, updated_at=timezone.now()
+            )
+            job = Job.objects.filter(
+                id=upload.job_id, courier=upload.courier, status=KIND_STATUSES[upload.kind]
+            ).first() if claimed else None
+            if job is None:
+                transaction.set_rollback(True)
+            else:
+                with open(upload.path, 'rb') as part:
+                    photo = File(part, name=upload.filename)
+                    if upload.kind == PhotoUpload.KIND_PICKUP:
+                        confirm_pickup(job, photo)
+                        message = 'Pickup confirmed'
+                    else:
+                        confirm_delivery(job, photo)
+                        message = 'Delivery completed'
+
+        if not claimed:
+            return Response({
+                'message': 'Photo already attached',
+                'job': JobDetailSerializer(Job.objects.get(id=upload.job_id)).data
+            })
+        if job is None:
+            return Response(
+                {'error': 'Job is no longer waiting for this photo'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        os.remove(upload.path)
+        return Response({
+            'message': message,
+            'job': JobDetailSerializer(job).data
+        })
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -13,6 +13,7 @@ from core.api.customer import (
     CustomerPhoneUpdateView,
     CategoryListView,
     CustomerJobListView,
+    CustomerJobExportView,
     CustomerJobDetailView,
     CustomerJobCancelView,
     CourierLocationView,
@@ -30,8 +31,15 @@ from core.api.courier import (
     CourierArchivedJobsView,
     FCMTokenUpdateView,
 )
+from core.api.uploads import (
+    PhotoUploadStartView,
+    PhotoUploadView,
+    PhotoUploadFinalizeView,
+)
 from core.api.chat import (
     ChatMessagesView,
+    ChatSyncView,
+    AllUnreadCountsView,
     QuickMessagesView,
     UnreadCountView,
     MaskedPhoneView,
@@ -93,6 +101,7 @@ from core.api.ratings import (
     ShareReferralView,
     WalletView,
     WalletTransactionsView,
+    WalletTransactionExportView,
 )
 from core.api.extras import (
     CreateTrackingLinkView,
@@ -127,9 +136,10 @@ urlpatterns = [
     path('customer/profile/', CustomerProfileView.as_view(), name='api_customer_profile'),
     path('customer/phone/', CustomerPhoneUpdateView.as_view(), name='api_customer_phone'),
     path('customer/jobs/', CustomerJobListView.as_view(), name='api_customer_jobs'),
+    path('customer/jobs/export/', CustomerJobExportView.as_view(), name='api_customer_jobs_export'),
     path('customer/jobs/<uuid:job_id>/', CustomerJobDetailView.as_view(), name='api_customer_job_detail'),
     path('customer/jobs/<uuid:job_id>/cancel/', CustomerJobCancelView.as_view(), name='api_customer_job_cancel'),
-    path('customer/jobs/<uuid:job_id>/courier-location/', CourierLocationView.as_view(), name='api_courier_location'),
+    path('customer/jobs/<uuid:job_id>/courier-location/', CourierLocationView.as_view(), name='api_customer_courier_location'),
     path('customer/job/create/', JobCreateView.as_view(), name='api_job_create'),
     path('customer/payment-method/', PaymentMethodView.as_view(), name='api_payment_method'),
 
@@ -140,17 +150,22 @@ urlpatterns = [
     path('courier/jobs/available/<uuid:job_id>/', AvailableJobDetailView.as_view(), name='api_available_job'),
     path('courier/jobs/current/', CurrentJobView.as_view(), name='api_current_job'),
     path('courier/jobs/current/<uuid:job_id>/update/', CurrentJobUpdateView.as_view(), name='api_current_job_update'),
+    path('courier/jobs/current/<uuid:job_id>/photo-uploads/', PhotoUploadStartView.as_view(), name='api_photo_upload_start'),
+    path('courier/photo-uploads/<uuid:upload_id>/', PhotoUploadView.as_view(), name='api_photo_upload'),
+    path('courier/photo-uploads/<uuid:upload_id>/finalize/', PhotoUploadFinalizeView.as_view(), name='api_photo_upload_finalize'),
     path('courier/jobs/archived/', CourierArchivedJobsView.as_view(), name='api_courier_archived'),
     path('courier/location/', CourierLocationUpdateView.as_view(), name='api_courier_location'),
     path('courier/fcm-token/', FCMTokenUpdateView.as_view(), name='api_fcm_token'),
 
     # Chat endpoints (shared between customer and courier)
     path('chat/<uuid:job_id>/messages/', ChatMessagesView.as_view(), name='api_chat_messages'),
+    path('chat/<uuid:job_id>/sync/', ChatSyncView.as_view(), name='api_chat_sync'),
     path('chat/<uuid:job_id>/info/', ChatInfoView.as_view(), name='api_chat_info'),
     path('chat/<uuid:job_id>/unread/', UnreadCountView.as_view(), name='api_chat_unread'),
     path('chat/<uuid:job_id>/read/', MarkMessagesReadView.as_view(), name='api_chat_mark_read'),
     path('chat/<uuid:job_id>/call/', MaskedPhoneView.as_view(), name='api_chat_call'),
     path('chat/quick-messages/', QuickMessagesView.as_view(), name='api_quick_messages'),
+    path('chat/unread/', AllUnreadCountsView.as_view(), name='api_chat_unread_all'),
 
     # Vehicle endpoints
     path('vehicles/types/', VehicleTypesView.as_view(), name='api_vehicle_types'),
@@ -202,6 +217,7 @@ urlpatterns = [
     # Wallet endpoints
     path('wallet/', WalletView.as_view(), name='api_wallet'),
     path('wallet/transactions/', WalletTransactionsView.as_view(), name='api_wallet_transactions'),
+    path('wallet/transactions/export/', WalletTransactionExportView.as_view(), name='api_wallet_transactions_export'),
 
     # Tracking Links endpoints
     path('tracking/create/', CreateTrackingLinkView.as_view(), name='api_create_tracking'),
@@ -241,6 +257,9 @@ urlpatterns = [
     path('business/accounts/<uuid:pk>/analytics/', BusinessAccountViewSet.as_view({
         'get': 'analytics',
     }), name='api_business_analytics'),
+    path('business/accounts/<uuid:pk>/usage/', BusinessAccountViewSet.as_view({
+        'get': 'usage',
+    }), name='api_business_usage'),
     path('business/accounts/<uuid:pk>/regenerate-api-key/', BusinessAccountViewSet.as_view({
         'post': 'regenerate_api_key',
     }), name='api_regenerate_api_key'),
@@ -258,6 +277,15 @@ urlpatterns = [
     path('business/bulk-orders/upload-csv/', BulkOrderViewSet.as_view({
         'post': 'upload_csv',
     }), name='api_bulk_upload_csv'),
+    path('business/bulk-orders/<uuid:pk>/upload-status/', BulkOrderViewSet.as_view({
+        'get': 'upload_status',
+    }), name='api_bulk_upload_status'),
+    path('business/bulk-orders/<uuid:pk>/upload-errors/', BulkOrderViewSet.as_view({
+        'get': 'upload_errors',
+    }), name='api_bulk_upload_errors'),
+    path('business/bulk-orders/<uuid:pk>/export/', BulkOrderViewSet.as_view({
+        'get': 'export_items',
+    }), name='api_bulk_order_export'),
     path('business/bulk-orders/<uuid:pk>/assign-couriers/', BulkOrderViewSet.as_view({
         'post': 'assign_couriers',
     }), name='api_bulk_assign_couriers'),
@@ -286,6 +314,9 @@ urlpatterns = [
     path('business/invoices/<uuid:pk>/mark-paid/', BusinessInvoiceViewSet.as_view({
         'post': 'mark_paid',
     }), name='api_mark_invoice_paid'),
+    path('business/invoices/<uuid:pk>/items/', BusinessInvoiceViewSet.as_view({
+        'get': 'items',
+    }), name='api_business_invoice_items'),
 
     # Micro-Hub Network endpoints
     path('hubs/', HubViewSet.as_view({
@@ -304,6 +335,9 @@ urlpatterns = [
     path('hubs/<uuid:pk>/dashboard/', HubViewSet.as_view({
         'get': 'dashboard',
     }), name='api_hub_dashboard'),
+    path('hubs/<uuid:pk>/stats/', HubViewSet.as_view({
+        'get': 'stats',
+    }), name='api_hub_stats'),
     path('hubs/<uuid:pk>/verify-pickup/', HubViewSet.as_view({
         'post': 'verify_pickup',
     }), name='api_hub_verify_pickup'),
@@ -329,6 +363,9 @@ urlpatterns = [
     path('hub-transactions/', HubTransactionViewSet.as_view({
         'get': 'list',
     }), name='api_hub_transactions'),
+    path('hub-transactions/export/', HubTransactionViewSet.as_view({
+        'get': 'export',
+    }), name='api_hub_transactions_export'),
     path('hub-transactions/<uuid:pk>/', HubTransactionViewSet.as_view({
         'get': 'retrieve',
     }), name='api_hub_transaction_detail'),
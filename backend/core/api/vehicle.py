@@ -23,12 +23,14 @@ from core.utils.pricing import (
     calculate_price,
     calculate_estimated_time,
 )
+from core.utils.reference_cache import cached_reference
 
 
 class VehicleTypesView(APIView):
     """Get all available vehicle types with info"""
     permission_classes = [permissions.AllowAny]
 
+    @cached_reference('vehicle_types', static=True)
     def get(self, request):
         """List all vehicle types with descriptions"""
         vehicle_types = []
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from core import signals  # Connects the receivers
+        from core.utils import api_log, quotas
+
+        if settings.API_LOG_ASYNC:
+            api_log.buffer.start()
+        if settings.USAGE_FLUSH_ASYNC:
+            quotas.counter.start()
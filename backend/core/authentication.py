@@ -0,0 +1,166 @@
+"""
+DRF authentication backends for Yanzi Parcels
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import authentication, exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+API_KEY_HEADER = 'HTTP_X_API_KEY'
+
+# Role profiles hanging off User by one-to-one; loading them with the user
+# makes hasattr(user, 'customer') and user.courier free for the rest of the request
+PROFILE_RELATIONS = ('customer', 'courier')
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """JWT authentication that loads the user and its role profiles in one joined query"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        try:
+            user = self.user_model.objects.select_related(*PROFILE_RELATIONS).get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise exceptions.AuthenticationFailed(
+                    "The user's password has been changed.", code='password_changed'
+                )
+
+        return user
+
+
+# Cached in place of a business when a key matches nothing, so guessed keys cost no queries either
+UNKNOWN_KEY = 'unknown'
+
+# What authorization reads from the account and its owner; any other field loads on first access
+BUSINESS_AUTH_FIELDS = ('id', 'owner_id', 'is_active')
+OWNER_AUTH_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def api_key_cache_key(api_key):
+    """Cache key for an API key; the key itself never reaches the cache"""
+    return 'business_api_key:' + hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def api_owner_cache_key(user_id):
+    return f'business_api_owner:{user_id}'
+
+
+def is_known_api_key(api_key):
+    """Whether authentication has already matched the key to a business, from the cache alone"""
+    business = cache.get(api_key_cache_key(api_key))
+    return business is not None and business != UNKNOWN_KEY
+
+
+def invalidate_api_key(api_key):
+    if api_key:
+        cache.delete(api_key_cache_key(api_key))
+
+
+def invalidate_api_owner(user_id):
+    """Drop the cached owner of any business the user has; see core.signals"""
+    if user_id:
+        cache.delete(api_owner_cache_key(user_id))
+
+
+def restore(model, values):
+    """An instance of model holding only `values`, as if loaded with .only()"""
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class BusinessAPIKeyAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticate business integrations by the `X-API-Key` header.
+
+    What authorization needs is cached for API_KEY_CACHE_SECONDS, so repeated
+    calls cost no queries: the business's id, owner and is_active under a hash
+    of the key, and the owner's flags and profile ids under the owner. The
+    business and owner are rebuilt from those with the remaining fields
+    deferred. BusinessAccount drops its entry whenever it is saved or its key
+    changes, and saving the owner or one of its profiles drops the owner's.
+    On success request.user is the business owner and request.auth the
+    business.
+    """
+
+    def authenticate(self, request):
+        api_key = request.META.get(API_KEY_HEADER)
+        if not api_key:
+            return None
+
+        timeout = getattr(settings, 'API_KEY_CACHE_SECONDS', 300)
+        key = api_key_cache_key(api_key)
+        business = cache.get(key)
+        if business is None:
+            business = self.lookup(api_key)
+            cache.set(key, business, min(timeout, 30) if business == UNKNOWN_KEY else timeout)
+        if business == UNKNOWN_KEY:
+            raise exceptions.AuthenticationFailed('Invalid API key')
+
+        owner_key = api_owner_cache_key(business['owner_id'])
+        owner = cache.get(owner_key)
+        if owner is None:
+            owner = self.lookup_owner(business['owner_id'])
+            if owner is None:
+                cache.delete(key)
+                raise exceptions.AuthenticationFailed('Invalid API key')
+            cache.set(owner_key, owner, timeout)
+
+        if not business['is_active'] or not owner['user']['is_active']:
+            raise exceptions.AuthenticationFailed('Business account is inactive')
+        return self.build(business, owner)
+
+    def lookup(self, api_key):
+        from core.models import BusinessAccount
+        business = BusinessAccount.objects.filter(api_key=api_key).values(*BUSINESS_AUTH_FIELDS).first()
+        return UNKNOWN_KEY if business is None else business
+
+    def lookup_owner(self, user_id):
+        """The owner's auth fields and profile ids, in one joined query"""
+        from django.contrib.auth.models import User
+        row = User.objects.filter(pk=user_id).values(
+            *OWNER_AUTH_FIELDS, *[f'{relation}__id' for relation in PROFILE_RELATIONS]
+        ).first()
+        if row is None:
+            return None
+        owner = {'user': {field: row[field] for field in OWNER_AUTH_FIELDS}}
+        for relation in PROFILE_RELATIONS:
+            profile_id = row[f'{relation}__id']
+            owner[relation] = None if profile_id is None else {'id': profile_id, 'user_id': user_id}
+        return owner
+
+    def build(self, business, owner):
+        from django.contrib.auth.models import User
+        from core.models import BusinessAccount
+        user = restore(User, owner['user'])
+        for relation in PROFILE_RELATIONS:
+            related = getattr(User, relation).related
+            if owner[relation] is None:
+                related.set_cached_value(user, None)  # hasattr(user, relation) is False without a query
+            else:
+                setattr(user, relation, restore(related.related_model, owner[relation]))
+        account = restore(BusinessAccount, business)
+        account.owner = user
+        return (user, account)
+
+    def authenticate_header(self, request):
+        return 'X-API-Key'
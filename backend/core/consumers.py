@@ -0,0 +1,137 @@
+"""
+WebSocket consumers for real-time chat between customers and couriers.
+"""
+import asyncio
+import uuid
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from core.models import ChatUnreadCount, Job, Message
+from core.serializers import SendMessageSerializer
+from core.utils.chat import (
+    CHAT_STATUSES, broadcast, chat_group, get_chat_job, get_sender_type,
+    mark_offline, mark_online, post_message,
+)
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live chat for one job, open to the job's customer and assigned courier.
+
+    Client -> server:
+        {"type": "message", "content": "...", "is_quick_message": false}
+        {"type": "read", "message_ids": ["<uuid>", ...]}
+    Server -> client:
+        {"type": "message", "message": {...}}
+        {"type": "read", "message_ids": [...]}
+        {"type": "error", "error": "..."}
+    """
+    # Read receipts are collected for this long and written in one UPDATE
+    READ_RECEIPT_DELAY = 1.0
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.pending_reads = set()
+        self.read_flush = None
+
+        if not self.user or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        job = await database_sync_to_async(get_chat_job)(self.user, self.job_id)
+        if not job:
+            await self.close(code=4403)
+            return
+        self.sender_type = await database_sync_to_async(get_sender_type)(self.user)
+
+        await self.channel_layer.group_add(chat_group(self.job_id), self.channel_name)
+        await database_sync_to_async(mark_online)(self.job_id, self.user.id)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'sender_type'):
+            return
+        if self.read_flush:
+            self.read_flush.cancel()
+        await self.flush_reads()
+        await self.channel_layer.group_discard(chat_group(self.job_id), self.channel_name)
+        await database_sync_to_async(mark_offline)(self.job_id, self.user.id)
+
+    async def receive_json(self, content, **kwargs):
+        event_type = content.get('type')
+        if event_type == 'message':
+            await self.send_message(content)
+        elif event_type == 'read':
+            self.pending_reads.update(self._valid_ids(content.get('message_ids', [])))
+            if self.pending_reads and not self.read_flush:
+                self.read_flush = asyncio.ensure_future(self.flush_reads_later())
+        else:
+            await self.send_json({'type': 'error', 'error': 'Unknown event type'})
+
+    @staticmethod
+    def _valid_ids(message_ids):
+        valid = set()
+        for message_id in message_ids:
+            try:
+                valid.add(str(uuid.UUID(str(message_id))))
+            except ValueError:
+                continue
+        return valid
+
+    async def send_message(self, content):
+        serializer = SendMessageSerializer(data=content)
+        if not serializer.is_valid():
+            await self.send_json({'type': 'error', 'error': serializer.errors})
+            return
+
+        error = await database_sync_to_async(self._post_message)(serializer.validated_data)
+        if error:
+            await self.send_json({'type': 'error', 'error': error})
+
+    def _post_message(self, data):
+        job = Job.objects.select_related('customer__user', 'courier__user').get(id=self.job_id)
+        # Only allow chat during active delivery
+        if job.status not in CHAT_STATUSES:
+            return 'Chat is only available during active delivery'
+        post_message(
+            job,
+            self.user,
+            self.sender_type,
+            data['content'],
+            is_quick_message=data.get('is_quick_message', False),
+        )
+        return None
+
+    async def flush_reads_later(self):
+        await asyncio.sleep(self.READ_RECEIPT_DELAY)
+        self.read_flush = None
+        await self.flush_reads()
+
+    async def flush_reads(self):
+        if not self.pending_reads:
+            return
+        message_ids, self.pending_reads = list(self.pending_reads), set()
+        await database_sync_to_async(self._mark_read)(message_ids)
+
+    def _mark_read(self, message_ids):
+        """Mark the other party's messages read and tell both sockets which ones"""
+        opposite_type = Message.SENDER_COURIER if self.sender_type == Message.SENDER_CUSTOMER else Message.SENDER_CUSTOMER
+        unread = Message.objects.filter(
+            job_id=self.job_id,
+            sender_type=opposite_type,
+            is_read=False,
+        )
+        message_ids = [str(message_id) for message_id in unread.filter(id__in=message_ids).values_list('id', flat=True)]
+        if message_ids:
+            updated = unread.filter(id__in=message_ids).update(is_read=True)
+            ChatUnreadCount.clear(self.job_id, self.user.id, count=updated)
+            broadcast(self.job_id, {'type': 'chat.read', 'message_ids': message_ids})
+
+    # Channel layer events
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_read(self, event):
+        await self.send_json({'type': 'read', 'message_ids': event['message_ids']})
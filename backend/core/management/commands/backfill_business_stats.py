@@ -0,0 +1,106 @@
+"""
+Rebuild the BusinessDailyStats, BusinessAreaStats and BusinessRouteStats
+rollups from historical bulk orders and delivery items.
+"""
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import (
+    BusinessAccount, BulkOrder, BulkDeliveryItem, BusinessDailyStats, BusinessAreaStats,
+    BusinessRouteStats
+)
+from core.utils.areas import normalize_area
+from core.utils.invoices import BILLED_COST
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily business statistics and delivery area counts from bulk orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help='Only rebuild the business with this ID')
+
+    def handle(self, *args, **options):
+        businesses = BusinessAccount.objects.all()
+        if options['business']:
+            businesses = businesses.filter(pk=options['business'])
+
+        rows = defaultdict(dict)
+        items = BulkDeliveryItem.objects.filter(bulk_order__business__in=businesses)
+
+        # Daily orders, and how many of them have been completed
+        orders = BulkOrder.objects.filter(business__in=businesses).annotate(
+            day=TruncDate('created_at')
+        ).values('business_id', 'day').annotate(
+            total=Count('id'), completed=Count('id', filter=Q(status=BulkOrder.STATUS_COMPLETED))
+        ).order_by()
+        for row in orders:
+            rows[(row['business_id'], row['day'])].update(orders=row['total'], completed_orders=row['completed'])
+
+        # Daily items and their estimated cost
+        created = items.annotate(day=TruncDate('created_at')).values(
+            'bulk_order__business_id', 'day'
+        ).annotate(total=Count('id'), cost=Sum('estimated_cost')).order_by()
+        for row in created:
+            rows[(row['bulk_order__business_id'], row['day'])].update(
+                items=row['total'], estimated_cost=row['cost']
+            )
+
+        # Daily deliveries with their actual and billed cost
+        delivered = items.filter(
+            status=BulkDeliveryItem.STATUS_DELIVERED, completed_at__isnull=False
+        ).annotate(day=TruncDate('completed_at')).values(
+            'bulk_order__business_id', 'day'
+        ).annotate(total=Count('id'), cost=Sum('actual_cost'), billed=Sum(BILLED_COST)).order_by()
+        for row in delivered:
+            rows[(row['bulk_order__business_id'], row['day'])].update(
+                delivered_items=row['total'], actual_cost=row['cost'], billed_cost=row['billed']
+            )
+
+        # Areas are normalized in Python, so stream the addresses rather than group in SQL
+        areas = Counter()
+        area_names = {}
+        addresses = items.values_list(
+            'bulk_order__business_id', 'created_at', 'delivery_address'
+        ).iterator(chunk_size=2000)
+        for business_id, created_at, address in addresses:
+            area_id, area_name = normalize_area(address)
+            key = (business_id, timezone.localdate(created_at), area_id)
+            areas[key] += 1
+            area_names.setdefault(key, area_name)
+
+        routes = items.values('bulk_order__business_id', 'delivery_address').annotate(
+            total=Count('id')
+        ).order_by()
+
+        with transaction.atomic():
+            BusinessDailyStats.objects.filter(business__in=businesses).delete()
+            BusinessAreaStats.objects.filter(business__in=businesses).delete()
+            BusinessRouteStats.objects.filter(business__in=businesses).delete()
+            BusinessDailyStats.objects.bulk_create([
+                BusinessDailyStats(business_id=business_id, date=day, **values)
+                for (business_id, day), values in rows.items()
+            ], batch_size=1000)
+            BusinessAreaStats.objects.bulk_create([
+                BusinessAreaStats(
+                    business_id=business_id, date=day, area_id=area_id,
+                    area_name=area_names[(business_id, day, area_id)], items=count
+                )
+                for (business_id, day, area_id), count in areas.items()
+            ], batch_size=1000)
+            BusinessRouteStats.objects.bulk_create([
+                BusinessRouteStats(
+                    business_id=row['bulk_order__business_id'],
+                    delivery_address=row['delivery_address'],
+                    items=row['total'],
+                )
+                for row in routes
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(rows)} business daily stats rows and {len(areas)} area rows'
+        ))
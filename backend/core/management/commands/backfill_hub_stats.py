@@ -0,0 +1,85 @@
+"""
+Rebuild the HubDailyStats rollups from historical deliveries, commission
+transactions and ratings.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import Hub, HubDelivery, HubTransaction, HubRating, HubDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily hub statistics from deliveries, transactions and ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hub', help='Only rebuild the hub with this hub code')
+
+    def handle(self, *args, **options):
+        hubs = Hub.objects.all()
+        if options['hub']:
+            hubs = hubs.filter(hub_code=options['hub'])
+
+        rows = defaultdict(dict)
+        deliveries = HubDelivery.objects.filter(hub__in=hubs)
+
+        # Daily arrivals and pickups
+        for field, column in (('arrivals', 'arrived_at_hub'), ('pickups', 'picked_up_at')):
+            counts = deliveries.filter(**{f'{column}__isnull': False}).annotate(
+                day=TruncDate(column)
+            ).values('hub_id', 'day').annotate(total=Count('id')).order_by()
+            for row in counts:
+                rows[(row['hub_id'], row['day'])][field] = row['total']
+
+        # Daily commissions
+        commissions = HubTransaction.objects.filter(
+            hub__in=hubs,
+            transaction_type=HubTransaction.TRANSACTION_COMMISSION
+        ).annotate(day=TruncDate('created_at')).values('hub_id', 'day').annotate(
+            total=Sum('amount')
+        ).order_by()
+        for row in commissions:
+            rows[(row['hub_id'], row['day'])]['commissions'] = row['total']
+
+        # Daily ratings
+        ratings = HubRating.objects.filter(hub__in=hubs).annotate(
+            day=TruncDate('created_at')
+        ).values('hub_id', 'day').annotate(
+            rating_sum=Sum('rating'), rating_count=Count('id')
+        ).order_by()
+        for row in ratings:
+            rows[(row['hub_id'], row['day'])].update(
+                rating_sum=row['rating_sum'], rating_count=row['rating_count']
+            )
+
+        # Replay arrivals (+1) and pickups (-1) to recover each day's peak occupancy
+        timeline = deliveries.filter(arrived_at_hub__isnull=False).order_by('hub_id').values_list(
+            'hub_id', 'arrived_at_hub', 'picked_up_at'
+        ).iterator(chunk_size=2000)
+        for hub_id, hub_deliveries in groupby(timeline, key=lambda row: row[0]):
+            events = []
+            for _, arrived_at, picked_up_at in hub_deliveries:
+                events.append((arrived_at, 1))
+                if picked_up_at:
+                    events.append((picked_up_at, -1))
+            events.sort(key=lambda event: (event[0], event[1]))
+
+            occupancy = 0
+            for moment, change in events:
+                occupancy += change
+                day_row = rows[(hub_id, timezone.localdate(moment))]
+                day_row['peak_occupancy'] = max(day_row.get('peak_occupancy', 0), occupancy)
+
+        with transaction.atomic():
+            HubDailyStats.objects.filter(hub__in=hubs).delete()
+            HubDailyStats.objects.bulk_create([
+                HubDailyStats(hub_id=hub_id, date=day, **values)
+                for (hub_id, day), values in rows.items()
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} hub daily stats rows'))
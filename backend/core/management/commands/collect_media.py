@@ -0,0 +1,142 @@
+"""
+Garbage-collect deduplicated media blobs.
+
+Reference counts are kept as files are saved and deleted, but Django never
+deletes files when rows go away, so this command first recounts the
+references actually held by file fields and photo renditions. Blobs left
+with none, and not referenced within the grace period, are removed with
+their row. Stray files under blobs/ that no row knows about (uploads whose
+transaction rolled back) are removed as well, and so are chunked photo
+uploads abandoned for longer than the grace period.
+"""
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils import timezone
+
+from core.models import MediaBlob, PhotoUpload
+from core.storage import BLOB_PREFIX, is_blob
+from core.utils import images
+
+
+class Command(BaseCommand):
+    help = 'Recount media blob references and delete unreferenced blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=24,
+            help='Hours since a blob was last referenced before it may be deleted'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace'])
+        dry_run = options['dry_run']
+
+        references = self.count_references()
+        recounted = self.recount(references, cutoff, dry_run)
+        deleted, freed = self.sweep(cutoff, dry_run)
+        strays = self.remove_strays(cutoff.timestamp(), dry_run)
+        abandoned = self.remove_abandoned_uploads(cutoff, dry_run)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {recounted} blobs. {verb} {deleted} blobs ({freed / 1024 / 1024:.1f} MB), '
+            f'{strays} stray files and {abandoned} abandoned photo uploads'
+        ))
+
+    def count_references(self):
+        """Blob name -> number of references held by model file fields and renditions"""
+        references = Counter()
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, models.FileField):
+                    continue
+                names = model._default_manager.filter(
+                    **{f'{field.name}__startswith': BLOB_PREFIX + '/'}
+                ).values_list(field.name, flat=True)
+                references.update(names.iterator(chunk_size=2000))
+
+        for model in images.IMAGE_FIELDS:
+            for renditions in model._default_manager.exclude(renditions={}).values_list('renditions', flat=True).iterator(chunk_size=2000):
+                for entry in renditions.values():
+                    for size in images.SIZES:
+                        references.update(name for name in entry.get(size, {}).values() if is_blob(name))
+        return references
+
+    def recount(self, references, cutoff, dry_run):
+        # Blobs referenced recently may belong to rows not committed yet; their counts are left alone
+        changed = []
+        for blob in MediaBlob.objects.filter(updated_at__lt=cutoff).only('digest', 'name', 'references').iterator(chunk_size=2000):
+            count = references.get(blob.name, 0)
+            if blob.references != count:
+                blob.references = count
+                changed.append(blob)
+        if changed and not dry_run:
+            MediaBlob.objects.bulk_update(changed, ['references'], batch_size=1000)
+        return len(changed)
+
+    def sweep(self, cutoff, dry_run):
+        candidates = MediaBlob.objects.filter(references=0, updated_at__lt=cutoff)
+        if dry_run:
+            return candidates.count(), sum(candidates.values_list('size', flat=True))
+
+        deleted = freed = 0
+        for digest in list(candidates.values_list('digest', flat=True)):
+            # The row lock makes a concurrent upload of the same content wait, then write the file afresh
+            with transaction.atomic():
+                blob = candidates.select_for_update().filter(digest=digest).first()
+                if blob is None:
+                    continue
+                try:
+                    os.remove(default_storage.path(blob.name))
+                except FileNotFoundError:
+                    pass
+                blob.delete()
+            deleted += 1
+            freed += blob.size
+        return deleted, freed
+
+    def remove_strays(self, cutoff, dry_run):
+        removed = 0
+        for directory, _, files in os.walk(default_storage.path(BLOB_PREFIX)):
+            paths = {}
+            for file in files:
+                path = os.path.join(directory, file)
+                paths[os.path.relpath(path, default_storage.location).replace(os.sep, '/')] = path
+            if not paths:
+                continue
+            known = set(MediaBlob.objects.filter(name__in=list(paths)).values_list('name', flat=True))
+            for name, path in paths.items():
+                if name in known:
+                    continue
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue  # Possibly an upload still in progress
+                    if not dry_run:
+                        os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def remove_abandoned_uploads(self, cutoff, dry_run):
+        uploads = PhotoUpload.objects.filter(updated_at__lt=cutoff)
+        if dry_run:
+            return uploads.filter(status=PhotoUpload.STATUS_UPLOADING).count()
+
+        abandoned = 0
+        for upload in uploads.iterator(chunk_size=500):
+            if upload.status == PhotoUpload.STATUS_UPLOADING:
+                abandoned += 1
+            try:
+                os.remove(upload.path)
+            except FileNotFoundError:
+                pass
+        uploads.delete()
+        return abandoned
@@ -0,0 +1,37 @@
+"""
+Generate draft BusinessInvoices for a billing month, by default the previous
+one. Safe to run again: businesses already invoiced for the month are skipped.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import BusinessAccount
+from core.utils.exports import month_bounds
+from core.utils.invoices import generate_invoices
+
+
+class Command(BaseCommand):
+    help = 'Invoice business accounts for the items delivered in a month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to bill, as YYYY-MM (default: last month)')
+        parser.add_argument('--business', help='Only invoice the business with this ID')
+
+    def handle(self, *args, **options):
+        month = options['month'] or (timezone.localdate().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+        try:
+            start, end = month_bounds(month)
+        except ValueError:
+            raise CommandError('Invalid month, expected YYYY-MM')
+        period_start, period_end = start.date(), (end - timedelta(days=1)).date()
+
+        businesses = None
+        if options['business']:
+            businesses = BusinessAccount.objects.filter(pk=options['business'])
+
+        created = generate_invoices(period_start, period_end, businesses=businesses)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} invoices for {period_start} to {period_end}'
+        ))
@@ -0,0 +1,59 @@
+"""
+Generate the HubPayouts for a period, by default the previous calendar month.
+Safe to run again: hubs already holding a payout for the period are skipped.
+Periods that overlap an earlier payout of a hub are refused.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Hub
+from core.utils.hub_payouts import OverlappingPayout, generate_payouts, month_period
+
+
+class Command(BaseCommand):
+    help = 'Create hub payouts from commissions, COD collections and adjustments in a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to pay out, as YYYY-MM (default: last month)')
+        parser.add_argument('--start', help='First day of a custom period, as YYYY-MM-DD')
+        parser.add_argument('--end', help='Last day of a custom period, as YYYY-MM-DD')
+        parser.add_argument('--hub', help='Only generate the payout of the hub with this hub code')
+        parser.add_argument(
+            '--recompute', action='store_true',
+            help='Replace payouts of the period that are still pending'
+        )
+
+    def handle(self, *args, **options):
+        period_start, period_end = self.get_period(options)
+        hubs = None
+        if options['hub']:
+            hubs = Hub.objects.filter(hub_code=options['hub'])
+
+        try:
+            created = generate_payouts(period_start, period_end, hubs=hubs, recompute=options['recompute'])
+        except OverlappingPayout as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} hub payouts for {period_start} to {period_end}'
+        ))
+
+    def get_period(self, options):
+        try:
+            if options['start'] or options['end']:
+                if not (options['start'] and options['end']):
+                    raise CommandError('--start and --end must be given together')
+                period_start = date.fromisoformat(options['start'])
+                period_end = date.fromisoformat(options['end'])
+                if period_end < period_start:
+                    raise CommandError('--end is before --start')
+                return period_start, period_end
+            if options['month']:
+                year, month = map(int, options['month'].split('-'))
+                return month_period(year, month)
+        except ValueError:
+            raise CommandError('Invalid date')
+
+        last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+        return month_period(last_month.year, last_month.month)
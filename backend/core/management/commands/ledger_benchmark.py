@@ -0,0 +1,100 @@
+"""
+Contention benchmark for the ledger engine: many threads post to the same
+wallet at once, then the final balance is checked against the entries.
+"""
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.db.models import Q, Sum
+from django.db.utils import OperationalError
+
+from core.models import Wallet, WalletTransaction
+from core.utils.ledger import WALLETS, InsufficientBalance
+
+
+class Command(BaseCommand):
+    help = 'Post concurrently to one wallet and check that no update is lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--posts', type=int, default=100, help='Postings per thread')
+        parser.add_argument(
+            '--naive', action='store_true',
+            help='Use read-modify-write saves instead of the ledger, for comparison'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'ledger-bench-{uuid.uuid4().hex[:8]}')
+        wallet = Wallet.objects.create(user=user, balance=0)
+        errors = []
+
+        def worker(index):
+            try:
+                for i in range(options['posts']):
+                    # Mostly credits, with a debit every fourth posting
+                    debit = i % 4 == 3
+                    for attempt in range(20):
+                        try:
+                            if options['naive']:
+                                self.naive_post(wallet.pk, -1 if debit else 1)
+                            elif debit:
+                                WALLETS.debit(wallet.pk, 1, transaction_type='debit', description='benchmark')
+                            else:
+                                WALLETS.credit(wallet.pk, 1, transaction_type='credit', description='benchmark')
+                            break
+                        except OperationalError:
+                            # SQLite allows one writer at a time; back off and retry
+                            time.sleep(0.01 * (attempt + 1))
+                        except InsufficientBalance:
+                            break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        wallet.refresh_from_db()
+        totals = WalletTransaction.objects.filter(wallet=wallet).aggregate(
+            credits=Sum('amount', filter=Q(transaction_type=WalletTransaction.CREDIT)),
+            debits=Sum('amount', filter=Q(transaction_type=WalletTransaction.DEBIT)),
+        )
+        expected = (totals['credits'] or 0) - (totals['debits'] or 0)
+        postings = WalletTransaction.objects.filter(wallet=wallet).count()
+
+        self.stdout.write(f'{postings} postings in {elapsed:.2f}s ({postings / elapsed:.0f}/s)')
+        self.stdout.write(f'Stored balance {wallet.balance}, sum of entries {expected}')
+        for error in errors:
+            self.stdout.write(self.style.ERROR(f'Worker failed: {error}'))
+
+        if wallet.balance == expected and not errors:
+            self.stdout.write(self.style.SUCCESS('No lost updates'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Lost updates: balance is off by {expected - wallet.balance}'))
+
+        user.delete()
+
+    def naive_post(self, wallet_id, amount):
+        """The old read-modify-write path"""
+        with transaction.atomic():
+            wallet = Wallet.objects.get(pk=wallet_id)
+            if wallet.balance + amount < 0:
+                raise InsufficientBalance("Insufficient balance")
+            wallet.balance += amount
+            wallet.save()
+            WalletTransaction.objects.create(
+                wallet=wallet,
+                amount=abs(amount),
+                transaction_type='credit' if amount > 0 else 'debit',
+                description='benchmark'
+            )
@@ -0,0 +1,55 @@
+"""
+Process queued bulk order CSV uploads.
+
+Uploads are normally ingested on a background thread of the web process that
+accepted them. This command picks up the ones that thread never got to, such
+as uploads queued just before a restart or left processing by a worker that
+died, and resumes them after their last committed chunk.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import BulkUpload
+from core.utils import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Ingest queued and stalled bulk order CSV uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', type=int, default=600,
+            help='Seconds without progress after which a processing upload is requeued'
+        )
+        parser.add_argument(
+            '--loop', type=int, default=0,
+            help='Keep polling every N seconds instead of exiting when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.process_queue(options['stale'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Processed {processed} uploads'))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
+
+    def process_queue(self, stale):
+        cutoff = timezone.now() - timedelta(seconds=stale)
+        requeued = BulkUpload.objects.filter(
+            status=BulkUpload.STATUS_PROCESSING, updated_at__lt=cutoff
+        ).update(status=BulkUpload.STATUS_QUEUED)
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stalled uploads')
+
+        processed = 0
+        queued = BulkUpload.objects.filter(status=BulkUpload.STATUS_QUEUED).order_by('created_at')
+        for upload_id in queued.values_list('id', flat=True):
+            if bulk_import.claim(upload_id):
+                bulk_import.process_upload(upload_id)
+                processed += 1
+        return processed
@@ -0,0 +1,43 @@
+"""
+Make missing photo renditions.
+
+Renditions are normally written by the web process's background pool right
+after an upload. This command backfills photos uploaded before the pipeline
+existed and any the pool never got to, such as uploads just before a restart.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.utils import images
+
+
+class Command(BaseCommand):
+    help = 'Write resized, EXIF-free copies of job and courier photos that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many objects')
+
+    def handle(self, *args, **options):
+        done = 0
+        for model, fields in images.IMAGE_FIELDS.items():
+            has_photo = Q()
+            for field in fields:
+                has_photo |= ~Q(**{field: ''}) & Q(**{f'{field}__isnull': False})
+            queryset = model.objects.filter(has_photo).only('pk', 'renditions', *fields)
+
+            # Collected up front so rendering never runs inside an open cursor
+            pending = [
+                (instance.pk, images.pending_fields(instance))
+                for instance in queryset.iterator(chunk_size=500)
+            ]
+            for pk, pending_fields in pending:
+                if not pending_fields:
+                    continue
+                images.process(model, pk, pending_fields)
+                done += 1
+                if options['limit'] and done >= options['limit']:
+                    break
+            if options['limit'] and done >= options['limit']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Made renditions for {done} objects'))
@@ -0,0 +1,117 @@
+"""
+Worker that turns due scheduled deliveries into jobs.
+
+Due times are kept in a min-heap loaded from the (status, next_delivery_date)
+index. The worker sleeps until the earliest one, materializes everything due
+in batches and reloads the heap periodically so new, edited, paused and
+cancelled schedules are picked up. All state lives in the database, so the
+worker can be restarted at any time.
+"""
+import heapq
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job, Recipient, ScheduledDelivery
+
+
+class Command(BaseCommand):
+    help = 'Create jobs for scheduled deliveries as they come due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--reload', type=int, default=60,
+            help='Seconds between reloads of the due-time heap'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Materialize everything due now and exit (for cron)'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        reload_every = timedelta(seconds=options['reload'])
+
+        if options['once']:
+            heap = self.load_heap(timezone.now())
+            created = self.fire_due(heap)
+            self.stdout.write(self.style.SUCCESS(f'Created {created} scheduled jobs'))
+            return
+
+        self.stdout.write('Scheduled delivery worker started')
+        while True:
+            now = timezone.now()
+            next_reload = now + reload_every
+            heap = self.load_heap(next_reload)
+
+            while True:
+                created = self.fire_due(heap)
+                if created:
+                    self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} created {created} jobs')
+
+                now = timezone.now()
+                if now >= next_reload:
+                    break
+                wake_at = min(heap[0][0], next_reload) if heap else next_reload
+                time.sleep(max((wake_at - now).total_seconds(), 0))
+
+    def load_heap(self, until):
+        """Due times of active schedules up to `until`, earliest first"""
+        rows = ScheduledDelivery.objects.filter(
+            status=ScheduledDelivery.STATUS_ACTIVE,
+            next_delivery_date__lte=until
+        ).order_by('next_delivery_date').values_list('next_delivery_date', 'id')
+        heap = list(rows)
+        heapq.heapify(heap)
+        return heap
+
+    def fire_due(self, heap):
+        """Pop everything due from the heap and materialize it in batches"""
+        created = 0
+        now = timezone.now()
+        while heap and heap[0][0] <= now:
+            batch = []
+            while heap and heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(heap)[1])
+            created += self.materialize(batch, now)
+        return created
+
+    def materialize(self, schedule_ids, now):
+        """Create one job per due schedule and advance the schedules"""
+        with transaction.atomic():
+            schedules = ScheduledDelivery.objects.filter(
+                id__in=schedule_ids,
+                status=ScheduledDelivery.STATUS_ACTIVE,
+                next_delivery_date__lte=now
+            )
+            if connection.features.has_select_for_update_skip_locked:
+                # Let several workers share the load without firing a schedule twice
+                schedules = schedules.select_for_update(skip_locked=True)
+            schedules = list(schedules)
+            if not schedules:
+                return 0
+
+            Job.objects.bulk_create([schedule.build_job() for schedule in schedules], batch_size=500)
+
+            for schedule in schedules:
+                schedule.advance(delivered_at=now)
+                schedule.updated_at = now
+            ScheduledDelivery.objects.bulk_update(
+                schedules,
+                ['last_delivery_date', 'deliveries_completed', 'next_delivery_date', 'status', 'updated_at'],
+                batch_size=500
+            )
+
+            recipients = Counter(schedule.recipient_id for schedule in schedules if schedule.recipient_id)
+            for recipient_id, count in recipients.items():
+                Recipient.objects.filter(pk=recipient_id).update(
+                    delivery_count=F('delivery_count') + count,
+                    last_delivery=now
+                )
+        return len(schedules)
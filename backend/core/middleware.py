@@ -0,0 +1,153 @@
+"""
+Request middleware for Yanzi Parcels
+"""
+import math
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+
+from core import routers
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests to the views named in REPLICA_READ_VIEWS read from the
+    replica. Once a client writes, a short-lived cookie keeps its next requests
+    on the primary until the replica has caught up (read-your-writes).
+    """
+    COOKIE_NAME = 'db_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        try:
+            response = self.get_response(request)
+            if routers.is_pinned():
+                response.set_cookie(
+                    self.COOKIE_NAME, '1',
+                    max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                    httponly=True, samesite='Lax'
+                )
+            return response
+        finally:
+            routers.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.url_name in getattr(settings, 'REPLICA_READ_VIEWS', ())
+            and self.COOKIE_NAME not in request.COOKIES
+        ):
+            routers.use_replica()
+
+
+class BusinessAPILogMiddleware:
+    """
+    Record business API calls (endpoint, status, latency) for auditing.
+    Requests under API_LOG_PATHS or carrying an API key are appended to the
+    in-memory buffer in core.utils.api_log, which writes them in batches.
+    """
+
+    def __init__(self, get_response):
+        from core.authentication import API_KEY_HEADER
+        from core.utils import api_log
+        self.get_response = get_response
+        self.buffer = api_log.buffer
+        self.api_key_header = API_KEY_HEADER
+        self.paths = tuple(getattr(settings, 'API_LOG_PATHS', ('/api/business/',)))
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+
+        api_key = request.META.get(self.api_key_header, '')
+        if api_key or request.path.startswith(self.paths):
+            # DRF copies the user it authenticates back onto the Django request
+            user = getattr(request, 'user', None)
+            user_id = user.pk if user is not None and user.is_authenticated else None
+            if api_key or user_id:
+                self.buffer.append((
+                    api_key,
+                    user_id,
+                    request.path[:255],
+                    request.method,
+                    response.status_code,
+                    request.META.get('REMOTE_ADDR') or '0.0.0.0',
+                    request.META.get('HTTP_USER_AGENT', ''),
+                    int((time.perf_counter() - started) * 1000),
+                    timezone.now(),
+                ))
+        return response
+
+
+class ThrottleMiddleware:
+    """
+    Apply the token-bucket budgets in THROTTLE_BUDGETS to the views they name.
+    This runs before DRF authenticates anyone, so rejected requests never
+    reach the database.
+    """
+
+    def __init__(self, get_response):
+        from core.throttling import Throttle
+        self.get_response = get_response
+        self.throttle = Throttle(
+            getattr(settings, 'THROTTLE_BUDGETS', {}),
+            shared=getattr(settings, 'THROTTLE_SHARED', False)
+        )
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        from core.throttling import client_ident
+
+        scope = request.resolver_match.url_name
+        if scope not in self.throttle.budgets:
+            return None
+
+        wait = self.throttle.check(scope, client_ident(request))
+        if wait:
+            seconds = math.ceil(wait)
+            response = JsonResponse(
+                {'detail': f'Request was throttled. Expected available in {seconds} seconds.'},
+                status=429
+            )
+            response['Retry-After'] = str(seconds)
+            return response
+
+
+class JWTAuthMiddleware:
+    """
+    Authenticate WebSocket connections from a `?token=<access token>` query
+    parameter, since browsers cannot set an Authorization header on sockets.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+        from channels.db import database_sync_to_async
+
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if token:
+            scope = dict(scope, user=await database_sync_to_async(self.get_user)(token[0]))
+        return await self.inner(scope, receive, send)
+
+    @staticmethod
+    def get_user(raw_token):
+        from django.contrib.auth.models import AnonymousUser
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.exceptions import InvalidToken
+
+        from core.authentication import ProfileJWTAuthentication
+
+        authentication = ProfileJWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw_token))
+        except (InvalidToken, AuthenticationFailed):
+            return AnonymousUser()
@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-19 09:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_summaries(apps, schema_editor):
+    """Build rating summaries for couriers rated before this migration"""
+    from django.db.models import Count, Q, Sum
+
+    Rating = apps.get_model('core', 'Rating')
+    CourierRatingSummary = apps.get_model('core', 'CourierRatingSummary')
+
+    totals = Rating.objects.values('courier_id').annotate(
+        rating_sum=Sum('overall_rating'),
+        rating_count=Count('id'),
+        speed_sum=Sum('speed_rating'),
+        speed_count=Count('speed_rating'),
+        communication_sum=Sum('communication_rating'),
+        communication_count=Count('communication_rating'),
+        care_sum=Sum('care_rating'),
+        care_count=Count('care_rating'),
+        **{f'stars_{i}': Count('id', filter=Q(overall_rating=i)) for i in range(1, 6)}
+    ).order_by()
+
+    CourierRatingSummary.objects.bulk_create([
+        CourierRatingSummary(**{key: value or 0 for key, value in row.items()})
+        for row in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_hub_hubdelivery_hubtransaction_hubrating_hubpayout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierRatingSummary',
+            fields=[
+                ('courier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='core.courier')),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('speed_sum', models.IntegerField(default=0)),
+                ('speed_count', models.IntegerField(default=0)),
+                ('communication_sum', models.IntegerField(default=0)),
+                ('communication_count', models.IntegerField(default=0)),
+                ('care_sum', models.IntegerField(default=0)),
+                ('care_count', models.IntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Courier Rating Summaries',
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-19 10:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_courierratingsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HubDailyStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('arrivals', models.IntegerField(default=0)),
+                ('pickups', models.IntegerField(default=0)),
+                ('peak_occupancy', models.IntegerField(default=0)),
+                ('commissions', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('hub', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.hub')),
+            ],
+            options={
+                'verbose_name_plural': 'Hub Daily Stats',
+                'ordering': ['-date'],
+                'unique_together': {('hub', 'date')},
+            },
+        ),
+    ]
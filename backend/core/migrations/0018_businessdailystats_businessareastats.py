@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-19 11:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_hubdailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessDailyStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+                ('delivered_items', models.IntegerField(default=0)),
+                ('estimated_cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('actual_cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.businessaccount')),
+            ],
+            options={
+                'verbose_name_plural': 'Business Daily Stats',
+                'ordering': ['-date'],
+                'unique_together': {('business', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BusinessAreaStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('area_id', models.CharField(max_length=100)),
+                ('area_name', models.CharField(max_length=255)),
+                ('items', models.IntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='area_stats', to='core.businessaccount')),
+            ],
+            options={
+                'verbose_name_plural': 'Business Area Stats',
+                'unique_together': {('business', 'date', 'area_id')},
+            },
+        ),
+    ]
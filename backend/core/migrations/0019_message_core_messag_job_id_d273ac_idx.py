@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_businessdailystats_businessareastats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['job', 'created_at'], name='core_messag_job_id_d273ac_idx'),
+        ),
+    ]
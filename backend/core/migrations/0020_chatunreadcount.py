@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-19 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """Count messages that were already unread before this migration"""
+    from django.db.models import Count
+
+    Message = apps.get_model('core', 'Message')
+    ChatUnreadCount = apps.get_model('core', 'ChatUnreadCount')
+
+    # Customers read courier messages and couriers read customer messages
+    recipients = (
+        ('courier', 'job__customer__user_id'),
+        ('customer', 'job__courier__user_id'),
+    )
+    counts = []
+    for sender_type, recipient in recipients:
+        unread = Message.objects.filter(
+            sender_type=sender_type, is_read=False, **{f'{recipient}__isnull': False}
+        ).values('job_id', recipient).annotate(total=Count('id')).order_by()
+        counts.extend(
+            ChatUnreadCount(job_id=row['job_id'], user_id=row[recipient], count=row['total'])
+            for row in unread
+        )
+    ChatUnreadCount.objects.bulk_create(counts, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0019_message_core_messag_job_id_d273ac_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatUnreadCount',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counts', to='core.job')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_unread_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'job')},
+            },
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_codesequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduleddelivery',
+            index=models.Index(fields=['status', 'next_delivery_date'], name='core_schedu_status_6790d1_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-19 17:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_scheduleddelivery_core_schedu_status_6790d1_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('rows_created', models.IntegerField(default=0)),
+                ('rows_failed', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('bulk_order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='upload', to='core.bulkorder')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BulkUploadError',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('row_number', models.IntegerField()),
+                ('message', models.CharField(max_length=255)),
+                ('row', models.JSONField(default=dict)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='errors', to='core.bulkupload')),
+            ],
+            options={
+                'ordering': ['row_number'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 18:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_bulkupload_bulkuploaderror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessapilog',
+            name='duration_ms',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='businessapilog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='businessapilog',
+            index=models.Index(fields=['business', 'created_at'], name='core_busine_busines_e07baf_idx'),
+        ),
+    ]
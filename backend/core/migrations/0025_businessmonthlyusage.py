@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-19 19:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_businessapilog_duration_ms_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessMonthlyUsage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('deliveries', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_usage', to='core.businessaccount')),
+            ],
+            options={
+                'verbose_name_plural': 'Business Monthly Usage',
+                'unique_together': {('business', 'month')},
+            },
+        ),
+    ]
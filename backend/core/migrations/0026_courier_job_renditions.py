@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_businessmonthlyusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courier',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-19 20:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('pickup', 'Pickup Photo'), ('delivery', 'Delivery Photo')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('received', models.PositiveIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('completed', 'Completed')], default='uploading', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='core.courier')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='core.job')),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-19 21:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0028_photoupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierPayoutBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('partial', 'Partially Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('courier_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourierPayoutItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paypal_email', models.EmailField(max_length=254)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('chunk', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('provider_batch_id', models.CharField(blank=True, max_length=100)),
+                ('error', models.TextField(blank=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.courierpayoutbatch')),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payout_items', to='core.courier')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='payout_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='core.courierpayoutbatch'),
+        ),
+        migrations.AddIndex(
+            model_name='courierpayoutitem',
+            index=models.Index(fields=['batch', 'chunk'], name='core_courie_batch_i_85dff9_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='courierpayoutitem',
+            unique_together={('batch', 'courier')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 22:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_courier_payouts'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='hubpayout',
+            unique_together={('hub', 'period_start', 'period_end')},
+        ),
+    ]
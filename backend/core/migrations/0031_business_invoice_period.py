@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 22:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_hub_payout_period'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='businessinvoice',
+            unique_together={('business', 'period_start', 'period_end')},
+        ),
+    ]
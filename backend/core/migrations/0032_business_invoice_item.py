@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 22:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def backfill_invoice_items(apps, schema_editor):
+    """Freeze the items existing invoices were billed for, at the cost they bill at today"""
+    from datetime import datetime, time, timedelta
+
+    from django.db.models import Case, DecimalField, F, When
+    from django.utils import timezone
+
+    BusinessInvoice = apps.get_model('core', 'BusinessInvoice')
+    BulkDeliveryItem = apps.get_model('core', 'BulkDeliveryItem')
+    BusinessInvoiceItem = apps.get_model('core', 'BusinessInvoiceItem')
+
+    billed_cost = Case(
+        When(actual_cost__gt=0, then=F('actual_cost')),
+        default=F('estimated_cost'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    billed = set()
+    for invoice in BusinessInvoice.objects.order_by('created_at'):
+        since = timezone.make_aware(datetime.combine(invoice.period_start, time.min))
+        until = timezone.make_aware(datetime.combine(invoice.period_end + timedelta(days=1), time.min))
+        items = BulkDeliveryItem.objects.filter(
+            bulk_order__business_id=invoice.business_id, status='delivered',
+            completed_at__gte=since, completed_at__lt=until,
+        ).annotate(billed_cost=billed_cost).values_list('id', 'billed_cost')
+        lines = [
+            BusinessInvoiceItem(invoice_id=invoice.id, item_id=item_id, billed_cost=cost)
+            for item_id, cost in items if item_id not in billed
+        ]
+        billed.update(line.item_id for line in lines)
+        BusinessInvoiceItem.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_business_invoice_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessInvoiceItem',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('billed_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.businessinvoice')),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_line', to='core.bulkdeliveryitem')),
+            ],
+        ),
+        migrations.RunPython(backfill_invoice_items, migrations.RunPython.noop),
+    ]
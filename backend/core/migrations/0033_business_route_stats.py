@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-19 23:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_business_invoice_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessdailystats',
+            name='completed_orders',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BusinessRouteStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('delivery_address', models.CharField(max_length=255)),
+                ('items', models.IntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_stats', to='core.businessaccount')),
+            ],
+            options={
+                'verbose_name_plural': 'Business Route Stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='businessroutestats',
+            index=models.Index(fields=['business', '-items'], name='core_busine_busines_2e488e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='businessroutestats',
+            unique_together={('business', 'delivery_address')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_business_route_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessdailystats',
+            name='billed_cost',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=15),
+        ),
+    ]
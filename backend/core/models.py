@@ -1,5 +1,5 @@
 import uuid 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -121,6 +121,7 @@ class Courier(models.Model):
     driving_license = models.CharField(max_length=50, blank=True)
     driving_license_photo = models.ImageField(upload_to='courier/license/', blank=True, null=True)
     profile_photo = models.ImageField(upload_to='courier/profile/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True)  # Resized photo copies, see core.utils.images
     
     # Rating
     rating = models.FloatField(default=5.0)
@@ -139,14 +140,15 @@ class Courier(models.Model):
         ).values_list('vehicle_type', flat=True).distinct())
 
     def update_rating(self):
-        """Recalculate courier's average rating from all ratings"""
-        from django.db.models import Avg
-        ratings = self.ratings_received.all()
-        if ratings.exists():
-            avg = ratings.aggregate(avg=Avg('overall_rating'))['avg']
-            self.rating = round(avg, 2) if avg else 5.0
-            self.total_ratings = ratings.count()
-            self.save()
+        """Sync rating and total_ratings from the courier's rating summary"""
+        from django.db.models import F, FloatField, OuterRef, Subquery, Value
+        from django.db.models.functions import Cast, Coalesce, Round
+        summary = CourierRatingSummary.objects.filter(courier=OuterRef('pk'), rating_count__gt=0)
+        average = Round(Cast('rating_sum', FloatField()) / F('rating_count'), 2)
+        Courier.objects.filter(pk=self.pk).update(
+            rating=Coalesce(Subquery(summary.values(avg=average)), Value(5.0)),
+            total_ratings=Coalesce(Subquery(summary.values('rating_count')), Value(0)),
+        )
 
 
 
@@ -252,6 +254,8 @@ class Job(models.Model):
     delivery_photo = models.ImageField(upload_to='job/delivery_photos/',null=True,blank=True)
     delivered_at = models.DateTimeField(null=True,blank=True)
 
+    renditions = models.JSONField(default=dict, blank=True)  # Resized photo copies, see core.utils.images
+
 
     def __str__(self):
         return self.description
@@ -268,11 +272,73 @@ class Transaction(models.Model):
     amount = models.FloatField(default=0)
     status = models.CharField(max_length=20, choices=STATUSES, default=IN_STATUS)
     created_at = models.DateTimeField(default=timezone.now)
+    # Set when a payout batch claims the transaction, so no other run can pay it out again
+    payout_batch = models.ForeignKey(
+        'CourierPayoutBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions'
+    )
 
     def __str__(self):
         return self.stripe_payment_intent_id
 
 
+class CourierPayoutBatch(models.Model):
+    """One payout run over a set of couriers, see core.utils.payouts"""
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETED = 'completed'
+    STATUS_PARTIAL = 'partial'
+    STATUS_FAILED = 'failed'
+    STATUSES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_PARTIAL, 'Partially Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_PENDING)
+    currency = models.CharField(max_length=3, default='USD')
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    courier_count = models.IntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Payout {self.id} ({self.get_status_display()})"
+
+
+class CourierPayoutItem(models.Model):
+    """A courier's share of a payout batch, sent to the provider in chunks"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUSES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    batch = models.ForeignKey(CourierPayoutBatch, on_delete=models.CASCADE, related_name='items')
+    courier = models.ForeignKey('Courier', on_delete=models.CASCADE, related_name='payout_items')
+    paypal_email = models.EmailField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    transaction_count = models.IntegerField(default=0)
+    chunk = models.IntegerField(default=0)  # Items of one chunk go to the provider in one request
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_PENDING)
+    provider_batch_id = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ['batch', 'courier']
+        indexes = [models.Index(fields=['batch', 'chunk'])]
+
+    def __str__(self):
+        return f"{self.courier} - {self.amount}"
+
+
 class Message(models.Model):
     """Chat messages between customer and courier for a job"""
     SENDER_CUSTOMER = 'customer'
@@ -295,10 +361,72 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['job', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.sender_type}: {self.content[:50]}"
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                ChatUnreadCount.record(self)
+
+
+class ChatUnreadCount(models.Model):
+    """Unread chat messages per user and job, kept in step as messages are sent and read"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_unread_counts')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='unread_counts')
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'job')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.job_id}: {self.count}"
+
+    @classmethod
+    def record(cls, message):
+        """Count a new message as unread for the other party on the job"""
+        from django.db.models import F
+        customer_user_id, courier_user_id = Job.objects.filter(pk=message.job_id).values_list(
+            'customer__user_id', 'courier__user_id'
+        ).get()
+        if message.sender_type == Message.SENDER_CUSTOMER:
+            user_id = courier_user_id
+        elif message.sender_type == Message.SENDER_COURIER:
+            user_id = customer_user_id
+        else:
+            return
+        if not user_id:
+            return
+
+        changes = {'count': F('count') + 1, 'updated_at': timezone.now()}
+        rows = cls.objects.filter(user_id=user_id, job_id=message.job_id)
+        if not rows.update(**changes):
+            cls.objects.get_or_create(user_id=user_id, job_id=message.job_id)
+            rows.update(**changes)
+
+    @classmethod
+    def clear(cls, job_id, user_id, count=None):
+        """Take count read messages off the user's unread count for the job (all if count is None)"""
+        from django.db.models import F
+        from django.db.models.functions import Greatest
+        rows = cls.objects.filter(user_id=user_id, job_id=job_id)
+        if count is None:
+            rows.update(count=0, updated_at=timezone.now())
+        elif count:
+            rows.update(count=Greatest(F('count') - count, 0), updated_at=timezone.now())
+
+    @classmethod
+    def for_job(cls, job_id, user_id):
+        return cls.objects.filter(user_id=user_id, job_id=job_id).values_list('count', flat=True).first() or 0
+
 
 class QuickMessage(models.Model):
     """Pre-defined quick messages for fast communication"""
@@ -525,13 +653,77 @@ class ScheduledDelivery(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Days between deliveries for each recurring frequency
+    FREQUENCY_DAYS = {
+        FREQUENCY_DAILY: 1,
+        FREQUENCY_WEEKLY: 7,
+        FREQUENCY_BIWEEKLY: 14,
+        FREQUENCY_MONTHLY: 30,
+    }
+
     class Meta:
         ordering = ['next_delivery_date']
         verbose_name_plural = 'Scheduled Deliveries'
+        indexes = [
+            models.Index(fields=['status', 'next_delivery_date']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_frequency_display()})"
 
+    def next_occurrence(self, after=None):
+        """First delivery time strictly after `after` (default now), or the start if still ahead"""
+        from datetime import datetime, timedelta
+        after = after or timezone.now()
+        start = datetime.combine(self.start_date, self.preferred_time or datetime.min.time())
+        start = timezone.make_aware(start) if timezone.is_naive(start) else start
+        
+        if start > after or self.frequency == self.FREQUENCY_ONCE:
+            return start
+        
+        period = timedelta(days=self.FREQUENCY_DAYS.get(self.frequency, 7))
+        periods_elapsed = (after - start) // period
+        return start + (periods_elapsed + 1) * period
+
+    def build_job(self):
+        """Unsaved job for one delivery of this schedule"""
+        return Job(
+            customer_id=self.customer_id,
+            name=self.name,
+            description=self.description,
+            category_id=self.category_id,
+            size=self.size,
+            weight=self.weight,
+            vehicle_type=self.vehicle_type,
+            pickup_address=self.pickup_address,
+            pick_lat=self.pickup_lat,
+            pick_up=self.pickup_lng,  # Note: field name is pick_up for lng
+            pickup_name=self.pickup_name,
+            pickup_phone=self.pickup_phone,
+            delivery_address=self.delivery_address,
+            delivery_lat=self.delivery_lat,
+            delivery_lng=self.delivery_lng,
+            delivery_name=self.delivery_name,
+            delivery_phone=self.delivery_phone,
+            status=Job.PROCESSING_STATUS
+        )
+
+    def advance(self, delivered_at=None):
+        """Record a delivery and move on to the next occurrence (not saved)"""
+        delivered_at = delivered_at or timezone.now()
+        self.last_delivery_date = delivered_at
+        self.deliveries_completed += 1
+        
+        # Check if max deliveries reached
+        if self.max_deliveries and self.deliveries_completed >= self.max_deliveries:
+            self.status = self.STATUS_COMPLETED
+        elif self.frequency == self.FREQUENCY_ONCE:
+            self.status = self.STATUS_COMPLETED
+        else:
+            self.next_delivery_date = self.next_occurrence(after=max(delivered_at, self.next_delivery_date or delivered_at))
+            if self.end_date and timezone.localdate(self.next_delivery_date) > self.end_date:
+                self.status = self.STATUS_COMPLETED
+
 
 # =============================================================================
 # Rating & Review System
@@ -572,9 +764,100 @@ class Rating(models.Model):
         return f"{self.customer} rated {self.courier}: {self.overall_rating}⭐"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update courier's average rating
-        self.courier.update_rating()
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                # Fold into the courier's running totals and refresh the average
+                CourierRatingSummary.record(self)
+                self.courier.update_rating()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            CourierRatingSummary.record(self, sign=-1)
+            result = super().delete(*args, **kwargs)
+            self.courier.update_rating()
+        return result
+
+
+class CourierRatingSummary(models.Model):
+    """Running rating totals and star histogram for a courier"""
+    DIMENSIONS = ('speed', 'communication', 'care')
+
+    courier = models.OneToOneField(
+        Courier,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary'
+    )
+
+    # Overall rating totals
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+
+    # Per-dimension totals (dimensions are optional on a rating)
+    speed_sum = models.IntegerField(default=0)
+    speed_count = models.IntegerField(default=0)
+    communication_sum = models.IntegerField(default=0)
+    communication_count = models.IntegerField(default=0)
+    care_sum = models.IntegerField(default=0)
+    care_count = models.IntegerField(default=0)
+
+    # Distribution of overall ratings (1-5 stars)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'Courier Rating Summaries'
+
+    def __str__(self):
+        return f"{self.courier}: {self.rating_count} ratings"
+
+    @classmethod
+    def record(cls, rating, sign=1):
+        """Add (or with sign=-1 remove) a rating using a single atomic UPDATE"""
+        from django.db.models import F
+        changes = {
+            'rating_sum': F('rating_sum') + sign * rating.overall_rating,
+            'rating_count': F('rating_count') + sign,
+            'updated_at': timezone.now(),
+        }
+        if 1 <= rating.overall_rating <= 5:
+            star_field = f'stars_{rating.overall_rating}'
+            changes[star_field] = F(star_field) + sign
+        for dimension in cls.DIMENSIONS:
+            value = getattr(rating, f'{dimension}_rating')
+            if value is not None:
+                changes[f'{dimension}_sum'] = F(f'{dimension}_sum') + sign * value
+                changes[f'{dimension}_count'] = F(f'{dimension}_count') + sign
+
+        summaries = cls.objects.filter(courier_id=rating.courier_id)
+        if not summaries.update(**changes):
+            cls.objects.get_or_create(courier_id=rating.courier_id)
+            summaries.update(**changes)
+
+    @staticmethod
+    def _average(total, count):
+        return round(total / count, 1) if count else 0
+
+    def averages(self):
+        """Average rating overall and per dimension"""
+        averages = {'overall': self._average(self.rating_sum, self.rating_count)}
+        for dimension in self.DIMENSIONS:
+            averages[dimension] = self._average(
+                getattr(self, f'{dimension}_sum'),
+                getattr(self, f'{dimension}_count')
+            )
+        return averages
+
+    def distribution(self):
+        """Number of ratings per star value"""
+        return {str(i): getattr(self, f'stars_{i}') for i in range(1, 6)}
 
 
 # =============================================================================
@@ -605,14 +888,9 @@ class ReferralCode(models.Model):
     @classmethod
     def generate_code(cls, user):
         """Generate a unique referral code for user"""
-        import random
-        import string
-        base = user.first_name.upper()[:4] if user.first_name else 'USER'
-        while True:
-            suffix = ''.join(random.choices(string.digits, k=4))
-            code = f"{base}{suffix}"
-            if not cls.objects.filter(code=code).exists():
-                return code
+        from core.utils.codes import REFERRAL_CODES
+        base = ''.join(ch for ch in user.first_name.upper() if ch.isalpha())[:4] or 'USER'
+        return REFERRAL_CODES.next(prefix=base)
 
 
 class Referral(models.Model):
@@ -668,29 +946,17 @@ class Wallet(models.Model):
 
     def credit(self, amount, description=''):
         """Add credits to wallet"""
-        self.balance += amount
-        self.total_earned += amount
-        self.save()
-        WalletTransaction.objects.create(
-            wallet=self,
-            amount=amount,
-            transaction_type='credit',
-            description=description
-        )
+        from core.utils.ledger import WALLETS
+        entry = WALLETS.credit(self.pk, amount, transaction_type='credit', description=description)
+        self.refresh_from_db(fields=['balance', 'total_earned', 'total_spent', 'updated_at'])
+        return entry
 
     def debit(self, amount, description=''):
-        """Deduct from wallet"""
-        if amount > self.balance:
-            raise ValueError("Insufficient balance")
-        self.balance -= amount
-        self.total_spent += amount
-        self.save()
-        WalletTransaction.objects.create(
-            wallet=self,
-            amount=amount,
-            transaction_type='debit',
-            description=description
-        )
+        """Deduct from wallet, raising ValueError if the balance is too low"""
+        from core.utils.ledger import WALLETS
+        entry = WALLETS.debit(self.pk, amount, transaction_type='debit', description=description)
+        self.refresh_from_db(fields=['balance', 'total_earned', 'total_spent', 'updated_at'])
+        return entry
 
 
 class WalletTransaction(models.Model):
@@ -916,13 +1182,9 @@ class TrackingLink(models.Model):
 
     @classmethod
     def generate_short_code(cls):
-        """Generate a unique 6-character code"""
-        import random
-        import string
-        while True:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            if not cls.objects.filter(short_code=code).exists():
-                return code
+        """Generate a unique 7-character code"""
+        from core.utils.codes import TRACKING_CODES
+        return TRACKING_CODES.next()
 
     def increment_views(self):
         self.view_count += 1
@@ -988,11 +1250,25 @@ class BusinessAccount(models.Model):
     def __str__(self):
         return f"{self.business_name} ({self.get_tier_display()})"
 
+    def save(self, *args, **kwargs):
+        from core.authentication import invalidate_api_key
+        super().save(*args, **kwargs)
+        # Cached API key lookups carry is_active and the owner id
+        invalidate_api_key(self.api_key)
+
+    def delete(self, *args, **kwargs):
+        from core.authentication import invalidate_api_key
+        invalidate_api_key(self.api_key)
+        return super().delete(*args, **kwargs)
+
     def generate_api_key(self):
         """Generate a new API key"""
         import secrets
+        from core.authentication import invalidate_api_key
+        old_key = self.api_key
         self.api_key = secrets.token_hex(32)
         self.save()
+        invalidate_api_key(old_key)
         return self.api_key
 
 
@@ -1044,6 +1320,21 @@ class BulkOrder(models.Model):
     
     def __str__(self):
         return f"{self.business.business_name} - {self.order_name}"
+    
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            was_completed = not is_new and BulkOrder.objects.filter(
+                pk=self.pk, status=self.STATUS_COMPLETED
+            ).exists()
+            super().save(*args, **kwargs)
+            increments = {'orders': 1} if is_new else {}
+            # Completions count on the day the order was placed, so a month's figure is its orders that finished
+            is_completed = self.status == self.STATUS_COMPLETED
+            if is_completed != was_completed:
+                increments['completed_orders'] = 1 if is_completed else -1
+            if increments:
+                BusinessDailyStats.record(self.business_id, date=timezone.localdate(self.created_at), **increments)
 
 
 class BulkDeliveryItem(models.Model):
@@ -1111,6 +1402,91 @@ class BulkDeliveryItem(models.Model):
     
     def __str__(self):
         return f"{self.bulk_order.business.business_name} - {self.item_name}"
+    
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                BusinessDailyStats.record_items(self.get_business_id(), [self])
+    
+    def get_business_id(self):
+        """The owning business, without loading the bulk order unless it is already at hand"""
+        if BulkDeliveryItem.bulk_order.is_cached(self):
+            return self.bulk_order.business_id
+        return BulkOrder.objects.values_list('business_id', flat=True).get(pk=self.bulk_order_id)
+    
+    def mark_delivered(self, actual_cost=None):
+        """Mark item as delivered and roll its cost into the order and business stats"""
+        from django.db.models import F
+        self.status = self.STATUS_DELIVERED
+        self.completed_at = timezone.now()
+        if actual_cost is not None:
+            self.actual_cost = actual_cost
+        with transaction.atomic():
+            self.save()
+            BulkOrder.objects.filter(pk=self.bulk_order_id).update(
+                completed_items=F('completed_items') + 1,
+                actual_cost=F('actual_cost') + self.actual_cost,
+            )
+            BusinessDailyStats.record(
+                self.get_business_id(),
+                delivered_items=1,
+                actual_cost=self.actual_cost,
+                # Billed like core.utils.invoices.BILLED_COST: the actual cost, or the estimate if none was recorded
+                billed_cost=self.actual_cost if self.actual_cost > 0 else self.estimated_cost,
+            )
+
+
+class BulkUpload(models.Model):
+    """Background ingestion of a bulk order CSV, see core.utils.bulk_import"""
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    bulk_order = models.OneToOneField(BulkOrder, on_delete=models.CASCADE, related_name='upload')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # Progress, advanced in the same transaction as each chunk of items
+    rows_processed = models.IntegerField(default=0)
+    rows_created = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)  # Set when the whole upload fails
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)  # Last committed chunk, used to spot stalled uploads
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.bulk_order.order_name} - {self.status} ({self.rows_processed} rows)"
+
+
+class BulkUploadError(models.Model):
+    """A CSV row that could not be turned into a delivery item"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    upload = models.ForeignKey(BulkUpload, on_delete=models.CASCADE, related_name='errors')
+    row_number = models.IntegerField()  # 1-based data row, header excluded
+    message = models.CharField(max_length=255)
+    row = models.JSONField(default=dict)  # Original values, so the row can be fixed and re-uploaded
+
+    class Meta:
+        ordering = ['row_number']
+
+    def __str__(self):
+        return f"Row {self.row_number}: {self.message}"
 
 
 class BusinessCredit(models.Model):
@@ -1189,7 +1565,7 @@ class BusinessInvoice(models.Model):
     
     # Charges
     subtotal = models.DecimalField(max_digits=15, decimal_places=2)
-    discount_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    discount_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)  # Already taken off the item costs
     tax_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     total_amount = models.DecimalField(max_digits=15, decimal_places=2)
     
@@ -1203,10 +1579,24 @@ class BusinessInvoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        unique_together = ('business', 'period_start', 'period_end')
+    
     def __str__(self):
         return f"Invoice {self.invoice_number}"
 
 
+class BusinessInvoiceItem(models.Model):
+    """A delivered item billed on an invoice, frozen at the cost it was billed at"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    invoice = models.ForeignKey(BusinessInvoice, on_delete=models.CASCADE, related_name='lines')
+    item = models.OneToOneField(BulkDeliveryItem, on_delete=models.CASCADE, related_name='invoice_line')
+    billed_cost = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.invoice.invoice_number} - {self.item_id}"
+
+
 class BusinessAPILog(models.Model):
     """Track all API requests for auditing"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -1219,12 +1609,168 @@ class BusinessAPILog(models.Model):
     response_data = models.JSONField(default=dict, blank=True)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    duration_ms = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)  # Request time; rows are written later in batches
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.business.business_name} - {self.endpoint} ({self.status_code})"
 
 
+class BusinessDailyStats(models.Model):
+    """Daily order and cost rollup per business, maintained as orders are placed and delivered"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(BusinessAccount, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    
+    # Volume
+    orders = models.IntegerField(default=0)
+    completed_orders = models.IntegerField(default=0)  # Of the orders placed that day
+    items = models.IntegerField(default=0)
+    delivered_items = models.IntegerField(default=0)
+    
+    # Cost
+    estimated_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    actual_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    billed_cost = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)  # See invoices.BILLED_COST
+    
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name_plural = 'Business Daily Stats'
+        ordering = ['-date']
+        unique_together = ('business', 'date')
+    
+    def __str__(self):
+        return f"{self.business.business_name} - {self.date}"
+    
+    @classmethod
+    def record(cls, business_id, date=None, **increments):
+        """Add increments to the business's row for the day with a single UPDATE"""
+        from django.db.models import F
+        date = date or timezone.localdate()
+        changes = {field: F(field) + amount for field, amount in increments.items()}
+        changes['updated_at'] = timezone.now()
+        
+        rows = cls.objects.filter(business_id=business_id, date=date)
+        if not rows.update(**changes):
+            cls.objects.get_or_create(business_id=business_id, date=date)
+            rows.update(**changes)
+    
+    @classmethod
+    def record_items(cls, business_id, items, date=None):
+        """Roll newly created delivery items into the day's totals and area counts"""
+        from collections import Counter
+        from decimal import Decimal
+        from core.utils.areas import normalize_area
+        if not items:
+            return
+        date = date or timezone.localdate()
+        
+        areas = Counter(normalize_area(item.delivery_address) for item in items)
+        routes = Counter(item.delivery_address for item in items)
+        cls.record(
+            business_id,
+            date=date,
+            items=len(items),
+            estimated_cost=sum(Decimal(str(item.estimated_cost)) for item in items),
+        )
+        for (area_id, area_name), count in areas.items():
+            BusinessAreaStats.record(business_id, area_id, area_name, count, date=date)
+        for address, count in routes.items():
+            BusinessRouteStats.record(business_id, address, count)
+
+
+class BusinessAreaStats(models.Model):
+    """Daily delivery count per business and normalized delivery area"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(BusinessAccount, on_delete=models.CASCADE, related_name='area_stats')
+    date = models.DateField()
+    area_id = models.CharField(max_length=100)  # See core.utils.areas.normalize_area
+    area_name = models.CharField(max_length=255)
+    items = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Business Area Stats'
+        unique_together = ('business', 'date', 'area_id')
+    
+    def __str__(self):
+        return f"{self.business.business_name} - {self.area_name} ({self.date})"
+    
+    @classmethod
+    def record(cls, business_id, area_id, area_name, count=1, date=None):
+        """Add count to the area's row for the day with a single UPDATE"""
+        from django.db.models import F
+        date = date or timezone.localdate()
+        
+        rows = cls.objects.filter(business_id=business_id, date=date, area_id=area_id)
+        if not rows.update(items=F('items') + count):
+            cls.objects.get_or_create(
+                business_id=business_id, date=date, area_id=area_id,
+                defaults={'area_name': area_name}
+            )
+            rows.update(items=F('items') + count)
+
+
+class BusinessRouteStats(models.Model):
+    """All-time delivery count per business and raw delivery address"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(BusinessAccount, on_delete=models.CASCADE, related_name='route_stats')
+    delivery_address = models.CharField(max_length=255)
+    items = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Business Route Stats'
+        unique_together = ('business', 'delivery_address')
+        indexes = [
+            models.Index(fields=['business', '-items']),
+        ]
+    
+    def __str__(self):
+        return f"{self.business.business_name} - {self.delivery_address}"
+    
+    @classmethod
+    def record(cls, business_id, delivery_address, count=1):
+        """Add count to the address's row with a single UPDATE"""
+        from django.db.models import F
+        
+        rows = cls.objects.filter(business_id=business_id, delivery_address=delivery_address)
+        if not rows.update(items=F('items') + count):
+            cls.objects.get_or_create(business_id=business_id, delivery_address=delivery_address)
+            rows.update(items=F('items') + count)
+
+
+class BusinessMonthlyUsage(models.Model):
+    """Deliveries counted against a business's tier quota per month, see core.utils.quotas"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(BusinessAccount, on_delete=models.CASCADE, related_name='monthly_usage')
+    month = models.DateField()  # First day of the month
+    deliveries = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name_plural = 'Business Monthly Usage'
+        unique_together = ('business', 'month')
+    
+    def __str__(self):
+        return f"{self.business.business_name} - {self.month:%Y-%m}: {self.deliveries}"
+    
+    @classmethod
+    def record(cls, business_id, month, deliveries):
+        """Add deliveries to the business's row for the month with a single UPDATE"""
+        from django.db.models import F
+        changes = {'deliveries': F('deliveries') + deliveries, 'updated_at': timezone.now()}
+        
+        rows = cls.objects.filter(business_id=business_id, month=month)
+        if not rows.update(**changes):
+            cls.objects.get_or_create(business_id=business_id, month=month)
+            rows.update(**changes)
+
+
 # =============================================================================
 # Micro-Hub Network for Hyper-Local Delivery
 # =============================================================================
@@ -1322,11 +1868,14 @@ class Hub(models.Model):
         return self.status == self.STATUS_ACTIVE and self.current_occupancy < self.storage_capacity
     
     def update_rating(self, new_rating):
-        """Update average rating"""
-        total = (self.average_rating * self.total_ratings) + new_rating
-        self.total_ratings += 1
-        self.average_rating = total / self.total_ratings
-        self.save()
+        """Fold a new rating into the average with a single atomic UPDATE"""
+        from django.db.models import F, FloatField
+        from django.db.models.functions import Cast
+        rating_total = Cast('average_rating', FloatField()) * F('total_ratings') + new_rating
+        Hub.objects.filter(pk=self.pk).update(
+            average_rating=rating_total / (F('total_ratings') + 1),
+            total_ratings=F('total_ratings') + 1,
+        )
 
 
 class HubDelivery(models.Model):
@@ -1395,30 +1944,35 @@ class HubDelivery(models.Model):
     
     def generate_pickup_code(self):
         """Generate unique 8-digit pickup code"""
-        import random
-        while True:
-            code = str(random.randint(10000000, 99999999))
-            if not HubDelivery.objects.filter(pickup_code=code).exists():
-                self.pickup_code = code
-                self.save()
-                return code
+        from core.utils.codes import PICKUP_CODES
+        self.pickup_code = PICKUP_CODES.next()
+        self.save()
+        return self.pickup_code
     
     def mark_arrived(self):
         """Mark parcel as arrived at hub"""
+        from django.db.models import F
         self.status = self.STATUS_AT_HUB
         self.arrived_at_hub = timezone.now()
-        self.hub.current_occupancy += 1
-        self.hub.save()
-        self.save()
+        with transaction.atomic():
+            self.save()
+            Hub.objects.filter(pk=self.hub_id).update(
+                current_occupancy=F('current_occupancy') + 1
+            )
+            HubDailyStats.record(self.hub_id, track_occupancy=True, arrivals=1)
     
     def mark_picked_up(self):
         """Mark parcel as picked up"""
+        from django.db.models import F
         self.status = self.STATUS_PICKED_UP
         self.picked_up_at = timezone.now()
-        self.hub.current_occupancy -= 1
-        self.hub.total_deliveries += 1
-        self.hub.save()
-        self.save()
+        with transaction.atomic():
+            self.save()
+            Hub.objects.filter(pk=self.hub_id).update(
+                current_occupancy=F('current_occupancy') - 1,
+                total_deliveries=F('total_deliveries') + 1
+            )
+            HubDailyStats.record(self.hub_id, track_occupancy=True, pickups=1)
 
 
 class HubTransaction(models.Model):
@@ -1460,6 +2014,17 @@ class HubTransaction(models.Model):
     def __str__(self):
         return f"{self.hub.hub_name} - {self.get_transaction_type_display()}: KES {self.amount}"
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new and self.transaction_type == self.TRANSACTION_COMMISSION:
+                HubDailyStats.record(
+                    self.hub_id,
+                    date=timezone.localdate(self.created_at),
+                    commissions=self.amount
+                )
+
 
 class HubRating(models.Model):
     """Customer ratings for hub service"""
@@ -1489,9 +2054,13 @@ class HubRating(models.Model):
         return f"{self.hub.hub_name} - {self.rating} stars"
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update hub average rating
-        self.hub.update_rating(self.rating)
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                # Update hub average rating and the day's rollup
+                self.hub.update_rating(self.rating)
+                HubDailyStats.record(self.hub_id, rating_sum=self.rating, rating_count=1)
 
 
 class HubPayout(models.Model):
@@ -1533,7 +2102,148 @@ class HubPayout(models.Model):
     class Meta:
         verbose_name_plural = 'Hub Payouts'
         ordering = ['-created_at']
+        unique_together = ('hub', 'period_start', 'period_end')
     
     def __str__(self):
         return f"{self.hub.hub_name} - KES {self.net_payout} ({self.period_start} to {self.period_end})"
 
+
+class HubDailyStats(models.Model):
+    """Daily activity rollup per hub, maintained as deliveries and payments happen"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    hub = models.ForeignKey(Hub, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    
+    # Parcel flow
+    arrivals = models.IntegerField(default=0)
+    pickups = models.IntegerField(default=0)
+    peak_occupancy = models.IntegerField(default=0)  # Highest occupancy after any arrival or pickup that day
+    
+    # Earnings
+    commissions = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    
+    # Ratings received
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name_plural = 'Hub Daily Stats'
+        ordering = ['-date']
+        unique_together = ('hub', 'date')
+    
+    def __str__(self):
+        return f"{self.hub.hub_name} - {self.date}"
+    
+    @classmethod
+    def record(cls, hub_id, date=None, track_occupancy=False, **increments):
+        """Add increments to the hub's row for the day with a single UPDATE"""
+        from django.db.models import F, OuterRef, Subquery
+        from django.db.models.functions import Greatest
+        date = date or timezone.localdate()
+        changes = {field: F(field) + amount for field, amount in increments.items()}
+        changes['updated_at'] = timezone.now()
+        if track_occupancy:
+            occupancy = Hub.objects.filter(pk=OuterRef('hub_id')).values('current_occupancy')
+            changes['peak_occupancy'] = Greatest(F('peak_occupancy'), Subquery(occupancy))
+        
+        rows = cls.objects.filter(hub_id=hub_id, date=date)
+        if not rows.update(**changes):
+            cls.objects.get_or_create(hub_id=hub_id, date=date)
+            rows.update(**changes)
+    
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
+
+# =============================================================================
+# Short Code Allocation
+# =============================================================================
+class CodeSequence(models.Model):
+    """Counter from which core.utils.codes reserves blocks of short codes"""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+# =============================================================================
+# Deduplicated Media Storage
+# =============================================================================
+class MediaBlob(models.Model):
+    """One stored file per distinct content, see core.storage.DedupFileSystemStorage"""
+    digest = models.CharField(max_length=64, primary_key=True)  # sha256 of the content
+    name = models.CharField(max_length=255, unique=True)  # Storage name handed out for it
+    size = models.BigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)  # Last time a reference was taken
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+    @classmethod
+    def acquire(cls, digest):
+        """Take a reference to an existing blob; False if there is no row for it"""
+        from django.db.models import F
+        return bool(cls.objects.filter(digest=digest).update(
+            references=F('references') + 1, updated_at=timezone.now()
+        ))
+
+    @classmethod
+    def record(cls, digest, name, size):
+        """Take a reference to a blob, creating its row if needed"""
+        if not cls.acquire(digest):
+            cls.objects.get_or_create(digest=digest, defaults={'name': name, 'size': size})
+            cls.acquire(digest)
+
+    @classmethod
+    def release(cls, name):
+        """Drop a reference; the file itself is only removed by the collect_media command"""
+        from django.db.models import F
+        cls.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+
+
+# =============================================================================
+# Resumable Photo Uploads
+# =============================================================================
+class PhotoUpload(models.Model):
+    """Pickup or delivery photo sent in chunks, attached to the job once complete"""
+    KIND_PICKUP = 'pickup'
+    KIND_DELIVERY = 'delivery'
+    KINDS = (
+        (KIND_PICKUP, 'Pickup Photo'),
+        (KIND_DELIVERY, 'Delivery Photo'),
+    )
+
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETED = 'completed'
+    STATUSES = (
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_COMPLETED, 'Completed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='photo_uploads')
+    courier = models.ForeignKey(Courier, on_delete=models.CASCADE, related_name='photo_uploads')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()  # Bytes in the finished file
+    received = models.PositiveIntegerField(default=0)  # Bytes written so far, always a prefix of the file
+    sha256 = models.CharField(max_length=64, blank=True)  # Optional checksum verified on finalize
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.job_id}: {self.received}/{self.size}"
+
+    @property
+    def path(self):
+        """Where the partial file is assembled"""
+        import os
+        from django.conf import settings
+        return os.path.join(settings.PHOTO_UPLOAD_DIR, f'{self.id}.part')
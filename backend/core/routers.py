@@ -0,0 +1,71 @@
+"""
+Database routing for Yanzi Parcels
+Sends reads from heavy read-only endpoints to a replica, everything else to default
+"""
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Per-request routing state, set by core.middleware.ReplicaRoutingMiddleware
+_state = Local()
+
+
+def use_replica(enabled=True):
+    """Allow (or stop) reads in the current request going to the replica"""
+    _state.use_replica = enabled
+
+
+def pin_to_primary():
+    """Send every remaining read in the current request to the primary"""
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def reset():
+    _state.use_replica = False
+    _state.pinned = False
+
+
+def replica_alias():
+    """The configured replica alias, or None if no replica is set up"""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def read_alias():
+    """The database a read issued now in the current request would go to"""
+    alias = replica_alias()
+    if not alias or not getattr(_state, 'use_replica', False) or is_pinned():
+        return DEFAULT_DB_ALIAS
+    # Reads inside a transaction must see the transaction's own rows
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+class ReplicaRouter:
+    """
+    Route reads to the replica only when the current request opted in and has
+    not written anything yet, so a request always sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica copies default's schema through replication, never through migrate
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,11 @@
+"""
+WebSocket URL routing for Yanzi Parcels
+"""
+from django.urls import path
+
+from core.consumers import ChatConsumer
+
+
+websocket_urlpatterns = [
+    path('ws/chat/<uuid:job_id>/', ChatConsumer.as_asgi()),
+]
@@ -7,10 +7,32 @@ from .models import (
     SavedAddress, Recipient, ScheduledDelivery,
     Rating, ReferralCode, Referral, Wallet, WalletTransaction,
     CashOnDelivery, DeliveryInsurance, InsuranceClaim,
-    TrackingLink, BusinessAccount, BulkOrder, BulkDeliveryItem,
+    TrackingLink, BusinessAccount, BulkOrder, BulkDeliveryItem, BulkUpload,
     BusinessCredit, BusinessCreditTransaction, BusinessInvoice, BusinessAPILog,
-    Hub, HubDelivery, HubTransaction, HubRating, HubPayout
+    Hub, HubDelivery, HubTransaction, HubRating, HubPayout, HubDailyStats,
+    PhotoUpload
 )
+from .utils import images
+
+
+class ImageRenditionsField(serializers.Field):
+    """Resized copies of an image field as {size: {format: url}}, null until they are ready"""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        urls = images.rendition_urls(instance, self.image_field)
+        request = self.context.get('request')
+        if urls and request is not None:
+            urls = {
+                size: {extension: request.build_absolute_uri(url) for extension, url in formats.items()}
+                for size, formats in urls.items()
+            }
+        return urls
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -161,13 +183,14 @@ class CourierSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     active_vehicle = VehicleSerializer(read_only=True)
     available_vehicle_types = serializers.ListField(read_only=True)
+    profile_photo_thumbnails = ImageRenditionsField('profile_photo')
     
     class Meta:
         model = Courier
         fields = [
             'id', 'user', 'lat', 'lng', 'paypal_email', 'fcm_token',
             'active_vehicle', 'available_vehicle_types', 'is_verified',
-            'rating', 'total_deliveries', 'profile_photo'
+            'rating', 'total_deliveries', 'profile_photo', 'profile_photo_thumbnails'
         ]
         read_only_fields = ['id', 'is_verified', 'rating', 'total_deliveries']
 
@@ -181,6 +204,7 @@ class CourierProfileSerializer(serializers.ModelSerializer):
     total_km = serializers.SerializerMethodField()
     vehicles = VehicleSerializer(many=True, read_only=True)
     active_vehicle = VehicleSerializer(read_only=True)
+    profile_photo_thumbnails = ImageRenditionsField('profile_photo')
     
     class Meta:
         model = Courier
@@ -188,7 +212,7 @@ class CourierProfileSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'email', 'paypal_email',
             'total_earnings', 'total_jobs', 'total_km',
             'is_verified', 'rating', 'total_deliveries',
-            'national_id', 'driving_license', 'profile_photo',
+            'national_id', 'driving_license', 'profile_photo', 'profile_photo_thumbnails',
             'vehicles', 'active_vehicle'
         ]
         read_only_fields = ['id', 'email', 'total_earnings', 'total_jobs', 'total_km', 'is_verified', 'rating']
@@ -237,6 +261,7 @@ class JobListSerializer(serializers.ModelSerializer):
     size_display = serializers.CharField(source='get_size_display', read_only=True)
     weight_display = serializers.CharField(source='get_weight_display', read_only=True)
     vehicle_type_display = serializers.CharField(source='get_vehicle_type_display', read_only=True)
+    photo_thumbnails = ImageRenditionsField('photo')
     
     class Meta:
         model = Job
@@ -244,7 +269,7 @@ class JobListSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'category', 'category_name', 
             'size', 'size_display', 'weight', 'weight_display',
             'vehicle_type', 'vehicle_type_display',
-            'quantity', 'photo', 'status', 'status_display', 'created_at',
+            'quantity', 'photo', 'photo_thumbnails', 'status', 'status_display', 'created_at',
             'pickup_address', 'delivery_address', 'distance', 'duration', 'price',
             'customer_name', 'courier_name'
         ]
@@ -259,10 +284,13 @@ class JobDetailSerializer(serializers.ModelSerializer):
     size_display = serializers.CharField(source='get_size_display', read_only=True)
     weight_display = serializers.CharField(source='get_weight_display', read_only=True)
     vehicle_type_display = serializers.CharField(source='get_vehicle_type_display', read_only=True)
+    photo_thumbnails = ImageRenditionsField('photo')
+    pickup_photo_thumbnails = ImageRenditionsField('pickup_photo')
+    delivery_photo_thumbnails = ImageRenditionsField('delivery_photo')
     
     class Meta:
         model = Job
-        fields = '__all__'
+        exclude = ['renditions']
         read_only_fields = ['id', 'customer', 'courier', 'created_at', 'price', 'distance', 'duration']
 
 
@@ -296,6 +324,32 @@ class JobCourierUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ['status']
 
 
+class PhotoUploadSerializer(serializers.ModelSerializer):
+    """Chunked photo upload; `offset` is where the next chunk must start"""
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = PhotoUpload
+        fields = ['id', 'job', 'kind', 'filename', 'size', 'offset', 'sha256', 'status', 'created_at']
+        read_only_fields = fields
+
+
+class PhotoUploadCreateSerializer(serializers.Serializer):
+    size = serializers.IntegerField(min_value=1)
+    filename = serializers.CharField(max_length=255, required=False, default='photo.jpg')
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, default='')
+
+    def validate_size(self, value):
+        from django.conf import settings
+        if value > settings.PHOTO_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Photos are limited to {settings.PHOTO_UPLOAD_MAX_BYTES} bytes")
+        return value
+
+    def validate_filename(self, value):
+        import os
+        return os.path.basename(value) or 'photo.jpg'
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     job_name = serializers.CharField(source='job.name', read_only=True)
     
@@ -941,6 +995,18 @@ class BulkOrderCreateSerializer(serializers.ModelSerializer):
         fields = ['order_name', 'description']
 
 
+class BulkUploadSerializer(serializers.ModelSerializer):
+    bulk_order_id = serializers.UUIDField(read_only=True)
+    
+    class Meta:
+        model = BulkUpload
+        fields = [
+            'id', 'bulk_order_id', 'status', 'rows_processed', 'rows_created',
+            'rows_failed', 'error_message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class BusinessCreditSerializer(serializers.ModelSerializer):
     business_name = serializers.CharField(source='business.business_name', read_only=True)
     
@@ -977,9 +1043,9 @@ class BusinessAPILogSerializer(serializers.ModelSerializer):
         model = BusinessAPILog
         fields = [
             'id', 'endpoint', 'method', 'status_code', 'ip_address',
-            'created_at'
+            'duration_ms', 'created_at'
         ]
-        read_only_fields = ['id', 'endpoint', 'method', 'status_code', 'ip_address', 'created_at']
+        read_only_fields = ['id', 'endpoint', 'method', 'status_code', 'ip_address', 'duration_ms', 'created_at']
 
 
 # =============================================================================
@@ -1111,3 +1177,13 @@ class HubPayoutSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'hub_name', 'net_payout', 'created_at']
 
+
+class HubDailyStatsSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = HubDailyStats
+        fields = [
+            'date', 'arrivals', 'pickups', 'peak_occupancy', 'commissions',
+            'rating_count', 'average_rating'
+        ]
@@ -0,0 +1,40 @@
+"""
+Signal handlers for Yanzi Parcels
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.authentication import invalidate_api_owner
+from core.models import Category, Courier, Customer, Job, QuickMessage
+from core.utils import images, reference_cache
+
+
+@receiver([post_save, post_delete], sender=Category)
+def categories_changed(sender, **kwargs):
+    reference_cache.bump('categories')
+
+
+@receiver([post_save, post_delete], sender=QuickMessage)
+def quick_messages_changed(sender, **kwargs):
+    reference_cache.bump('quick_messages')
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_api_owner(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Courier)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_api_owner(instance.user_id)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Courier)
+def photos_changed(sender, instance, update_fields=None, **kwargs):
+    fields = images.IMAGE_FIELDS[sender]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return  # Frequent partial saves such as courier locations skip the check entirely
+    images.schedule(instance)
@@ -0,0 +1,90 @@
+"""
+Content-addressed media storage for Yanzi Parcels
+Every upload is hashed while it is written, and identical content is kept
+once under blobs/<2 hex>/<2 hex>/<sha256><ext>. The name stored on the model
+is the blob name, so a photo uploaded again for a reorder or a bulk item
+costs one row update instead of another copy on disk.
+MediaBlob counts the references handed out; unreferenced blobs are removed by
+the collect_media command rather than on delete, so an upload racing a
+delete can never lose its file.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_PREFIX = 'blobs'
+
+
+def blob_name(digest, extension):
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_blob(name):
+    return name.startswith(BLOB_PREFIX + '/')
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage that stores each distinct file once and reference-counts
+    it. URLs are signed (see core.utils.media), since files are only served to
+    whoever the API handed their URL to.
+    """
+
+    def url(self, name):
+        from core.utils.media import signed_query
+        return f'{super().url(name)}?{signed_query(name)}'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, so there is nothing to make unique here
+        return name
+
+    def _save(self, name, content):
+        from core.models import MediaBlob
+
+        temp_path, digest, size = self._write_temp(content)
+        try:
+            existing = MediaBlob.objects.filter(digest=digest).values_list('name', flat=True).first()
+            if existing and self.exists(existing) and MediaBlob.acquire(digest):
+                return existing
+
+            name = existing or blob_name(digest, os.path.splitext(name)[1].lower())
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            # Atomic, and harmless if a concurrent upload of the same content got there first
+            os.replace(temp_path, path)
+            temp_path = None
+            MediaBlob.record(digest, name, size)
+            return name
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    def _write_temp(self, content):
+        """Copy content to a temporary file under the storage root, hashing it on the way"""
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp.write(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    def delete(self, name):
+        if name and is_blob(name):
+            from core.models import MediaBlob
+            MediaBlob.release(name)
+        else:
+            super().delete(name)
@@ -0,0 +1,72 @@
+"""Small helpers creating the rows most tests need"""
+import itertools
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from PIL import Image
+
+from core.models import BulkDeliveryItem, BusinessAccount, Courier, Customer, Hub, Job
+
+_sequence = itertools.count(1)
+
+
+def make_user(**fields):
+    n = next(_sequence)
+    fields.setdefault('username', f'user{n}')
+    fields.setdefault('email', f'user{n}@example.com')
+    return User.objects.create_user(**fields)
+
+
+def make_customer(**fields):
+    return Customer.objects.create(user=make_user(), **fields)
+
+
+def make_courier(**fields):
+    return Courier.objects.create(user=make_user(), **fields)
+
+
+def make_job(customer=None, **fields):
+    fields.setdefault('name', 'Parcel')
+    fields.setdefault('description', 'A parcel')
+    return Job.objects.create(customer=customer or make_customer(), **fields)
+
+
+def make_business(**fields):
+    n = next(_sequence)
+    fields.setdefault('owner', make_user())
+    fields.setdefault('business_name', f'Business {n}')
+    fields.setdefault('contact_name', 'Owner')
+    fields.setdefault('contact_email', f'business{n}@example.com')
+    fields.setdefault('contact_phone', '0700000000')
+    fields.setdefault('business_address', 'Nairobi')
+    fields.setdefault('api_key', f'test-key-{n:08d}')
+    return BusinessAccount.objects.create(**fields)
+
+
+def make_item(bulk_order, address='12 Moi Avenue, Westlands, Nairobi', cost='100.00', **fields):
+    return BulkDeliveryItem.objects.create(
+        bulk_order=bulk_order, customer_name='Recipient', customer_phone='0711000000',
+        pickup_address='Warehouse', pickup_phone='0700000000', pickup_lat=0, pickup_lng=0,
+        delivery_address=address, delivery_phone='0711000000', delivery_lat=0, delivery_lng=0,
+        item_name='Box', weight_kg=1, size='small', estimated_cost=Decimal(cost), **fields
+    )
+
+
+def make_hub(**fields):
+    n = next(_sequence)
+    fields.setdefault('partner', make_user())
+    fields.setdefault('hub_name', f'Hub {n}')
+    fields.setdefault('hub_code', f'HUB{n:04d}')
+    for name, value in (('address', 'Moi Avenue'), ('latitude', 0), ('longitude', 0), ('city', 'Nairobi'),
+                        ('area', 'CBD'), ('contact_name', 'Partner'), ('contact_phone', '0700000000'),
+                        ('mpesa_number', '0700000000'), ('mpesa_name', 'Partner')):
+        fields.setdefault(name, value)
+    return Hub.objects.create(**fields)
+
+
+def make_jpeg(size=(1600, 1200), color='orange', **options):
+    """Bytes of a JPEG image; options such as exif= go to Image.save()"""
+    content = BytesIO()
+    Image.new('RGB', size, color).save(content, 'JPEG', **options)
+    return content.getvalue()
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework import exceptions
+from rest_framework.test import APIClient
+
+from core.authentication import BusinessAPIKeyAuthentication
+from core.models import Customer
+from core.tests.factories import make_business
+
+
+class BusinessAPIKeyAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.business = make_business()
+        self.authentication = BusinessAPIKeyAuthentication()
+
+    def authenticate(self, api_key):
+        return self.authentication.authenticate(RequestFactory().get('/', HTTP_X_API_KEY=api_key))
+
+    def test_cached_key_costs_no_queries(self):
+        user, business = self.authenticate(self.business.api_key)
+        self.assertEqual((user, business), (self.business.owner, self.business))
+
+        with self.assertNumQueries(0):
+            user, business = self.authenticate(self.business.api_key)
+            self.assertFalse(hasattr(user, 'customer'))
+            self.assertFalse(user.is_staff)
+            self.assertEqual(business.owner, user)
+        # Fields authorization does not need are still there, loaded on first use
+        self.assertEqual(business.business_name, self.business.business_name)
+        self.assertEqual(user.username, self.business.owner.username)
+
+    def test_profiles_are_never_stale(self):
+        self.authenticate(self.business.api_key)
+        customer = Customer.objects.create(user=self.business.owner)
+        user, _ = self.authenticate(self.business.api_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.customer.pk, customer.pk)
+
+    def test_saving_the_owner_drops_the_cached_owner(self):
+        self.authenticate(self.business.api_key)
+        owner = self.business.owner
+        owner.is_active = False
+        owner.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.business.api_key)
+
+    def test_unknown_key_is_refused_and_cached(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('guessed')
+        with self.assertNumQueries(0), self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('guessed')
+
+    def test_no_header_leaves_it_to_other_backends(self):
+        self.assertIsNone(self.authentication.authenticate(RequestFactory().get('/')))
+
+    def test_saving_the_account_drops_the_cached_lookup(self):
+        self.authenticate(self.business.api_key)
+        self.business.is_active = False
+        self.business.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.business.api_key)
+
+    def test_regenerated_key_replaces_the_old_one(self):
+        old_key = self.business.api_key
+        self.authenticate(old_key)
+        new_key = self.business.generate_api_key()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(old_key)
+        self.assertEqual(self.authenticate(new_key)[1], self.business)
+
+    def test_endpoints_accept_the_key(self):
+        client = APIClient()
+        url = reverse('api_bulk_orders')
+        self.assertEqual(client.get(url, HTTP_X_API_KEY=self.business.api_key).status_code, 200)
+        self.assertEqual(client.get(url, HTTP_X_API_KEY='guessed').status_code, 401)
@@ -0,0 +1,85 @@
+import os
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from core.middleware import BusinessAPILogMiddleware
+from core.models import BusinessAPILog
+from core.tests.factories import make_business, make_user
+from core.utils import api_log
+
+
+def quiet_buffer(capacity=10):
+    """A buffer whose flusher thread is never started, so tests flush it themselves"""
+    buffer = api_log.APILogBuffer(capacity=capacity, flush_seconds=60, flush_batch=100)
+    buffer.background = True
+    buffer._pid = os.getpid()
+    return buffer
+
+
+def entry(api_key='', user_id=None, endpoint='/api/business/dashboard/'):
+    return (api_key, user_id, endpoint, 'GET', 200, '127.0.0.1', 'tests', 12, timezone.now())
+
+
+class APILogBufferTests(TestCase):
+    def test_flush_resolves_keys_and_owners(self):
+        business = make_business()
+        buffer = quiet_buffer()
+        buffer.append(entry(api_key=business.api_key))
+        buffer.append(entry(user_id=business.owner_id))
+        buffer.append(entry(api_key='unknown-key'))
+        buffer.append(entry(user_id=make_user().pk))
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(BusinessAPILog.objects.filter(business=business).count(), 2)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_buffer_drops_the_oldest(self):
+        business = make_business()
+        buffer = quiet_buffer(capacity=2)
+        for n in range(3):
+            buffer.append(entry(api_key=business.api_key, endpoint=f'/api/business/{n}/'))
+
+        self.assertEqual(buffer.dropped, 1)
+        buffer.flush()
+        self.assertEqual(
+            sorted(BusinessAPILog.objects.values_list('endpoint', flat=True)),
+            ['/api/business/1/', '/api/business/2/']
+        )
+
+
+    def test_unstarted_buffer_writes_during_the_request(self):
+        business = make_business()
+        buffer = api_log.APILogBuffer(capacity=10, flush_seconds=60, flush_batch=100)
+        buffer.append(entry(api_key=business.api_key))
+
+        self.assertEqual(len(buffer.entries), 0)
+        self.assertEqual(BusinessAPILog.objects.filter(business=business).count(), 1)
+        self.assertIsNone(buffer._pid)
+
+    def test_start_drains_the_buffer_at_exit(self):
+        buffer = api_log.APILogBuffer(capacity=10, flush_seconds=60, flush_batch=100)
+        with mock.patch.object(api_log.atexit, 'register') as register:
+            buffer.start()
+        register.assert_called_once_with(buffer.flush)
+        self.assertTrue(buffer.background)
+
+
+class BusinessAPILogMiddlewareTests(TestCase):
+    def test_captures_business_requests_only(self):
+        buffer = quiet_buffer()
+        with mock.patch.object(api_log, 'buffer', buffer):
+            middleware = BusinessAPILogMiddleware(lambda request: HttpResponse(status=201))
+        factory = RequestFactory()
+
+        middleware(factory.post('/api/business/bulk-orders/', HTTP_X_API_KEY='key-1'))
+        anonymous = factory.get('/api/business/dashboard/')
+        anonymous.user = None
+        middleware(anonymous)
+        middleware(factory.get('/api/customer/jobs/'))
+
+        self.assertEqual(len(buffer.entries), 1)
+        api_key, user_id, endpoint, method, status_code = buffer.entries[0][:5]
+        self.assertEqual((api_key, endpoint, method, status_code), ('key-1', '/api/business/bulk-orders/', 'POST', 201))
@@ -0,0 +1,93 @@
+import csv
+import io
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import BulkOrder, BulkUpload, BusinessAccount
+from core.tests.factories import make_business
+from core.utils import bulk_import
+
+HEADER = ['customer_name', 'customer_phone', 'delivery_address', 'item_name', 'weight_kg', 'size']
+
+
+def row(n, **fields):
+    values = dict(zip(HEADER, [f'Customer {n}', '0711000000', 'Kilimani', 'Shoes', '1.5', 'small']))
+    values.update(fields)
+    return values
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.business = make_business(tier=BusinessAccount.TIER_ENTERPRISE)
+
+    def upload(self, rows):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+        bulk_order = BulkOrder.objects.create(business=self.business, order_name='Import')
+        bulk_order.csv_file.save('orders.csv', ContentFile(out.getvalue().encode()))
+        return BulkUpload.objects.create(bulk_order=bulk_order)
+
+    def process(self, upload, chunk_size=2):
+        self.assertTrue(bulk_import.claim(upload.pk))
+        bulk_import.process_upload(upload.pk, chunk_size=chunk_size)
+        upload.refresh_from_db()
+        return upload
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        upload = self.upload([
+            row(1), row(2, size='huge'), row(3), row(4, weight_kg='heavy'), row(5, customer_name=''),
+        ])
+        upload = self.process(upload)
+
+        self.assertEqual(upload.status, BulkUpload.STATUS_COMPLETED)
+        self.assertEqual((upload.rows_processed, upload.rows_created, upload.rows_failed), (5, 2, 3))
+        bulk_order = upload.bulk_order
+        bulk_order.refresh_from_db()
+        self.assertEqual(bulk_order.items.count(), 2)
+        self.assertEqual(bulk_order.total_items, 2)
+        self.assertEqual(bulk_order.estimated_cost, sum(item.estimated_cost for item in bulk_order.items.all()))
+
+        header, rows = bulk_import.error_report(upload)
+        self.assertEqual(header[:2], ['row_number', 'error'])
+        self.assertEqual([line[0] for line in rows], [2, 4, 5])
+
+    def test_resumes_after_the_last_committed_chunk(self):
+        upload = self.upload([row(n) for n in range(1, 6)])
+        BulkUpload.objects.filter(pk=upload.pk).update(rows_processed=2)
+        upload = self.process(upload)
+
+        self.assertEqual(upload.rows_processed, 5)
+        self.assertEqual(list(upload.bulk_order.items.values_list('customer_name', flat=True).order_by('customer_name')),
+                         ['Customer 3', 'Customer 4', 'Customer 5'])
+
+    def test_an_upload_is_claimed_once(self):
+        upload = self.upload([row(1)])
+        self.assertTrue(bulk_import.claim(upload.pk))
+        self.assertFalse(bulk_import.claim(upload.pk))
+
+    def test_rows_beyond_the_quota_are_reported(self):
+        self.business.tier = BusinessAccount.TIER_STARTER
+        self.business.save()
+        upload = self.process(self.upload([row(n) for n in range(1, 56)]), chunk_size=20)
+
+        self.assertEqual((upload.rows_created, upload.rows_failed), (50, 5))
+        self.assertEqual(set(upload.errors.values_list('message', flat=True)), {'Monthly delivery quota reached'})
+
+    def test_status_endpoint(self):
+        upload = self.process(self.upload([row(1), row(2, size='huge')]))
+        client = APIClient()
+        client.force_authenticate(self.business.owner)
+
+        response = client.get(reverse('api_bulk_upload_status', args=[upload.bulk_order_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows_created'], response.data['rows_failed']), (1, 1))
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import BulkDeliveryItem, BulkOrder, BusinessDailyStats, BusinessRouteStats
+from core.tests.factories import make_business, make_item
+
+
+class BusinessStatsTests(TestCase):
+    def setUp(self):
+        self.business = make_business()
+        self.client = APIClient()
+        self.client.force_authenticate(self.business.owner)
+
+    def today(self):
+        return BusinessDailyStats.objects.get(business=self.business, date=timezone.localdate())
+
+    def test_orders_items_and_deliveries_roll_up(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        first = make_item(order)
+        make_item(order, cost='50.00')
+        first.mark_delivered(actual_cost=Decimal('80.00'))
+
+        stats = self.today()
+        self.assertEqual((stats.orders, stats.items, stats.delivered_items), (1, 2, 1))
+        self.assertEqual((stats.estimated_cost, stats.actual_cost), (Decimal('150.00'), Decimal('80.00')))
+
+    def test_item_created_from_an_order_id_only_reads_its_business(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        item = BulkDeliveryItem(bulk_order_id=order.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(item.get_business_id(), self.business.pk)
+        item.bulk_order = order
+        with self.assertNumQueries(0):
+            item.get_business_id()
+
+    def test_dashboard_counts_orders_as_deliveries(self):
+        done = BulkOrder.objects.create(business=self.business, order_name='Done', status=BulkOrder.STATUS_COMPLETED)
+        open_order = BulkOrder.objects.create(business=self.business, order_name='Open')
+        for order in (done, done, open_order):
+            make_item(order)
+
+        data = self.client.get(reverse('api_business_dashboard', args=[self.business.pk])).data
+        self.assertEqual((data['total_deliveries'], data['month_deliveries']), (2, 1))
+        self.assertEqual((data['total_items'], data['month_delivered_items']), (3, 0))
+
+    def test_analytics_keeps_routes_by_address_and_adds_areas(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        make_item(order, address='12 Moi Avenue, Westlands, Nairobi')
+        make_item(order, address='12 Moi Avenue, Westlands, Nairobi')
+        make_item(order, address='3 Ring Road, Westlands, Nairobi')
+
+        data = self.client.get(reverse('api_business_analytics', args=[self.business.pk])).data
+        self.assertEqual(data['top_routes'][0], {'address': '12 Moi Avenue, Westlands, Nairobi', 'count': 2})
+        self.assertEqual(data['top_areas'], [{'area_id': 'westlands', 'area_name': 'Westlands', 'count': 3}])
+
+    def test_top_routes_come_from_the_rollup(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        for address in ('12 Moi Avenue, Westlands, Nairobi', '12 Moi Avenue, Westlands, Nairobi', '3 Ring Road'):
+            make_item(order, address=address)
+        BulkDeliveryItem.objects.all().delete()
+
+        data = self.client.get(reverse('api_business_analytics', args=[self.business.pk])).data
+        self.assertEqual(data['top_routes'], [
+            {'address': '12 Moi Avenue, Westlands, Nairobi', 'count': 2},
+            {'address': '3 Ring Road', 'count': 1},
+        ])
+
+    def test_completed_orders_roll_up_on_their_order_day(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        url = reverse('api_business_dashboard', args=[self.business.pk])
+        order.status = BulkOrder.STATUS_COMPLETED
+        order.save()
+        order.save()
+        self.assertEqual(self.today().completed_orders, 1)
+        self.assertEqual(self.client.get(url).data['month_deliveries'], 1)
+
+        order.status = BulkOrder.STATUS_FAILED
+        order.save()
+        self.assertEqual(self.today().completed_orders, 0)
+
+    def test_backfill_rebuilds_the_same_rows(self):
+        order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        make_item(order).mark_delivered(actual_cost=Decimal('90.00'))
+        make_item(order)
+        BulkOrder.objects.create(business=self.business, order_name='Done', status=BulkOrder.STATUS_COMPLETED)
+        live = self.today()
+        routes = list(self.business.route_stats.values_list('delivery_address', 'items'))
+
+        BusinessDailyStats.objects.all().delete()
+        BusinessRouteStats.objects.all().delete()
+        call_command('backfill_business_stats', stdout=StringIO())
+        rebuilt = self.today()
+        for field in ('orders', 'completed_orders', 'items', 'delivered_items', 'estimated_cost', 'actual_cost'):
+            self.assertEqual(getattr(rebuilt, field), getattr(live, field), field)
+        self.assertEqual(list(self.business.route_stats.values_list('delivery_address', 'items')), routes)
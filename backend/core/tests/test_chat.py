@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import ChatUnreadCount, Job, Message
+from core.tests.factories import make_courier, make_customer, make_job
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        self.courier = make_courier()
+        self.job = make_job(self.customer, courier=self.courier, status=Job.DELIVERING_STATUS)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.user)
+
+    def message(self, sender_type, content, seconds=0):
+        return Message.objects.create(
+            job=self.job, sender_type=sender_type, content=content,
+            sender_user=self.courier.user if sender_type == Message.SENDER_COURIER else self.customer.user,
+            created_at=timezone.now() + timedelta(seconds=seconds),
+        )
+
+
+class ChatSyncTests(ChatTestCase):
+    def sync(self, **params):
+        return self.client.get(reverse('api_chat_sync', args=[self.job.id]), params)
+
+    def test_returns_only_messages_after_the_cursor(self):
+        first = self.message(Message.SENDER_COURIER, 'On my way', seconds=1)
+        data = self.sync().data
+        self.assertEqual([m['content'] for m in data['messages']], ['On my way'])
+        self.assertEqual(data['cursor'], str(first.id))
+
+        self.message(Message.SENDER_CUSTOMER, 'Thanks', seconds=2)
+        self.message(Message.SENDER_COURIER, 'Outside', seconds=3)
+        data = self.sync(after=data['cursor']).data
+        self.assertEqual([m['content'] for m in data['messages']], ['Thanks', 'Outside'])
+
+        data = self.sync(after=data['cursor']).data
+        self.assertEqual((data['messages'], data['has_more']), ([], False))
+
+    def test_marks_incoming_messages_read_unless_asked_not_to(self):
+        self.message(Message.SENDER_COURIER, 'Here')
+        self.assertEqual(self.sync(mark_read='false').data['unread_count'], 1)
+        self.assertEqual(self.sync().data['unread_count'], 0)
+        self.assertTrue(Message.objects.get().is_read)
+
+    def test_unknown_cursor_and_strangers_are_refused(self):
+        self.assertEqual(self.sync(after='not-a-uuid').status_code, 400)
+        self.client.force_authenticate(make_customer().user)
+        self.assertEqual(self.sync().status_code, 404)
+
+    def test_pages_long_histories(self):
+        Message.objects.bulk_create([
+            Message(job=self.job, sender_type=Message.SENDER_COURIER, content=str(i),
+                    created_at=timezone.now() + timedelta(seconds=i))
+            for i in range(205)
+        ])
+        data = self.sync(mark_read='false').data
+        self.assertEqual((len(data['messages']), data['has_more']), (200, True))
+        data = self.sync(after=data['cursor'], mark_read='false').data
+        self.assertEqual([m['content'] for m in data['messages']], ['200', '201', '202', '203', '204'])
+
+
+class UnreadCountTests(ChatTestCase):
+    def test_counters_follow_messages_sent_and_read(self):
+        self.message(Message.SENDER_COURIER, 'Here')
+        self.message(Message.SENDER_COURIER, 'Still here')
+        self.message(Message.SENDER_CUSTOMER, 'Coming')
+
+        self.assertEqual(ChatUnreadCount.for_job(self.job.id, self.customer.user.id), 2)
+        self.assertEqual(ChatUnreadCount.for_job(self.job.id, self.courier.user.id), 1)
+        data = self.client.get(reverse('api_chat_unread_all')).data
+        self.assertEqual((data['unread_counts'], data['total']), ({str(self.job.id): 2}, 2))
+
+        response = self.client.post(reverse('api_chat_mark_read', args=[self.job.id]))
+        self.assertEqual(response.data['marked_read'], 2)
+        self.assertEqual(self.client.get(reverse('api_chat_unread', args=[self.job.id])).data['unread_count'], 0)
+        self.assertEqual(ChatUnreadCount.for_job(self.job.id, self.courier.user.id), 1)
+
+    def test_closed_chats_are_left_out_of_the_totals(self):
+        self.message(Message.SENDER_COURIER, 'Delivered')
+        Job.objects.filter(pk=self.job.pk).update(status=Job.COMPLETED_STATUS)
+        self.assertEqual(self.client.get(reverse('api_chat_unread_all')).data['total'], 0)
+
+    def test_clearing_never_goes_below_zero(self):
+        self.message(Message.SENDER_COURIER, 'Here')
+        ChatUnreadCount.clear(self.job.id, self.customer.user.id, count=5)
+        self.assertEqual(ChatUnreadCount.for_job(self.job.id, self.customer.user.id), 0)
@@ -0,0 +1,68 @@
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import TransactionTestCase
+
+from core.models import Job, Message
+from core.routing import websocket_urlpatterns
+from core.tests.factories import make_courier, make_customer, make_job
+from core.utils.chat import is_online
+
+
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        self.courier = make_courier()
+        self.job = make_job(self.customer, courier=self.courier, status=Job.DELIVERING_STATUS)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.job.id}/')
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_messages_and_read_receipts_reach_both_sockets(self):
+        async def scenario():
+            customer = self.communicator(self.customer.user)
+            courier = self.communicator(self.courier.user)
+            self.assertTrue((await customer.connect())[0])
+            self.assertTrue((await courier.connect())[0])
+
+            await courier.send_json_to({'type': 'message', 'content': 'At the gate'})
+            for socket in (customer, courier):
+                event = await socket.receive_json_from()
+                self.assertEqual((event['type'], event['message']['content']), ('message', 'At the gate'))
+
+            await customer.send_json_to({'type': 'read', 'message_ids': [event['message']['id'], 'junk']})
+            receipt = await courier.receive_json_from(timeout=3)
+            self.assertEqual(receipt, {'type': 'read', 'message_ids': [event['message']['id']]})
+
+            await customer.disconnect()
+            await courier.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertTrue(Message.objects.get().is_read)
+        self.assertFalse(is_online(self.job.id, self.customer.user.id))
+
+    def test_strangers_and_anonymous_users_are_turned_away(self):
+        stranger = make_customer().user
+
+        async def scenario():
+            for user, code in ((AnonymousUser(), 4401), (stranger, 4403)):
+                connected, close_code = await self.communicator(user).connect()
+                self.assertEqual((connected, close_code), (False, code))
+
+        async_to_sync(scenario)()
+
+    def test_closed_jobs_refuse_messages(self):
+        Job.objects.filter(pk=self.job.pk).update(status=Job.COMPLETED_STATUS)
+
+        async def scenario():
+            socket = self.communicator(self.customer.user)
+            await socket.connect()
+            await socket.send_json_to({'type': 'message', 'content': 'Hello?'})
+            self.assertEqual((await socket.receive_json_from())['type'], 'error')
+            await socket.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertFalse(Message.objects.exists())
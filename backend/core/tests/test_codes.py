@@ -0,0 +1,44 @@
+import string
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from core.utils.codes import CodeAllocator, CodesExhausted
+
+
+class CodeAllocatorTests(TransactionTestCase):
+    def test_codes_are_unique_and_formatted(self):
+        allocator = CodeAllocator('test-unique', string.digits, 4, prefix='T', block_size=10)
+        codes = allocator.allocate(25) + [allocator.next() for _ in range(30)]
+        self.assertEqual(len(set(codes)), 55)
+        self.assertTrue(all(code.startswith('T') and len(code) == 5 for code in codes))
+        self.assertTrue(allocator.next(prefix='X').startswith('X'))
+
+    def test_processes_sharing_a_sequence_never_collide(self):
+        first = CodeAllocator('test-shared', string.digits, 4, block_size=10)
+        second = CodeAllocator('test-shared', string.digits, 4, block_size=10)
+        codes = first.allocate(15) + second.allocate(15) + first.allocate(15)
+        self.assertEqual(len(set(codes)), 45)
+
+    def test_exhausted_space(self):
+        allocator = CodeAllocator('test-small', '01', 3, block_size=4)
+        self.assertEqual(len(set(allocator.allocate(8))), 8)
+        with self.assertRaises(CodesExhausted):
+            allocator.next()
+
+
+class RolledBackReservationTests(TestCase):
+    def test_rolled_back_block_is_not_reused(self):
+        allocator = CodeAllocator('test-rollback', string.digits, 4, block_size=100)
+        try:
+            with transaction.atomic():
+                allocator.next()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # The sequence went back to where it was, so another process starts from
+        # the same counters: the first allocator must not still hold them
+        mine = allocator.allocate(5)
+        theirs = CodeAllocator('test-rollback', string.digits, 4, block_size=100).allocate(5)
+        self.assertFalse(set(mine) & set(theirs))
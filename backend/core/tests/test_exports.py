@@ -0,0 +1,46 @@
+import csv
+import gzip
+import io
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import HubTransaction
+from core.tests.factories import make_hub
+
+
+def read_csv(response):
+    return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+
+class HubTransactionExportTests(TestCase):
+    def setUp(self):
+        self.hub = make_hub()
+        self.other = make_hub(partner=self.hub.partner)
+        for hub, amount in ((self.hub, '10.00'), (self.hub, '5.50'), (self.other, '1.00')):
+            HubTransaction.objects.create(
+                hub=hub, amount=Decimal(amount), description='Commission',
+                transaction_type=HubTransaction.TRANSACTION_COMMISSION,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.hub.partner)
+        self.url = reverse('api_hub_transactions_export')
+
+    def test_streams_csv_for_one_hub(self):
+        response = self.client.get(self.url, {'hub_id': str(self.hub.id)})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = read_csv(response)
+        self.assertEqual(rows[0][:3], ['id', 'hub_code', 'hub_name'])
+        self.assertEqual(sorted(row[4] for row in rows[1:]), ['10.00', '5.50'])
+
+    def test_gzipped_ndjson(self):
+        response = self.client.get(self.url, {'output': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_malformed_filters_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'hub_id': 'not-a-uuid'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'month': '2026-13'}).status_code, 400)
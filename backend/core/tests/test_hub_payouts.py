@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import HubDelivery, HubPayout, HubTransaction
+from core.tests.factories import make_hub, make_job
+from core.utils.hub_payouts import OverlappingPayout, generate_payouts, month_period
+from core.utils.ledger import HUB_EARNINGS
+
+
+class HubPayoutTests(TestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        self.period = month_period(today.year, today.month)
+        self.hub = make_hub()
+
+    def post(self, amount, transaction_type):
+        """Credit the hub, or debit it for a negative amount"""
+        amount = Decimal(amount)
+        if amount < 0:
+            HUB_EARNINGS.debit(self.hub.pk, amount, allow_overdraft=True,
+                               transaction_type=transaction_type, description='Debit')
+        else:
+            HUB_EARNINGS.credit(self.hub.pk, amount, transaction_type=transaction_type, description='Credit')
+
+    def test_adjustments_count_by_direction(self):
+        self.post('100.00', HubTransaction.TRANSACTION_COMMISSION)
+        self.post('-30.00', HubTransaction.TRANSACTION_ADJUSTMENT)
+        self.post('5.00', HubTransaction.TRANSACTION_ADJUSTMENT)
+        HubDelivery.objects.create(
+            hub=self.hub, job=make_job(), pickup_code='01234567', is_cod=True, cod_amount=Decimal('250.00'),
+            cod_collected=True, picked_up_at=timezone.now(),
+        )
+
+        self.assertEqual(generate_payouts(*self.period), 1)
+        payout = HubPayout.objects.get(hub=self.hub)
+        self.assertEqual(payout.total_commissions, Decimal('100.00'))
+        self.assertEqual(payout.deductions, Decimal('25.00'))
+        self.assertEqual(payout.net_payout, Decimal('75.00'))
+        self.assertEqual(payout.total_cod_collected, Decimal('250.00'))
+
+    def test_rerun_only_fills_gaps_and_recompute_replaces_pending(self):
+        self.post('10.00', HubTransaction.TRANSACTION_COMMISSION)
+        generate_payouts(*self.period)
+        self.post('5.00', HubTransaction.TRANSACTION_COMMISSION)
+        self.assertEqual(generate_payouts(*self.period), 0)
+        self.assertEqual(HubPayout.objects.get().total_commissions, Decimal('10.00'))
+
+        self.assertEqual(generate_payouts(*self.period, recompute=True), 1)
+        self.assertEqual(HubPayout.objects.get().total_commissions, Decimal('15.00'))
+
+    def test_overlapping_periods_are_refused(self):
+        self.post('10.00', HubTransaction.TRANSACTION_COMMISSION)
+        start, end = self.period
+        generate_payouts(start, end)
+
+        with self.assertRaises(OverlappingPayout):
+            generate_payouts(start + timedelta(days=7), end + timedelta(days=7))
+        with self.assertRaises(CommandError):
+            call_command(
+                'generate_hub_payouts', '--start', str(start - timedelta(days=3)), '--end', str(start),
+                stdout=StringIO(),
+            )
+        self.assertEqual(HubPayout.objects.count(), 1)
+
+        other = make_hub()
+        self.assertEqual(generate_payouts(start + timedelta(days=7), end + timedelta(days=7), hubs=[other.pk]), 0)
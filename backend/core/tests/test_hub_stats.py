@@ -0,0 +1,83 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Hub, HubDailyStats, HubDelivery, HubTransaction
+from core.tests.factories import make_hub, make_job, make_user
+from core.utils.ledger import HUB_EARNINGS
+
+
+def make_delivery(hub, code):
+    return HubDelivery.objects.create(
+        job=make_job(), hub=hub, recipient_name='Recipient', recipient_phone='0711000000', pickup_code=code
+    )
+
+
+class HubDailyStatsTests(TestCase):
+    def setUp(self):
+        self.hub = make_hub()
+
+    def today(self):
+        return HubDailyStats.objects.get(hub=self.hub, date=timezone.localdate())
+
+    def test_arrivals_pickups_and_commissions_roll_up(self):
+        first, second, third = (make_delivery(self.hub, code) for code in ('11111111', '22222222', '33333333'))
+        first.mark_arrived()
+        second.mark_arrived()
+        first.mark_picked_up()
+        third.mark_arrived()
+        HUB_EARNINGS.credit(
+            self.hub.pk, Decimal('12.50'), transaction_type=HubTransaction.TRANSACTION_COMMISSION,
+            description='Commission'
+        )
+
+        stats = self.today()
+        self.assertEqual((stats.arrivals, stats.pickups, stats.peak_occupancy), (3, 1, 2))
+        self.assertEqual(stats.commissions, Decimal('12.50'))
+        self.assertEqual(Hub.objects.get(pk=self.hub.pk).current_occupancy, 2)
+
+    def test_pickup_records_occupancy_carried_over_from_earlier_days(self):
+        delivery = make_delivery(self.hub, '44444444')
+        Hub.objects.filter(pk=self.hub.pk).update(current_occupancy=5)
+        delivery.mark_picked_up()
+        self.assertEqual(self.today().peak_occupancy, 4)
+
+    def test_backfill_rebuilds_the_same_rows(self):
+        for code in ('55555555', '66666666'):
+            make_delivery(self.hub, code).mark_arrived()
+        HubDelivery.objects.get(pickup_code='55555555').mark_picked_up()
+        live = self.today()
+
+        HubDailyStats.objects.all().delete()
+        call_command('backfill_hub_stats', stdout=StringIO())
+        rebuilt = self.today()
+        self.assertEqual(
+            (rebuilt.arrivals, rebuilt.pickups, rebuilt.peak_occupancy),
+            (live.arrivals, live.pickups, live.peak_occupancy)
+        )
+
+
+class HubStatsViewTests(TestCase):
+    def setUp(self):
+        self.hub = make_hub()
+        self.client = APIClient()
+        self.client.force_authenticate(self.hub.partner)
+        self.url = reverse('api_hub_stats', args=[self.hub.pk])
+
+    def test_days_is_validated_and_clamped(self):
+        HubDailyStats.objects.create(hub=self.hub, date=timezone.localdate(), arrivals=2)
+        HubDailyStats.objects.create(hub=self.hub, date=timezone.localdate() - timedelta(days=400))
+
+        self.assertEqual(self.client.get(self.url, {'days': 'week'}).status_code, 400)
+        self.assertEqual(len(self.client.get(self.url, {'days': '-3'}).data['days']), 1)
+        self.assertEqual(len(self.client.get(self.url, {'days': '100000'}).data['days']), 1)
+
+    def test_other_partners_are_refused(self):
+        self.client.force_authenticate(make_user())
+        self.assertIn(self.client.get(self.url).status_code, (403, 404))
@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.models import Job
+from core.tests.factories import make_jpeg, make_job
+from core.utils import images
+
+
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.job = make_job()
+
+    def upload(self, color='orange', **options):
+        self.job.photo.save('parcel.jpg', ContentFile(make_jpeg(color=color, **options)), save=False)
+        Job.objects.filter(pk=self.job.pk).update(photo=self.job.photo.name)
+        return self.job.photo.name
+
+    def test_renditions_are_resized_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'
+        source = self.upload(exif=exif.tobytes())
+        self.assertEqual(images.pending_fields(self.job), ['photo'])
+
+        self.assertEqual(images.process(Job, self.job.pk, ['photo']), 1)
+        self.job.refresh_from_db()
+        entry = self.job.renditions['photo']
+        self.assertEqual(entry['source'], source)
+        self.assertEqual(images.pending_fields(self.job), [])
+
+        for size, edge in images.SIZES.items():
+            for extension in images.FORMATS:
+                with default_storage.open(entry[size][extension]) as file, Image.open(file) as rendition:
+                    self.assertEqual(max(rendition.size), edge)
+                    self.assertNotIn(0x010F, rendition.getexif())
+
+        urls = images.rendition_urls(self.job, 'photo')
+        self.assertEqual(set(urls), set(images.SIZES))
+
+    def test_no_urls_until_rendered_or_after_replacement(self):
+        self.upload()
+        self.assertIsNone(images.rendition_urls(self.job, 'photo'))
+        images.process(Job, self.job.pk, ['photo'])
+
+        self.upload(color='blue')
+        self.job.refresh_from_db()
+        self.assertIsNone(images.rendition_urls(self.job, 'photo'))
+        self.assertEqual(images.pending_fields(self.job), ['photo'])
+
+    def test_unreadable_photo_is_not_retried(self):
+        self.job.photo.save('broken.jpg', ContentFile(b'not an image'), save=False)
+        Job.objects.filter(pk=self.job.pk).update(photo=self.job.photo.name)
+
+        with mock.patch('builtins.print'):
+            images.process(Job, self.job.pk, ['photo'])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.renditions['photo'], {'source': self.job.photo.name})
+        self.assertEqual(images.pending_fields(self.job), [])
+
+    def test_saving_a_photo_schedules_renditions(self):
+        self.job.photo.save('parcel.jpg', ContentFile(make_jpeg()), save=False)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.job.save()
+            self.job.name = 'Renamed'
+            self.job.save(update_fields=['name'])
+        self.assertEqual(len(callbacks), 1)
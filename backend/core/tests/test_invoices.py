@@ -0,0 +1,116 @@
+import csv
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import BulkDeliveryItem, BulkOrder, BulkUpload, BusinessInvoice, VehicleType
+from core.tests.factories import make_business, make_item
+from core.utils import bulk_import, invoices
+from core.utils.pricing import calculate_price
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+
+class InvoiceTests(TestCase):
+    def setUp(self):
+        self.business = make_business(discount_percentage=Decimal('10.00'))
+        self.order = BulkOrder.objects.create(business=self.business, order_name='Order')
+        self.period = (timezone.localdate().replace(day=1), timezone.localdate())
+        self.client = APIClient()
+        self.client.force_authenticate(self.business.owner)
+
+    def deliver(self, cost='100.00', actual_cost=None):
+        item = make_item(self.order, cost=cost)
+        item.mark_delivered(actual_cost=actual_cost and Decimal(actual_cost))
+        return item
+
+    def test_bills_actual_cost_or_the_estimate_once_per_period(self):
+        self.deliver(actual_cost='80.00')
+        self.deliver(cost='50.00')
+        make_item(self.order, cost='999.00')
+        other = make_business()
+        make_item(BulkOrder.objects.create(business=other, order_name='Other')).mark_delivered()
+
+        self.assertEqual(invoices.generate_invoices(*self.period), 2)
+        self.assertEqual(invoices.generate_invoices(*self.period), 0)
+
+        invoice = BusinessInvoice.objects.get(business=self.business)
+        self.assertEqual(invoice.subtotal, Decimal('130.00'))
+        # The costs already carry the 10% discount, so it is recorded but not taken off again
+        self.assertEqual((invoice.discount_amount, invoice.tax_amount), (Decimal('14.44'), Decimal('20.80')))
+        self.assertEqual(invoice.total_amount, Decimal('150.80'))
+        self.assertEqual(invoice.lines.count(), 2)
+
+    def test_item_csv_keeps_matching_the_subtotal(self):
+        billed = self.deliver(actual_cost='80.00')
+        invoices.generate_invoices(*self.period)
+        invoice = BusinessInvoice.objects.get(business=self.business)
+
+        # Changes after generation must not leak into the invoice's line items
+        BulkDeliveryItem.objects.filter(pk=billed.pk).update(actual_cost=Decimal('500.00'))
+        late = self.deliver(cost='70.00')
+
+        response = self.client.get(reverse('api_business_invoice_items', args=[invoice.pk]))
+        rows = read_csv(response)
+        self.assertEqual([row['id'] for row in rows], [str(billed.pk)])
+        self.assertEqual(sum(Decimal(row['billed_cost']) for row in rows), invoice.subtotal)
+
+        # Rerunning the invoiced period leaves the late item for the next one
+        invoices.generate_invoices(*self.period, businesses=[self.business.pk])
+        self.assertEqual(BusinessInvoice.objects.count(), 1)
+        next_day = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(invoices.generate_invoices(next_day, next_day), 1)
+        later = BusinessInvoice.objects.get(period_start=next_day)
+        self.assertEqual(list(invoices.invoice_items(later).values_list('id', flat=True)), [late.pk])
+        self.assertEqual(later.subtotal, Decimal('70.00'))
+        self.assertEqual(invoices.generate_invoices(next_day + timedelta(days=1), next_day + timedelta(days=1)), 0)
+
+    def test_analytics_totals_what_the_invoice_will_bill(self):
+        self.deliver(actual_cost='80.00')
+        self.deliver(cost='50.00')
+        make_item(self.order, cost='999.00')
+
+        data = self.client.get(reverse('api_business_analytics', args=[self.business.pk])).data
+        invoices.generate_invoices(*self.period)
+        invoice = BusinessInvoice.objects.get(business=self.business)
+        self.assertEqual(data['cost_breakdown'], {
+            'subtotal': float(invoice.subtotal),
+            'discount': float(invoice.discount_amount),
+            'tax': float(invoice.tax_amount),
+            'total': float(invoice.total_amount),
+        })
+
+    def test_bulk_imported_item_is_discounted_once(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        self.order.csv_file.save('orders.csv', ContentFile(
+            b'customer_name,customer_phone,delivery_address,item_name,weight_kg,size\n'
+            b'Customer,0711000000,Kilimani,Shoes,1.5,small\n'
+        ))
+        upload = BulkUpload.objects.create(bulk_order=self.order)
+        self.assertTrue(bulk_import.claim(upload.pk))
+        bulk_import.process_upload(upload.pk)
+        item = self.order.items.get()
+        # The courier job is priced at the imported estimate, which becomes the actual cost
+        item.mark_delivered(actual_cost=item.estimated_cost)
+
+        invoices.generate_invoices(*self.period)
+        invoice = BusinessInvoice.objects.get(business=self.business)
+        list_price = Decimal(calculate_price(VehicleType.CAR, bulk_import.DEFAULT_DISTANCE_KM, size='small')['final_price'])
+        self.assertEqual(item.estimated_cost, (list_price * Decimal('0.9')).quantize(Decimal('0.01')))
+        self.assertEqual(invoice.subtotal, item.estimated_cost)
+        self.assertEqual(invoice.total_amount, invoice.subtotal + invoice.tax_amount)
+        self.assertEqual(invoice.tax_amount, (item.estimated_cost * invoices.VAT_RATE).quantize(Decimal('0.01')))
+        self.assertAlmostEqual(invoice.discount_amount, list_price - item.estimated_cost, delta=Decimal('0.01'))
@@ -0,0 +1,84 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.db.utils import OperationalError
+from django.test import TestCase, TransactionTestCase
+
+from core.models import BusinessCredit, Hub, HubTransaction, Wallet, WalletTransaction
+from core.tests.factories import make_business, make_hub, make_user
+from core.utils.ledger import BUSINESS_CREDIT, HUB_EARNINGS, WALLETS, InsufficientBalance
+
+
+class LedgerTests(TestCase):
+    def test_credit_and_debit_move_balance_and_totals(self):
+        wallet = Wallet.objects.create(user=make_user())
+        WALLETS.credit(wallet.pk, 100, transaction_type=WalletTransaction.CREDIT, description='Referral')
+        entry = WALLETS.debit(wallet.pk, 30, transaction_type=WalletTransaction.DEBIT, description='Delivery')
+
+        wallet.refresh_from_db()
+        self.assertEqual((wallet.balance, wallet.total_earned, wallet.total_spent), (70, 100, 30))
+        self.assertEqual(entry.amount, 30)
+
+    def test_overdraft_is_refused_without_a_trace(self):
+        wallet = Wallet.objects.create(user=make_user(), balance=10)
+        with self.assertRaises(InsufficientBalance):
+            WALLETS.debit(wallet.pk, 11, transaction_type=WalletTransaction.DEBIT, description='Delivery')
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, 10)
+        self.assertFalse(WalletTransaction.objects.exists())
+
+        WALLETS.debit(wallet.pk, 11, allow_overdraft=True, transaction_type=WalletTransaction.DEBIT, description='Fee')
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, -1)
+
+    def test_entries_record_balance_before_and_after(self):
+        credit = BusinessCredit.objects.create(business=make_business())
+        BUSINESS_CREDIT.credit(credit.pk, Decimal('500.00'), transaction_type='purchase', description='Top up')
+        entry = BUSINESS_CREDIT.debit(credit.pk, Decimal('120.50'), transaction_type='delivery', description='Order')
+
+        self.assertEqual((entry.balance_before, entry.balance_after), (Decimal('500.00'), Decimal('379.50')))
+        credit.refresh_from_db()
+        self.assertEqual((credit.total_purchased, credit.total_used), (Decimal('500.00'), Decimal('120.50')))
+
+    def test_unknown_account(self):
+        with self.assertRaises(Hub.DoesNotExist):
+            HUB_EARNINGS.credit(uuid.UUID(int=1), 5, transaction_type='commission', description='x')
+
+
+class ConcurrentLedgerTests(TransactionTestCase):
+    def test_concurrent_postings_lose_no_update(self):
+        hub = make_hub()
+        threads, posts = 4, 25
+
+        def worker():
+            try:
+                for _ in range(posts):
+                    for attempt in range(50):
+                        try:
+                            HUB_EARNINGS.credit(
+                                hub.pk, Decimal('1.25'),
+                                transaction_type=HubTransaction.TRANSACTION_COMMISSION, description='Commission'
+                            )
+                            break
+                        except OperationalError:
+                            time.sleep(0.01 * (attempt + 1))  # SQLite takes one writer at a time
+            finally:
+                close_old_connections()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        hub.refresh_from_db()
+        entries = HubTransaction.objects.filter(hub=hub)
+        self.assertEqual(entries.count(), threads * posts)
+        self.assertEqual(hub.total_earnings, entries.aggregate(total=Sum('amount'))['total'])
+        self.assertEqual(hub.total_earnings, Decimal('125.00'))
+        # Every entry saw a distinct running balance
+        self.assertEqual(len(set(entries.values_list('balance_after', flat=True))), threads * posts)
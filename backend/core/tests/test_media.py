@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Job
+from core.tests.factories import make_courier, make_jpeg, make_job
+from core.utils.media import signed_query
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.content = make_jpeg()
+        self.job = make_job(status=Job.PROCESSING_STATUS)
+        self.job.photo.save('parcel.jpg', ContentFile(self.content))
+
+    def test_available_jobs_hand_couriers_a_working_url(self):
+        client = APIClient()
+        client.force_authenticate(make_courier().user)
+        url = client.get(reverse('api_available_jobs')).data[0]['photo']
+
+        anonymous = APIClient()
+        with self.assertNumQueries(0):
+            response = anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_urls_are_stable_within_a_window(self):
+        self.assertEqual(self.job.photo.url, self.job.photo.url)
+
+    def test_unsigned_tampered_and_expired_urls_are_refused(self):
+        name = self.job.photo.name
+        path = urlsplit(self.job.photo.url).path
+        query = parse_qs(urlsplit(self.job.photo.url).query)
+        other = make_job()
+        other.photo.save('other.jpg', ContentFile(make_jpeg(color='blue')))
+
+        expired = signed_query(name, now=time.time() - 3 * 3600)
+        for url in (
+            path,
+            f"{path}?expires={query['expires'][0]}&signature={'0' * 64}",
+            f"{urlsplit(other.photo.url).path}?{urlsplit(self.job.photo.url).query}",
+            f'{path}?{expired}',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_range_and_conditional_requests(self):
+        url = self.job.photo.url
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[:10])
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+    @override_settings(MEDIA_SERVE_MODE='accel', MEDIA_ACCEL_PREFIX='/protected/')
+    def test_web_server_sends_the_bytes(self):
+        response = self.client.get(self.job.photo.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.job.photo.name}')
@@ -0,0 +1,129 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.admin.sites import AdminSite
+from django.db import close_old_connections
+from django.db.utils import OperationalError
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from core.admin import CourierAdmin
+from core.models import Courier, CourierPayoutBatch, CourierPayoutItem, Transaction
+from core.tests.factories import make_courier, make_job
+from core.utils import payouts
+
+
+def make_earnings(*amounts, courier=None):
+    courier = courier or make_courier(paypal_email=f'courier{Courier.objects.count()}@example.com')
+    for amount in amounts:
+        job = make_job(courier=courier)
+        Transaction.objects.create(stripe_payment_intent_id=f'pi_{job.id.hex}', job=job, amount=amount)
+    return courier
+
+
+def admin_balances():
+    request = RequestFactory().get('/admin/core/courier/')
+    courier_admin = CourierAdmin(Courier, AdminSite())
+    return {courier.pk: courier_admin.balance(courier) for courier in courier_admin.get_queryset(request)}
+
+
+class PayoutTests(TestCase):
+    def setUp(self):
+        self.couriers = [make_earnings(100, 50), make_earnings(20), make_earnings(10, 10)]
+        self.ids = [courier.pk for courier in self.couriers]
+        self.client = payouts.FakePayoutClient()
+
+    def test_batch_pays_each_courier_their_share(self):
+        batch = payouts.create_batch(self.ids, chunk_size=2)
+        self.assertEqual(
+            sorted(batch.items.values_list('amount', flat=True)),
+            [Decimal('16.00'), Decimal('16.00'), Decimal('120.00')]
+        )
+        self.assertEqual(batch.items.values('chunk').distinct().count(), 2)
+        self.assertEqual(payouts.send_batch(batch, self.client), CourierPayoutBatch.STATUS_COMPLETED)
+        self.assertEqual(self.client.requests, 2)
+        self.assertFalse(Transaction.objects.filter(status=Transaction.IN_STATUS).exists())
+
+    def test_second_run_claims_nothing(self):
+        payouts.create_batch(self.ids)
+        self.assertIsNone(payouts.create_batch(self.ids))
+        self.assertEqual(CourierPayoutBatch.objects.count(), 1)
+
+    def test_couriers_without_paypal_are_skipped(self):
+        make_earnings(40, courier=make_courier())
+        batch = payouts.create_batch(Courier.objects.values_list('id', flat=True))
+        self.assertEqual(batch.courier_count, 3)
+
+    def test_failed_chunk_is_retried_alone(self):
+        batch = payouts.create_batch(self.ids, chunk_size=1)
+        failed = batch.items.get(chunk=1)
+        self.client.fail.add(f'{batch.id.hex}-1')
+
+        self.assertEqual(payouts.send_batch(batch, self.client), CourierPayoutBatch.STATUS_PARTIAL)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, CourierPayoutItem.STATUS_FAILED)
+        self.assertIn('rejected', failed.error)
+        self.assertEqual(
+            Transaction.objects.filter(status=Transaction.IN_STATUS).get().job.courier_id, failed.courier_id
+        )
+
+        self.client.fail.clear()
+        self.client.requests = 0
+        self.assertEqual(payouts.send_batch(batch, self.client), CourierPayoutBatch.STATUS_COMPLETED)
+        self.assertEqual(self.client.requests, 1)
+        self.assertEqual(len(self.client.batches), 3)
+
+    def test_chunk_already_with_the_provider_is_marked_sent(self):
+        batch = payouts.create_batch(self.ids, chunk_size=1)
+        payouts.send_batch(batch, self.client)
+        original = batch.items.get(chunk=0).provider_batch_id
+        # As if the run had died after sending but before recording the first chunk
+        batch.items.filter(chunk=0).update(status=CourierPayoutItem.STATUS_PENDING, provider_batch_id='')
+
+        self.assertEqual(payouts.send_batch(batch, self.client), CourierPayoutBatch.STATUS_COMPLETED)
+        self.assertEqual(batch.items.get(chunk=0).provider_batch_id, original)
+        self.assertEqual(len(self.client.batches), 3)
+
+    def test_admin_balance_matches_what_is_paid(self):
+        self.assertEqual(admin_balances()[self.ids[0]], 120)
+        batch = payouts.create_batch(self.ids, chunk_size=1)
+        balances = admin_balances()
+        for item in batch.items.all():
+            self.assertEqual(Decimal(str(balances[item.courier_id])), item.amount)
+
+        self.client.fail.add(f'{batch.id.hex}-0')
+        payouts.send_batch(batch, self.client)
+        unpaid = batch.items.get(chunk=0)
+        self.assertEqual(
+            {pk: balance for pk, balance in admin_balances().items() if balance},
+            {unpaid.courier_id: float(unpaid.amount)}
+        )
+
+
+class ConcurrentPayoutTests(TransactionTestCase):
+    def test_concurrent_runs_claim_each_transaction_once(self):
+        ids = [make_earnings(10, 20).pk for _ in range(5)]
+        batches = []
+
+        def run():
+            try:
+                for attempt in range(50):
+                    try:
+                        batches.append(payouts.create_batch(ids))
+                        break
+                    except OperationalError:
+                        time.sleep(0.01 * (attempt + 1))  # SQLite takes one writer at a time
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        created = [batch for batch in batches if batch is not None]
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created[0].courier_count, 5)
+        self.assertFalse(Transaction.objects.filter(payout_batch__isnull=True).exists())
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import BusinessAccount, Job
+from core.tests.factories import make_business, make_customer, make_job
+from core.utils import quotas
+
+
+def used(business):
+    return quotas.counter.get(business.id, quotas.current_month())
+
+
+class QuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quotas.counter.pending.clear()  # Left over from businesses of earlier tests
+        self.business = make_business(tier=BusinessAccount.TIER_STARTER)
+
+    def test_consume_all_or_nothing(self):
+        self.assertEqual(quotas.consume(self.business, 45), 45)
+        with self.assertRaises(quotas.QuotaExceeded) as raised:
+            quotas.consume(self.business, 10)
+        self.assertEqual(raised.exception.usage['remaining'], 5)
+        self.assertEqual(used(self.business), 45)
+
+    def test_partial_consume_takes_what_fits(self):
+        self.assertEqual(quotas.consume(self.business, 48), 48)
+        self.assertEqual(quotas.consume(self.business, 10, partial=True), 2)
+        quotas.release(self.business, 3)
+        self.assertEqual(used(self.business), 47)
+
+    def test_enterprise_is_unlimited(self):
+        self.business.tier = BusinessAccount.TIER_ENTERPRISE
+        self.assertEqual(quotas.consume(self.business, 1000), 1000)
+        quotas.check(self.business)
+
+    def test_counter_is_reloaded_from_the_database(self):
+        quotas.consume(self.business, 7)
+        quotas.counter.flush()
+        cache.clear()
+        self.assertEqual(used(self.business), 7)
+
+    def test_unstarted_counter_saves_as_it_counts(self):
+        counter = quotas.UsageCounter(flush_seconds=60, cache_seconds=60)
+        counter.add(self.business.id, quotas.current_month(), 3)
+
+        self.assertEqual(self.business.monthly_usage.get().deliveries, 3)
+        self.assertFalse(counter.pending)
+        self.assertIsNone(counter._pid)
+
+    def test_start_saves_what_is_pending_at_exit(self):
+        counter = quotas.UsageCounter(flush_seconds=60, cache_seconds=60)
+        with mock.patch.object(quotas.atexit, 'register') as register:
+            counter.start()
+        register.assert_called_once_with(counter.flush)
+
+
+class JobCreateQuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        customer = make_customer()
+        self.business = make_business(owner=customer.user, tier=BusinessAccount.TIER_STARTER)
+        self.job = make_job(
+            customer, status=Job.CREATING_STATUS, pickup_name='Shop', delivery_name='Home', distance=4
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(customer.user)
+
+    def place(self):
+        return self.client.post(reverse('api_job_create'), {'step': '4'})
+
+    def test_placing_a_job_counts_once(self):
+        self.assertEqual(self.place().status_code, 200)
+        self.assertEqual(used(self.business), 1)
+
+    def test_failures_give_the_delivery_back(self):
+        with mock.patch('core.utils.pricing.calculate_price', side_effect=RuntimeError('pricing down')):
+            with self.assertRaises(RuntimeError):
+                self.place()
+        with mock.patch('core.api.customer.Transaction.objects.create', side_effect=RuntimeError('db down')):
+            self.assertEqual(self.place().status_code, 400)
+        self.assertEqual(used(self.business), 0)
+
+    def test_exhausted_quota_is_refused(self):
+        quotas.consume(self.business, 50)
+        response = self.place()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['usage']['remaining'], 0)
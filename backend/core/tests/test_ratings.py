@@ -0,0 +1,50 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Courier, CourierRatingSummary, Rating
+from core.tests.factories import make_courier, make_customer, make_job
+
+
+class CourierRatingSummaryTests(TestCase):
+    def rate(self, courier, overall, **dimensions):
+        customer = make_customer()
+        return Rating.objects.create(
+            job=make_job(customer, courier=courier), customer=customer, courier=courier,
+            overall_rating=overall, **dimensions
+        )
+
+    def test_ratings_are_folded_into_the_summary_and_courier(self):
+        courier = make_courier()
+        self.rate(courier, 5, speed_rating=4)
+        self.rate(courier, 2)
+        rating = self.rate(courier, 4, speed_rating=2, care_rating=5)
+
+        summary = CourierRatingSummary.objects.get(courier=courier)
+        self.assertEqual((summary.rating_sum, summary.rating_count), (11, 3))
+        self.assertEqual(summary.averages(), {'overall': 3.7, 'speed': 3.0, 'communication': 0, 'care': 5.0})
+        self.assertEqual(summary.distribution(), {'1': 0, '2': 1, '3': 0, '4': 1, '5': 1})
+        courier.refresh_from_db()
+        self.assertEqual((courier.rating, courier.total_ratings), (3.67, 3))
+
+        rating.delete()
+        summary.refresh_from_db()
+        courier.refresh_from_db()
+        self.assertEqual((summary.rating_count, summary.stars_4, summary.care_count), (2, 0, 0))
+        self.assertEqual((courier.rating, courier.total_ratings), (3.5, 2))
+
+    def test_unrated_courier_keeps_the_default_rating(self):
+        courier = make_courier()
+        self.rate(courier, 3).delete()
+        courier = Courier.objects.get(pk=courier.pk)
+        self.assertEqual((courier.rating, courier.total_ratings), (5.0, 0))
+
+    def test_ratings_view_reads_the_summary(self):
+        courier = make_courier()
+        self.rate(courier, 5)
+        self.rate(courier, 3)
+        response = self.client.get(reverse('api_courier_ratings', args=[courier.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_ratings'], 2)
+        self.assertEqual(response.data['overall_rating'], 4.0)
+        self.assertEqual(response.data['distribution']['5'], 1)
+        self.assertEqual(len(response.data['recent_reviews']), 2)
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Category
+from core.utils import reference_cache
+
+
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._local.clear()
+        Category.objects.create(slug='documents', name='Documents')
+        self.url = reverse('api_categories')
+
+    def names(self, response):
+        return [category['name'] for category in response.json()]
+
+    def test_warm_requests_run_no_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.names(first), ['Documents'])
+        self.assertIn('public', first['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_changes_show_once_committed(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(slug='parcels', name='Parcels')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(self.names(response)), ['Documents', 'Parcels'])
+
+    def test_other_processes_pick_up_the_shared_payload(self):
+        self.client.get(self.url)
+        reference_cache._local.clear()  # As seen by a process that has not served it yet
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(self.client.get(self.url)), ['Documents'])
@@ -0,0 +1,87 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Category, Courier, HubTransaction
+from core.tests.factories import make_hub
+
+REPLICA = 'test_replica'
+HAS_REPLICA = REPLICA in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'needs the replica database from Yanzi.settings_test')
+@override_settings(REPLICA_DATABASE=REPLICA)
+class ReplicaRouterTests(TransactionTestCase):
+    """`test_replica` is a second SQLite database; rows written to only one side show where reads went"""
+    databases = {'default', REPLICA} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        routers.reset()
+        self.router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.reset()
+        # Migrations are refused for the replica alias, so the test flush does not reach it
+        HubTransaction.objects.using(REPLICA).all().delete()
+        Courier.objects.using(REPLICA).all().delete()
+        User.objects.using(REPLICA).all().delete()
+
+    def test_reads_go_to_the_replica_only_when_enabled(self):
+        self.assertEqual(self.router.db_for_read(Category), 'default')
+        routers.use_replica()
+        self.assertEqual(self.router.db_for_read(Category), REPLICA)
+
+    def test_a_write_pins_the_rest_of_the_request_to_default(self):
+        routers.use_replica()
+        self.assertEqual(self.router.db_for_write(Category), 'default')
+        self.assertTrue(routers.is_pinned())
+        self.assertEqual(self.router.db_for_read(Category), 'default')
+
+    def test_the_replica_is_never_migrated(self):
+        self.assertIs(self.router.allow_migrate(REPLICA, 'core'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+    def replica_only_courier(self):
+        user = User.objects.db_manager(REPLICA).create_user(username='replicated')
+        return Courier.objects.using(REPLICA).create(user=user)
+
+    def test_listed_views_read_from_the_replica_and_state_resets(self):
+        url = reverse('api_courier_ratings', args=[self.replica_only_courier().pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(getattr(routers._state, 'use_replica', False))
+        self.assertEqual(self.router.db_for_read(Courier), 'default')
+
+    def test_pin_cookie_keeps_reads_on_default(self):
+        url = reverse('api_courier_ratings', args=[self.replica_only_courier().pk])
+        self.client.cookies[ReplicaRoutingMiddleware.COOKIE_NAME] = '1'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_exports_stream_from_the_replica(self):
+        hub = make_hub()
+        hub.partner.save(using=REPLICA)
+        hub.save(using=REPLICA)
+        HubTransaction.objects.using(REPLICA).create(
+            hub=hub, amount=7, description='Replicated',
+            transaction_type=HubTransaction.TRANSACTION_COMMISSION,
+        )
+        client = APIClient()
+        client.force_authenticate(hub.partner)
+
+        response = client.get(reverse('api_hub_transactions_export'))
+        self.assertIn(b'Replicated', b''.join(response.streaming_content))
+
+    def test_writing_request_sets_the_pin_cookie(self):
+        def view(request):
+            Category.objects.create(slug='written', name='Written')
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(RequestFactory().post('/'))
+        self.assertIn(ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies)
+        self.assertFalse(routers.is_pinned())
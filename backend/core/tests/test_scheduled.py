@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Job, ScheduledDelivery
+from core.tests.factories import make_customer
+
+
+class ScheduledDeliveryTestCase(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+
+    def schedule(self, **fields):
+        fields.setdefault('start_date', date.today() - timedelta(days=3))
+        fields.setdefault('next_delivery_date', timezone.now() - timedelta(minutes=5))
+        return ScheduledDelivery.objects.create(
+            customer=self.customer, name='Groceries', description='Weekly shop',
+            pickup_address='Westlands', pickup_lat=0, pickup_lng=0,
+            delivery_address='Kilimani', delivery_lat=0, delivery_lng=0,
+            **fields
+        )
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_scheduled_deliveries', '--once', stdout=out)
+        return out.getvalue()
+
+
+class ScheduledWorkerTests(ScheduledDeliveryTestCase):
+    def test_due_schedules_become_jobs_once(self):
+        weekly = self.schedule(frequency=ScheduledDelivery.FREQUENCY_WEEKLY)
+        self.schedule(status=ScheduledDelivery.STATUS_PAUSED)
+        self.schedule(next_delivery_date=timezone.now() + timedelta(hours=1))
+
+        self.assertIn('Created 1 scheduled jobs', self.run_worker())
+        self.assertEqual(Job.objects.filter(customer=self.customer, name='Groceries').count(), 1)
+
+        weekly.refresh_from_db()
+        self.assertEqual(weekly.deliveries_completed, 1)
+        self.assertEqual(weekly.status, ScheduledDelivery.STATUS_ACTIVE)
+        self.assertGreater(weekly.next_delivery_date, timezone.now())
+
+        self.assertIn('Created 0 scheduled jobs', self.run_worker())
+
+    def test_one_off_and_capped_schedules_complete(self):
+        once = self.schedule(frequency=ScheduledDelivery.FREQUENCY_ONCE)
+        capped = self.schedule(frequency=ScheduledDelivery.FREQUENCY_DAILY, max_deliveries=1)
+        self.run_worker()
+
+        for schedule in (once, capped):
+            schedule.refresh_from_db()
+            self.assertEqual(schedule.status, ScheduledDelivery.STATUS_COMPLETED)
+        self.assertEqual(Job.objects.filter(customer=self.customer).count(), 2)
+
+    def test_next_occurrence_skips_missed_periods(self):
+        schedule = self.schedule(frequency=ScheduledDelivery.FREQUENCY_DAILY)
+        after = timezone.now()
+        upcoming = schedule.next_occurrence(after=after)
+        self.assertGreater(upcoming, after)
+        self.assertLessEqual(upcoming - after, timedelta(days=1))
+
+
+class ScheduledTriggerTests(ScheduledDeliveryTestCase):
+    def test_trigger_shares_the_worker_advance(self):
+        schedule = self.schedule(frequency=ScheduledDelivery.FREQUENCY_ONCE)
+        client = APIClient()
+        client.force_authenticate(self.customer.user)
+
+        url = reverse('api_scheduled_delivery_trigger', args=[schedule.id])
+        response = client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Job.objects.filter(id=response.data['job_id']).exists())
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.status, ScheduledDelivery.STATUS_COMPLETED)
+        self.assertEqual(client.post(url).status_code, 400)
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Job, MediaBlob
+from core.storage import is_blob
+from core.tests.factories import make_jpeg, make_job
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+
+class DedupStorageTests(MediaTestCase):
+    def test_identical_content_is_stored_once(self):
+        first = default_storage.save('job/photos/a.JPG', ContentFile(make_jpeg()))
+        second = default_storage.save('bulk/b.jpg', ContentFile(make_jpeg()))
+        other = default_storage.save('job/photos/a.jpg', ContentFile(make_jpeg(color='blue')))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(is_blob(first) and first.endswith('.jpg'))
+        self.assertEqual(MediaBlob.objects.get(name=first).references, 2)
+
+    def test_delete_only_releases_a_reference(self):
+        name = default_storage.save('a.jpg', ContentFile(make_jpeg()))
+        default_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 0)
+
+    def test_missing_file_is_written_again(self):
+        name = default_storage.save('a.jpg', ContentFile(make_jpeg()))
+        os.remove(default_storage.path(name))
+        self.assertEqual(default_storage.save('b.jpg', ContentFile(make_jpeg())), name)
+        self.assertTrue(default_storage.exists(name))
+
+
+class CollectMediaTests(MediaTestCase):
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media', '--grace', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def age(self, name):
+        past = timezone.now() - timedelta(hours=1)
+        MediaBlob.objects.filter(name=name).update(updated_at=past)
+        os.utime(default_storage.path(name), (past.timestamp(), past.timestamp()))
+
+    def test_recounts_and_removes_unreferenced_blobs(self):
+        job = make_job()
+        job.photo.save('kept.jpg', ContentFile(make_jpeg()))
+        dropped = default_storage.save('dropped.jpg', ContentFile(make_jpeg(color='blue')))
+        # Leaked references, as left by rows deleted without releasing their files
+        MediaBlob.objects.update(references=5)
+        self.age(job.photo.name)
+        self.age(dropped)
+
+        self.assertIn('Deleted 1 blobs', self.collect())
+        self.assertFalse(default_storage.exists(dropped))
+        self.assertFalse(MediaBlob.objects.filter(name=dropped).exists())
+        self.assertEqual(MediaBlob.objects.get(name=job.photo.name).references, 1)
+        self.assertTrue(default_storage.exists(job.photo.name))
+
+    def test_dry_run_deletes_nothing(self):
+        name = default_storage.save('dropped.jpg', ContentFile(make_jpeg()))
+        default_storage.delete(name)
+        self.age(name)
+        self.assertIn('Would delete 1 blobs', self.collect('--dry-run'))
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+
+    def test_recent_blobs_are_left_alone(self):
+        name = default_storage.save('new.jpg', ContentFile(make_jpeg()))
+        MediaBlob.objects.update(references=0)
+        call_command('collect_media', '--grace', '1', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_stray_files_are_removed(self):
+        stray = default_storage.save('stray.jpg', ContentFile(make_jpeg()))
+        MediaBlob.objects.all().delete()  # As after a rolled back upload
+        self.age(stray)
+        self.assertIn('1 stray files', self.collect())
+        self.assertFalse(default_storage.exists(stray))
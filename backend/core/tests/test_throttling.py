@@ -0,0 +1,99 @@
+import uuid
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import BusinessAPIKeyAuthentication
+from core.tests.factories import make_business, make_user
+from core.throttling import Budget, LocalBuckets, Throttle, client_ident, client_ip
+
+
+class BucketTests(SimpleTestCase):
+    def test_burst_then_steady_rate(self):
+        budget = Budget('60/min', burst=3)
+        buckets = LocalBuckets()
+        self.assertEqual([buckets.take('client', budget, 100.0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(buckets.take('client', budget, 100.0), 1.0)
+        self.assertEqual(buckets.take('client', budget, 101.0), 0)
+        self.assertEqual(buckets.take('other', budget, 101.0), 0)
+
+    def test_least_recent_clients_are_forgotten(self):
+        budget = Budget('1/hour', burst=1)
+        buckets = LocalBuckets(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            buckets.take(key, budget, 0.0)
+        self.assertEqual(list(buckets.arrivals), ['b', 'c'])
+
+    def test_unlisted_scopes_are_not_throttled(self):
+        throttle = Throttle({'listed': {'rate': '1/hour', 'burst': 1}})
+        self.assertEqual(throttle.check('unlisted', 'ip:1'), 0)
+
+
+class ClientIdentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_api_key_counts_only_once_authenticated(self):
+        business = make_business()
+        request = self.factory.get('/', HTTP_X_API_KEY=business.api_key, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ident(request), 'ip:10.0.0.1')
+
+        BusinessAPIKeyAuthentication().authenticate(request)
+        self.assertTrue(client_ident(request).startswith('key:'))
+
+    def test_made_up_keys_share_the_ip_bucket(self):
+        idents = {
+            client_ident(self.factory.get('/', HTTP_X_API_KEY=f'guess-{n}', REMOTE_ADDR='10.0.0.2'))
+            for n in range(5)
+        }
+        self.assertEqual(idents, {'ip:10.0.0.2'})
+
+    def test_access_token_user(self):
+        user = make_user()
+        token = AccessToken.for_user(user)
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client_ident(request), f'user:{user.pk}')
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Bearer forged', REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(client_ident(request), 'ip:10.0.0.3')
+
+
+class ClientIPTests(SimpleTestCase):
+    def request(self, remote, forwarded=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded else {}
+        return RequestFactory().get('/', REMOTE_ADDR=remote, **extra)
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=[])
+    def test_forwarded_header_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(client_ip(self.request('203.0.113.9', '198.51.100.1')), '203.0.113.9')
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_clients_behind_a_trusted_proxy_get_their_own_ip(self):
+        self.assertEqual(client_ip(self.request('10.0.0.5', '198.51.100.1')), '198.51.100.1')
+        self.assertEqual(client_ip(self.request('10.0.0.5', '198.51.100.2, 10.1.2.3')), '198.51.100.2')
+        # A client cannot pick its IP by sending its own header through the proxy
+        self.assertEqual(client_ip(self.request('10.0.0.5', '1.2.3.4, 198.51.100.3')), '198.51.100.3')
+        # Nor by connecting directly
+        self.assertEqual(client_ip(self.request('203.0.113.9', '198.51.100.1')), '203.0.113.9')
+        self.assertEqual(client_ip(self.request('10.0.0.5')), '10.0.0.5')
+
+
+class ThrottleRouteTests(SimpleTestCase):
+    def test_customer_and_courier_location_routes_have_their_own_names(self):
+        job_id = uuid.uuid4()
+        self.assertEqual(
+            reverse('api_customer_courier_location', args=[job_id]),
+            f'/api/customer/jobs/{job_id}/courier-location/'
+        )
+        self.assertEqual(reverse('api_courier_location'), '/api/courier/location/')
+
+
+class ThrottleMiddlewareTests(TestCase):
+    def test_over_budget_requests_get_429(self):
+        url = reverse('api_validate_referral', args=['NOPE'])
+        statuses = [self.client.get(url, REMOTE_ADDR='10.9.9.9').status_code for _ in range(6)]
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5], 429)
+        self.assertIn('Retry-After', self.client.get(url, REMOTE_ADDR='10.9.9.9'))
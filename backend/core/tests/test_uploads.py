@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from core.api.uploads import PhotoUploadView
+from core.models import Job, PhotoUpload
+from core.tests.factories import make_courier, make_jpeg, make_job
+
+
+class PhotoUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, PHOTO_UPLOAD_DIR=os.path.join(media_root, 'partial')
+        ))
+        self.courier = make_courier()
+        self.job = make_job(courier=self.courier, status=Job.DELIVERING_STATUS)
+        self.client = APIClient()
+        self.client.force_authenticate(self.courier.user)
+        self.photo = make_jpeg()
+
+    def start(self, sha256=None):
+        response = self.client.post(reverse('api_photo_upload_start', args=[self.job.id]), {
+            'size': len(self.photo),
+            'sha256': sha256 or hashlib.sha256(self.photo).hexdigest(),
+        })
+        return response.data['id']
+
+    def send(self, upload_id, offset, chunk):
+        url = reverse('api_photo_upload', args=[upload_id]) + f'?offset={offset}'
+        return self.client.patch(url, chunk, content_type='application/octet-stream')
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('api_photo_upload_finalize', args=[upload_id]))
+
+    def test_chunks_resume_and_finalize_completes_the_job(self):
+        upload_id = self.start()
+        self.assertEqual(self.start(), upload_id)  # Restarted app carries on with the same upload
+
+        half = len(self.photo) // 2
+        self.assertEqual(self.send(upload_id, 0, self.photo[:half]).data['offset'], half)
+        self.assertEqual(self.send(upload_id, 0, self.photo[:half]).status_code, 409)
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+        self.assertEqual(self.send(upload_id, half, self.photo[half:] + b'extra').status_code, 400)
+        self.assertEqual(self.send(upload_id, half, self.photo[half:]).data['offset'], len(self.photo))
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.data['message'], 'Delivery completed')
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.COMPLETED_STATUS)
+        with self.job.delivery_photo.open('rb') as photo:
+            self.assertEqual(photo.read(), self.photo)
+
+        self.assertEqual(self.finalize(upload_id).data['message'], 'Photo already attached')
+
+    def test_checksum_mismatch_starts_over(self):
+        upload_id = self.start(sha256='0' * 64)
+        self.send(upload_id, 0, self.photo)
+        response = self.finalize(upload_id)
+        self.assertEqual((response.status_code, response.data['offset']), (400, 0))
+        self.assertEqual(PhotoUpload.objects.get(id=upload_id).received, 0)
+
+    def test_failed_job_update_leaves_the_upload_open(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.photo)
+        with mock.patch('core.api.uploads.confirm_delivery', side_effect=RuntimeError('save failed')):
+            with self.assertRaises(RuntimeError):
+                self.finalize(upload_id)
+        self.assertEqual(PhotoUpload.objects.get(id=upload_id).status, PhotoUpload.STATUS_UPLOADING)
+
+        self.assertEqual(self.finalize(upload_id).data['message'], 'Delivery completed')
+
+    def test_racing_finalize_attaches_once(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.photo)
+        digest = hashlib.sha256(self.photo).hexdigest()
+
+        def finished_meanwhile(path):
+            # Another finalize request completes the upload while this one checks the file
+            PhotoUpload.objects.filter(id=upload_id).update(status=PhotoUpload.STATUS_COMPLETED)
+            return digest
+
+        with mock.patch('core.api.uploads.file_sha256', side_effect=finished_meanwhile):
+            response = self.finalize(upload_id)
+        self.assertEqual(response.data['message'], 'Photo already attached')
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.DELIVERING_STATUS)
+
+    def test_job_moved_on_keeps_the_upload_open(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.photo)
+        Job.objects.filter(id=self.job.id).update(status=Job.CANCELLED_STATUS)
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+        self.assertEqual(PhotoUpload.objects.get(id=upload_id).status, PhotoUpload.STATUS_UPLOADING)
+
+    def test_chunk_without_content_length_gets_411(self):
+        upload_id = self.start()
+        request = APIRequestFactory().patch(
+            f'/api/courier/photo-uploads/{upload_id}/?offset=0', b'', content_type='application/octet-stream'
+        )
+        request.META.pop('CONTENT_LENGTH', None)
+        force_authenticate(request, self.courier.user)
+        response = PhotoUploadView.as_view()(request, upload_id=upload_id)
+        self.assertEqual(response.status_code, 411)
@@ -0,0 +1,147 @@
+"""
+Token-bucket throttling for Yanzi Parcels
+
+Buckets are kept as a GCRA "theoretical arrival time": one float per client
+that says when its bucket will be full again. A request is allowed if adding
+one more request's worth of time does not push that point further ahead than
+the burst allows. This behaves exactly like a token bucket refilling at `rate`
+with `burst` capacity, and each check is O(1).
+"""
+import hashlib
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600}
+
+
+class Budget:
+    """`rate` is like '60/min'; `burst` is how many requests may arrive at once"""
+
+    def __init__(self, rate, burst):
+        count, period = rate.split('/')
+        self.interval = PERIODS[period] / int(count)  # Seconds for one token to refill
+        self.burst = burst
+        self.tolerance = self.interval * (burst - 1)
+
+
+class LocalBuckets:
+    """Buckets in process memory, least recently seen clients dropped past max_keys"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.arrivals = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, budget, now):
+        """Returns 0 if the request is allowed, otherwise seconds until it would be"""
+        with self._lock:
+            arrival = max(self.arrivals.get(key, now), now)
+            wait = arrival - now - budget.tolerance
+            if wait > 0:
+                return wait
+            self.arrivals[key] = arrival + budget.interval
+            self.arrivals.move_to_end(key)
+            if len(self.arrivals) > self.max_keys:
+                self.arrivals.popitem(last=False)
+            return 0
+
+
+# One store per process, however many request handlers are built
+local_buckets = LocalBuckets()
+
+
+class SharedBuckets:
+    """
+    Buckets in the shared cache so limits hold across worker processes. The
+    read and write are not atomic, so heavy concurrency on one key can let a
+    few extra requests through; the local buckets still cap each process.
+    """
+
+    def take(self, key, budget, now):
+        cache_key = 'throttle:' + key
+        arrival = max(cache.get(cache_key, now), now)
+        wait = arrival - now - budget.tolerance
+        if wait > 0:
+            return wait
+        arrival += budget.interval
+        cache.set(cache_key, arrival, timeout=int(arrival - now) + 1)
+        return 0
+
+
+class Throttle:
+    def __init__(self, budgets, shared=False):
+        self.budgets = {name: Budget(**budget) for name, budget in budgets.items()}
+        self.local = local_buckets
+        self.shared = SharedBuckets() if shared else None
+
+    def check(self, scope, ident):
+        """Seconds the client must wait before `scope` accepts it again, 0 if allowed now"""
+        budget = self.budgets.get(scope)
+        if budget is None:
+            return 0
+        key = f'{scope}:{ident}'
+        now = time.time()
+        # A client over budget in this process is over budget everywhere, so skip the cache
+        wait = self.local.take(key, budget, now)
+        if wait or self.shared is None:
+            return wait
+        return self.shared.take(key, budget, now)
+
+
+def _is_trusted_proxy(address, proxies):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in proxy for proxy in proxies)
+
+
+def client_ip(request):
+    """
+    The address a request came from. When it arrived through one of the
+    THROTTLE_TRUSTED_PROXIES, that is the right-most X-Forwarded-For entry not
+    added by a trusted proxy; anything further left was sent by the client and
+    cannot be trusted.
+    """
+    remote = request.META.get('REMOTE_ADDR', '')
+    proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.THROTTLE_TRUSTED_PROXIES]
+    if not proxies or not _is_trusted_proxy(remote, proxies):
+        return remote
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted_proxy(hop, proxies):
+            return hop
+    return forwarded[0] if forwarded else remote
+
+
+def client_ident(request):
+    """
+    Who a request counts against, worked out without the database so that
+    rejected requests never reach it: the business API key once authentication
+    has matched it to a business, else the user id in a valid access token,
+    else the client IP (see client_ip). Unmatched keys count against the IP, so sending a new
+    made-up key with each request does not buy a fresh bucket.
+    """
+    from core.authentication import API_KEY_HEADER, is_known_api_key
+
+    api_key = request.META.get(API_KEY_HEADER)
+    if api_key and is_known_api_key(api_key):
+        return 'key:' + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        try:
+            return f'user:{AccessToken(header[7:])[api_settings.USER_ID_CLAIM]}'
+        except (TokenError, KeyError):
+            pass
+
+    return 'ip:' + client_ip(request)
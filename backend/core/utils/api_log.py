@@ -0,0 +1,134 @@
+"""
+Buffered BusinessAPILog writer for Yanzi Parcels
+Requests only append a small tuple to an in-memory ring buffer; a background
+thread resolves the businesses and writes the rows with bulk_create every few
+seconds or whenever a batch has built up, and drains the buffer on shutdown.
+The thread is only used once CoreConfig.ready() starts the buffer (with
+API_LOG_ASYNC); until then each request's row is written as it is captured.
+"""
+import atexit
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.authentication import API_KEY_HEADER
+from core.models import BusinessAccount, BusinessAPILog
+
+
+class APILogBuffer:
+    """
+    Ring buffer of captured requests. When it is full the oldest entries are
+    dropped (and counted) rather than slowing requests down.
+
+    Entries are (api_key, user_id, endpoint, method, status_code, ip_address,
+    user_agent, duration_ms, created_at).
+    """
+
+    def __init__(self, capacity, flush_seconds, flush_batch):
+        self.entries = deque(maxlen=capacity)
+        self.flush_seconds = flush_seconds
+        self.flush_batch = flush_batch
+        self.dropped = 0
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self.background = False
+
+    def start(self):
+        """Write from a background thread from now on, draining what is left at exit"""
+        self.background = True
+        atexit.register(self.flush)
+
+    def append(self, entry):
+        if len(self.entries) == self.entries.maxlen:
+            self.dropped += 1
+        self.entries.append(entry)
+        if not self.background:
+            self.flush()
+            return
+        if self._pid != os.getpid():
+            self._start()
+        if len(self.entries) >= self.flush_batch:
+            self._wakeup.set()
+
+    def _start(self):
+        # Threads do not survive a fork, so each worker process starts its own flusher
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='api-log-flusher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            batch = []
+            while self.entries:
+                try:
+                    batch.append(self.entries.popleft())
+                except IndexError:
+                    break
+            if not batch:
+                return 0
+
+            try:
+                logs = self._build_logs(batch)
+                BusinessAPILog.objects.bulk_create(logs, batch_size=self.flush_batch)
+            except Exception as e:
+                # Auditing must never take the API down; the batch is lost
+                print(f"Error writing {len(batch)} business API logs: {e}")
+                return 0
+            return len(logs)
+
+    def _build_logs(self, batch):
+        """Resolve API keys and users to businesses with one query each"""
+        api_keys = {entry[0] for entry in batch if entry[0]}
+        user_ids = {entry[1] for entry in batch if entry[1] and not entry[0]}
+
+        by_key = dict(
+            BusinessAccount.objects.filter(api_key__in=api_keys).values_list('api_key', 'id')
+        ) if api_keys else {}
+        by_owner = {}
+        if user_ids:
+            for owner_id, business_id in BusinessAccount.objects.filter(
+                owner_id__in=user_ids
+            ).order_by('-created_at').values_list('owner_id', 'id'):
+                by_owner[owner_id] = business_id  # Oldest account wins, as with .get(owner=...)
+
+        logs = []
+        for api_key, user_id, endpoint, method, status_code, ip, user_agent, duration_ms, created_at in batch:
+            business_id = by_key.get(api_key) if api_key else by_owner.get(user_id)
+            if business_id is None:
+                continue
+            logs.append(BusinessAPILog(
+                business_id=business_id,
+                endpoint=endpoint,
+                method=method,
+                status_code=status_code,
+                ip_address=ip,
+                user_agent=user_agent,
+                duration_ms=duration_ms,
+                created_at=created_at,
+            ))
+        return logs
+
+
+buffer = APILogBuffer(
+    capacity=getattr(settings, 'API_LOG_BUFFER_SIZE', 10000),
+    flush_seconds=getattr(settings, 'API_LOG_FLUSH_SECONDS', 5),
+    flush_batch=getattr(settings, 'API_LOG_FLUSH_BATCH', 500),
+)
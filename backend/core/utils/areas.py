@@ -0,0 +1,37 @@
+"""
+Delivery area normalization for Yanzi Parcels
+Maps free-text delivery addresses to a stable area ID for analytics
+"""
+import re
+
+
+# Address parts that never identify an area
+IGNORED_PARTS = {'kenya', 'ke'}
+
+UNKNOWN_AREA = ('unknown', 'Unknown')
+
+
+def normalize_area(address: str) -> tuple:
+    """
+    Reduce a delivery address to the area it belongs to.
+
+    Street numbers, postal codes and the country are dropped, and the part
+    just before the city is taken as the area:
+        "12 Moi Avenue, Westlands, Nairobi, Kenya" -> ('westlands', 'Westlands')
+
+    Returns:
+        tuple: (area_id, area_name)
+    """
+    parts = []
+    for part in (address or '').split(','):
+        part = ' '.join(part.split())
+        if not part or part.lower() in IGNORED_PARTS or any(ch.isdigit() for ch in part):
+            continue
+        parts.append(part)
+
+    if not parts:
+        return UNKNOWN_AREA
+
+    area_name = parts[-2] if len(parts) >= 2 else parts[0]
+    area_id = re.sub(r'[^a-z0-9]+', '-', area_name.lower()).strip('-')[:100]
+    return (area_id, area_name) if area_id else UNKNOWN_AREA
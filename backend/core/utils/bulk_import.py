@@ -0,0 +1,278 @@
+"""
+Bulk order CSV ingestion for Yanzi Parcels
+Streams an uploaded CSV row by row, validates and prices rows in chunks and
+creates the delivery items with bulk_create, outside the request that uploaded it
+"""
+import csv
+import io
+import threading
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import (
+    BulkOrder, BulkDeliveryItem, BulkUpload, BulkUploadError,
+    BusinessDailyStats, Job, VehicleType,
+)
+from core.utils import quotas
+from core.utils.pricing import calculate_price
+
+
+REQUIRED_FIELDS = [
+    'customer_name', 'customer_phone', 'delivery_address',
+    'item_name', 'weight_kg', 'size'
+]
+
+CHUNK_SIZE = 1000
+DEFAULT_DISTANCE_KM = 5  # Rows carry no route, so every item is quoted for an average trip
+
+VALID_SIZES = {size for size, _ in Job.SIZES}
+CENTS = Decimal('0.01')
+MICRODEGREES = Decimal('0.000001')
+
+
+class RowError(ValueError):
+    """Raised when a CSV row cannot be turned into a delivery item"""
+
+
+def read_header(csv_file):
+    """Column names from the first line of an uploaded CSV, leaving the file rewound"""
+    csv_file.seek(0)
+    first_line = csv_file.readline().decode('utf-8-sig')
+    csv_file.seek(0)
+    return next(csv.reader([first_line]), [])
+
+
+class ItemBuilder:
+    """Validates CSV rows and turns them into unsaved delivery items for one bulk order"""
+
+    def __init__(self, bulk_order):
+        business = bulk_order.business
+        self.bulk_order = bulk_order
+        self.discount_factor = Decimal(str(1 - (business.discount_percentage / 100)))
+        self.pickup = {
+            'pickup_address': business.business_address,
+            'pickup_phone': business.contact_phone,
+            'pickup_lat': Decimal(str(business.business_lat or 0)),
+            'pickup_lng': Decimal(str(business.business_lng or 0)),
+        }
+        self._prices = {}
+
+    def price(self, size):
+        """Discounted price for an item of this size, quoted once per size"""
+        if size not in self._prices:
+            quote = calculate_price(VehicleType.CAR, DEFAULT_DISTANCE_KM, size=size)
+            self._prices[size] = (Decimal(quote['final_price']) * self.discount_factor).quantize(CENTS)
+        return self._prices[size]
+
+    def build(self, row):
+        size = (row.get('size') or Job.SMALL_SIZE).strip().lower()
+        if size not in VALID_SIZES:
+            raise RowError(f"Invalid size '{size}', expected one of: {', '.join(sorted(VALID_SIZES))}")
+
+        customer_email = (row.get('customer_email') or '').strip()
+        if customer_email:
+            try:
+                validate_email(customer_email)
+            except ValidationError:
+                raise RowError('Invalid customer_email')
+
+        customer_phone = _text(row, 'customer_phone', required=True)
+        return BulkDeliveryItem(
+            bulk_order=self.bulk_order,
+            customer_name=_text(row, 'customer_name', required=True),
+            customer_phone=customer_phone,
+            customer_email=customer_email,
+            delivery_address=_text(row, 'delivery_address', required=True),
+            delivery_phone=customer_phone,
+            delivery_lat=_coordinate(row, 'delivery_lat', 90),
+            delivery_lng=_coordinate(row, 'delivery_lng', 180),
+            item_name=_text(row, 'item_name', required=True),
+            item_description=_text(row, 'item_description'),
+            weight_kg=_weight(row),
+            size=size,
+            estimated_cost=self.price(size),
+            special_instructions=_text(row, 'special_instructions'),
+            **self.pickup
+        )
+
+
+def _text(row, field, required=False):
+    value = (row.get(field) or '').strip()
+    if required and not value:
+        raise RowError(f'{field} is required')
+    max_length = BulkDeliveryItem._meta.get_field(field).max_length
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _weight(row):
+    try:
+        weight = Decimal((row.get('weight_kg') or '').strip()).quantize(CENTS)
+    except (InvalidOperation, ValueError):
+        raise RowError('weight_kg must be a number')
+    if not 0 < weight < 1000000:
+        raise RowError('weight_kg must be between 0 and 1,000,000')
+    return weight
+
+
+def _coordinate(row, field, limit):
+    value = (row.get(field) or '').strip()
+    if not value:
+        return Decimal(0)
+    try:
+        coordinate = Decimal(value).quantize(MICRODEGREES)
+    except (InvalidOperation, ValueError):
+        raise RowError(f'{field} must be a number')
+    if abs(coordinate) > limit:
+        raise RowError(f'{field} must be between -{limit} and {limit}')
+    return coordinate
+
+
+def start(upload_id):
+    """Process an upload on a background thread once the current transaction commits"""
+    def run():
+        try:
+            if claim(upload_id):
+                process_upload(upload_id)
+        finally:
+            connections.close_all()
+
+    transaction.on_commit(lambda: threading.Thread(target=run, daemon=True).start())
+
+
+def claim(upload_id):
+    """Move a queued upload to processing; False if another worker already took it"""
+    now = timezone.now()
+    return bool(BulkUpload.objects.filter(
+        pk=upload_id, status=BulkUpload.STATUS_QUEUED
+    ).update(status=BulkUpload.STATUS_PROCESSING, started_at=now, updated_at=now))
+
+
+def process_upload(upload_id, chunk_size=CHUNK_SIZE):
+    """
+    Ingest a claimed upload. Rows already counted in rows_processed are skipped,
+    so an upload interrupted by a restart picks up after its last committed chunk.
+    """
+    upload = BulkUpload.objects.select_related('bulk_order__business').get(pk=upload_id)
+    builder = ItemBuilder(upload.bulk_order)
+
+    try:
+        with upload.bulk_order.csv_file.open('rb') as raw:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+            rows = islice(enumerate(reader, start=1), upload.rows_processed, None)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                _ingest_chunk(upload, builder, chunk)
+    except Exception as e:
+        now = timezone.now()
+        BulkUpload.objects.filter(pk=upload.pk).update(
+            status=BulkUpload.STATUS_FAILED, error_message=str(e), finished_at=now, updated_at=now
+        )
+        BulkOrder.objects.filter(pk=upload.bulk_order_id).update(status=BulkOrder.STATUS_FAILED)
+        return
+
+    now = timezone.now()
+    BulkUpload.objects.filter(pk=upload.pk).update(
+        status=BulkUpload.STATUS_COMPLETED, finished_at=now, updated_at=now
+    )
+
+
+def _ingest_chunk(upload, builder, chunk):
+    items = []
+    errors = []
+    sources = {}
+    for row_number, row in chunk:
+        try:
+            item = builder.build(row)
+            items.append(item)
+            sources[id(item)] = (row_number, row)
+        except RowError as e:
+            errors.append(_row_error(upload, row_number, row, str(e)))
+
+    # Rows beyond the business's monthly quota are reported rather than created
+    business = upload.bulk_order.business
+    try:
+        granted = quotas.consume(business, len(items), partial=True) if items else 0
+    except quotas.QuotaExceeded:
+        granted = 0
+    for item in items[granted:]:
+        row_number, row = sources[id(item)]
+        errors.append(_row_error(upload, row_number, row, 'Monthly delivery quota reached'))
+    items = items[:granted]
+
+    try:
+        with transaction.atomic():
+            created = _create_items(upload, items, errors, sources)
+            _record_chunk(upload, chunk, created, errors)
+    except Exception:
+        quotas.release(business, granted)
+        raise
+    quotas.release(business, granted - len(created))
+
+
+def _record_chunk(upload, chunk, items, errors):
+    """Store the chunk's errors and advance the stats and progress counters"""
+    BulkUploadError.objects.bulk_create(errors)
+
+    # bulk_create skips save(), so roll the items into the business stats here
+    BusinessDailyStats.record_items(upload.bulk_order.business_id, items)
+    BulkOrder.objects.filter(pk=upload.bulk_order_id).update(
+        total_items=F('total_items') + len(items),
+        estimated_cost=F('estimated_cost') + sum((item.estimated_cost for item in items), Decimal(0)),
+    )
+    BulkUpload.objects.filter(pk=upload.pk).update(
+        rows_processed=F('rows_processed') + len(chunk),
+        rows_created=F('rows_created') + len(items),
+        rows_failed=F('rows_failed') + len(errors),
+        updated_at=timezone.now(),
+    )
+
+
+def _create_items(upload, items, errors, sources):
+    """Insert a chunk in one statement, falling back to row by row to isolate rows the database rejects"""
+    try:
+        with transaction.atomic():
+            return BulkDeliveryItem.objects.bulk_create(items)
+    except DatabaseError:
+        pass
+
+    created = []
+    for item in items:
+        try:
+            with transaction.atomic():
+                BulkDeliveryItem.objects.bulk_create([item])
+            created.append(item)
+        except DatabaseError as e:
+            row_number, row = sources[id(item)]
+            errors.append(_row_error(upload, row_number, row, f'Rejected by database: {e}'))
+    return created
+
+
+def _row_error(upload, row_number, row, message):
+    return BulkUploadError(
+        upload=upload,
+        row_number=row_number,
+        message=message[:255],
+        row={key: value for key, value in row.items() if key is not None},
+    )
+
+
+def error_report(upload):
+    """Header and rows for the per-row error report: row number, error, then the original columns"""
+    errors = upload.errors.order_by('row_number')
+    first = errors.first()
+    columns = list(first.row) if first else []
+    rows = (
+        [error.row_number, error.message] + [error.row.get(column, '') for column in columns]
+        for error in errors.iterator(chunk_size=2000)
+    )
+    return ['row_number', 'error'] + columns, rows
@@ -0,0 +1,151 @@
+"""
+Chat helpers for Yanzi Parcels
+Access rules, live-socket presence and message delivery shared by the chat
+HTTP views and the chat WebSocket consumer
+"""
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import Job, Message
+
+
+# Jobs whose chat is open
+CHAT_STATUSES = [Job.PICKING_STATUS, Job.DELIVERING_STATUS]
+
+# Presence entries expire if a socket dies without disconnecting cleanly
+PRESENCE_TIMEOUT = 60 * 60
+
+
+def chat_group(job_id):
+    """Channel layer group holding every live socket for a job's chat"""
+    return f"chat_{job_id}"
+
+
+def get_chat_job(user, job_id):
+    """Get job if user has access (customer or assigned courier)"""
+    try:
+        job = Job.objects.get(id=job_id)
+        
+        # Check if user is the customer
+        if hasattr(user, 'customer') and job.customer_id == user.customer.id:
+            return job
+        
+        # Check if user is the assigned courier
+        if hasattr(user, 'courier') and job.courier_id == user.courier.id:
+            return job
+        
+        return None
+    except Job.DoesNotExist:
+        return None
+
+
+def get_sender_type(user):
+    """Determine if user is customer or courier"""
+    if hasattr(user, 'customer'):
+        return Message.SENDER_CUSTOMER
+    elif hasattr(user, 'courier'):
+        return Message.SENDER_COURIER
+    return None
+
+
+# =============================================================================
+# Presence
+# =============================================================================
+def _presence_key(job_id, user_id):
+    return f"chat_online:{job_id}:{user_id}"
+
+
+def mark_online(job_id, user_id):
+    """Count one more live chat socket for the user on this job"""
+    key = _presence_key(job_id, user_id)
+    if not cache.add(key, 1, PRESENCE_TIMEOUT):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, PRESENCE_TIMEOUT)
+
+
+def mark_offline(job_id, user_id):
+    """Count one fewer live chat socket for the user on this job"""
+    key = _presence_key(job_id, user_id)
+    try:
+        if cache.decr(key) <= 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def is_online(job_id, user_id):
+    return bool(cache.get(_presence_key(job_id, user_id)))
+
+
+# =============================================================================
+# Delivery
+# =============================================================================
+def serialize_message(message):
+    """Message as plain JSON types, safe to pass through the channel layer"""
+    from core.serializers import MessageSerializer
+    return json.loads(json.dumps(MessageSerializer(message).data, cls=JSONEncoder))
+
+
+def broadcast(job_id, event):
+    """Send an event to every live socket on the job's chat"""
+    try:
+        async_to_sync(get_channel_layer().group_send)(chat_group(job_id), event)
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+
+
+def post_message(job, user, sender_type, content, is_quick_message=False):
+    """Save a message, push it to live sockets and notify an offline recipient"""
+    message = Message.objects.create(
+        job=job,
+        sender_type=sender_type,
+        sender_user=user,
+        content=content,
+        is_quick_message=is_quick_message,
+    )
+    broadcast(job.id, {'type': 'chat.message', 'message': serialize_message(message)})
+    send_chat_notification(job, message, sender_type)
+    return message
+
+
+def send_chat_notification(job, message, sender_type):
+    """Send push notification to the other party, unless they have the chat open"""
+    try:
+        from firebase_admin import messaging
+        
+        # Determine recipient
+        if sender_type == Message.SENDER_CUSTOMER:
+            # Notify courier
+            if job.courier and job.courier.fcm_token:
+                if is_online(job.id, job.courier.user_id):
+                    return
+                token = job.courier.fcm_token
+                title = f"Message from {job.customer.user.get_full_name()}"
+            else:
+                return
+        else:
+            # Notify customer - we'd need FCM token for customer too
+            # For now, skip customer notification
+            return
+
+        notification = messaging.Message(
+            notification=messaging.Notification(
+                title=title,
+                body=message.content[:100],
+            ),
+            data={
+                'type': 'chat_message',
+                'job_id': str(job.id),
+                'message_id': str(message.id),
+            },
+            token=token,
+        )
+        messaging.send(notification)
+    except Exception as e:
+        print(f"Failed to send chat notification: {e}")
@@ -0,0 +1,167 @@
+"""
+Short code allocation for Yanzi Parcels
+Hands out referral, tracking, hub and pickup codes that are unique by
+construction, without checking the database for each code
+"""
+import hashlib
+import hmac
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from core.models import CodeSequence
+
+
+class CodesExhausted(RuntimeError):
+    """Raised when every code in an allocator's space has been handed out"""
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection on [0, size): a balanced Feistel network over the
+    smallest even number of bits covering size, with cycle-walking to stay
+    inside the range. Consecutive counters map to scattered, unguessable codes.
+    """
+    ROUNDS = 4
+
+    def __init__(self, size, key):
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+        self.key = key
+
+    def _round(self, i, value):
+        digest = hmac.new(self.key, f"{i}:{value}".encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for i in range(self.ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self.half_bits) | right
+
+    def __call__(self, value):
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class CodeAllocator:
+    """
+    Allocates codes of `length` characters from `alphabet`, after `prefix`.
+
+    Each process reserves a block of counter values with one UPDATE on its
+    CodeSequence row, then hands out codes from memory: every counter value is
+    issued once, and the permutation maps distinct counters to distinct codes.
+    """
+
+    def __init__(self, name, alphabet, length, prefix='', block_size=100):
+        self.name = name
+        self.alphabet = alphabet
+        self.length = length
+        self.prefix = prefix
+        self.block_size = block_size
+        self.size = len(alphabet) ** length
+        key = hmac.new(settings.SECRET_KEY.encode(), name.encode(), hashlib.sha256).digest()
+        self.permutation = FeistelPermutation(self.size, key)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._next = self._end = 0
+
+    def allocate(self, n=1, prefix=None):
+        """Return n unique codes"""
+        values = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not reuse its parent's block
+                self._pid, self._next, self._end = os.getpid(), 0, 0
+            while len(values) < n:
+                if self._next >= self._end:
+                    count = max(self.block_size, n - len(values))
+                    if self._reserves_in_caller_transaction():
+                        # A rollback would return the block to the sequence while this
+                        # process kept handing it out, so take only what is needed now
+                        count = n - len(values)
+                    self._next = self._reserve(count)
+                    self._end = self._next + count
+                take = min(n - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+        return [self.format(self.permutation(value), prefix) for value in values]
+
+    def next(self, prefix=None):
+        """Return one unique code"""
+        return self.allocate(1, prefix)[0]
+
+    def format(self, number, prefix=None):
+        base = len(self.alphabet)
+        chars = []
+        for _ in range(self.length):
+            number, digit = divmod(number, base)
+            chars.append(self.alphabet[digit])
+        return (self.prefix if prefix is None else prefix) + ''.join(reversed(chars))
+
+    def _reserves_in_caller_transaction(self):
+        # SQLite allows a single writer, so a second connection would wait on the caller's own lock
+        connection = connections[DEFAULT_DB_ALIAS]
+        return connection.in_atomic_block and connection.vendor == 'sqlite'
+
+    def _reserve(self, count):
+        """Reserve count counter values and return the first"""
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block and connection.vendor != 'sqlite':
+            # A rollback of the caller's transaction must not release a block this
+            # process keeps using, so take it on a separate, committed connection
+            end = self._reserve_on_new_connection(count)
+        else:
+            with transaction.atomic():
+                CodeSequence.objects.get_or_create(name=self.name)
+                rows = CodeSequence.objects.filter(name=self.name)
+                rows.update(next_value=F('next_value') + count)
+                end = rows.values_list('next_value', flat=True).get()
+        if end > self.size:
+            raise CodesExhausted(f"No {self.name} codes left")
+        return end - count
+
+    def _reserve_on_new_connection(self, count):
+        connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        table = connection.ops.quote_name(CodeSequence._meta.db_table)
+        try:
+            connection.set_autocommit(False)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                    [count, self.name]
+                )
+                if not cursor.rowcount:
+                    cursor.execute(
+                        f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                        [self.name, count]
+                    )
+                cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [self.name])
+                end = cursor.fetchone()[0]
+            connection.commit()
+            return end
+        finally:
+            connection.close()
+
+
+# New codes are one character longer than the codes issued before this
+# allocator, so they can never collide with them.
+
+# Referral codes: name prefix + 6 digits, e.g. JOHN042917
+REFERRAL_CODES = CodeAllocator('referral', string.digits, 6)
+
+# Public tracking links: 7 characters
+TRACKING_CODES = CodeAllocator('tracking', string.ascii_uppercase + string.digits, 7)
+
+# Hub codes: HUB + 5 digits
+HUB_CODES = CodeAllocator('hub', string.digits, 5, prefix='HUB', block_size=10)
+
+# Pickup codes: 8 digits starting with 0 (earlier codes never start with 0)
+PICKUP_CODES = CodeAllocator('pickup', string.digits, 7, prefix='0')
@@ -0,0 +1,119 @@
+"""
+Streaming exports for Yanzi Parcels
+Writes query results straight to the response as CSV or NDJSON, optionally
+gzipped, reading rows from the database in chunks so memory use stays flat
+however large the export is
+"""
+import csv
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from core import routers
+
+
+CHUNK_SIZE = 2000  # Rows fetched from the database per round trip
+BUFFER_SIZE = 64 * 1024  # Encoded bytes collected before handing a piece to the server
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that hands back what is written, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
+
+def encode_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def encode_ndjson(header, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def _buffered(pieces):
+    """Join small encoded rows into larger byte chunks"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        piece = piece.encode('utf-8')
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(request, header, rows, filename):
+    """
+    Stream `rows` (an iterable of sequences matching `header`) as a download.
+    The format comes from `?output=csv|ndjson` (default csv) and `?gzip=1`
+    compresses the file.
+    """
+    output = request.query_params.get('output', 'csv')
+    if output not in ENCODERS:
+        output = 'csv'
+    use_gzip = request.query_params.get('gzip') in ('1', 'true')
+
+    content = _buffered(ENCODERS[output](header, rows))
+    filename = f'{filename}.{output}'
+    content_type = FORMATS[output]
+    if use_gzip:
+        content = _gzipped(content)
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_queryset(request, queryset, columns, filename):
+    """
+    Stream a queryset as a download. `columns` is a list of (header, lookup)
+    pairs; rows are fetched with values_list() and iterator(), so no model
+    instances are built and only one chunk of rows is held at a time.
+    """
+    header = [name for name, _ in columns]
+    # The rows are read while the response streams, after the routing middleware
+    # has reset, so bind the query to the database this request reads from now
+    queryset = queryset.using(routers.read_alias())
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=CHUNK_SIZE)
+    return export_response(request, header, rows, filename)
+
+
+def month_bounds(month):
+    """Start and end datetimes of a 'YYYY-MM' month in the local timezone; ValueError if malformed"""
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
@@ -0,0 +1,129 @@
+"""
+Hub payouts for Yanzi Parcels
+A run totals every hub's activity over a period with grouped aggregates,
+commission and adjustment transactions from the hub ledger and COD cash
+collected at the counter, and writes one HubPayout per active hub with a
+single bulk insert. A hub is paid at most once per period: rerunning a period
+only creates the payouts that are still missing.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from core.models import HubDelivery, HubPayout, HubTransaction
+
+
+ZERO = Decimal('0.00')
+
+
+class OverlappingPayout(ValueError):
+    """Raised when a hub already has a payout covering part of the period"""
+
+
+def month_period(year, month):
+    """(first day, last day) of a calendar month"""
+    start = datetime(year, month, 1).date()
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def period_bounds(period_start, period_end):
+    """Aware datetimes covering the whole of both (inclusive) dates"""
+    return (
+        timezone.make_aware(datetime.combine(period_start, time.min)),
+        timezone.make_aware(datetime.combine(period_end + timedelta(days=1), time.min)),
+    )
+
+
+def period_totals(period_start, period_end, hubs=None):
+    """
+    Hub id -> {'commissions', 'cod', 'deductions'} for the period, leaving out
+    hubs with no activity. Adjustments that credited the hub count as negative
+    deductions. `hubs` optionally narrows it to a queryset or ids.
+    """
+    since, until = period_bounds(period_start, period_end)
+    totals = {}
+
+    entries = HubTransaction.objects.filter(created_at__gte=since, created_at__lt=until)
+    if hubs is not None:
+        entries = entries.filter(hub__in=hubs)
+    ledger = entries.values('hub_id').annotate(
+        commissions=Sum('amount', filter=Q(transaction_type=HubTransaction.TRANSACTION_COMMISSION)),
+        # Amounts are stored unsigned, so the balance movement tells debits from credits
+        deductions=Sum(
+            F('balance_before') - F('balance_after'),
+            filter=Q(transaction_type=HubTransaction.TRANSACTION_ADJUSTMENT),
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+    ).order_by()
+    for row in ledger:
+        if row['commissions'] or row['deductions']:
+            totals[row['hub_id']] = {
+                'commissions': row['commissions'] or ZERO,
+                'cod': ZERO,
+                'deductions': row['deductions'] or ZERO,
+            }
+
+    collected = HubDelivery.objects.filter(
+        is_cod=True, cod_collected=True, picked_up_at__gte=since, picked_up_at__lt=until
+    )
+    if hubs is not None:
+        collected = collected.filter(hub__in=hubs)
+    for row in collected.values('hub_id').annotate(cod=Sum('cod_amount')).order_by():
+        if row['cod']:
+            totals.setdefault(row['hub_id'], {'commissions': ZERO, 'cod': ZERO, 'deductions': ZERO})
+            totals[row['hub_id']]['cod'] = row['cod']
+    return totals
+
+
+def generate_payouts(period_start, period_end, hubs=None, recompute=False):
+    """
+    Create the HubPayouts for a period. Hubs that already have one are left
+    alone, unless `recompute` is set and it is still pending, in which case it
+    is replaced with fresh totals. Returns the number of payouts created.
+    Raises OverlappingPayout if a hub has a payout for a different period
+    that shares days with this one, since those days are already paid.
+
+    COD cash belongs to the sender and is settled separately, so it is recorded
+    for reconciliation only; deductions larger than the commissions leave a
+    negative net the hub owes.
+    """
+    period = HubPayout.objects.filter(period_start=period_start, period_end=period_end)
+    overlapping = HubPayout.objects.filter(
+        period_start__lte=period_end, period_end__gte=period_start
+    ).exclude(period_start=period_start, period_end=period_end)
+    if hubs is not None:
+        period = period.filter(hub__in=hubs)
+        overlapping = overlapping.filter(hub__in=hubs)
+    clash = overlapping.select_related('hub').order_by('period_start').first()
+    if clash is not None:
+        raise OverlappingPayout(
+            f'Hub {clash.hub.hub_code} already has a payout for {clash.period_start} to {clash.period_end}'
+        )
+
+    totals = period_totals(period_start, period_end, hubs)
+
+    with transaction.atomic():
+        if recompute:
+            period.filter(status=HubPayout.STATUS_PENDING).delete()
+        existing = set(period.values_list('hub_id', flat=True))
+
+        payouts = []
+        for hub_id, row in totals.items():
+            if hub_id in existing:
+                continue
+            payouts.append(HubPayout(
+                hub_id=hub_id,
+                period_start=period_start,
+                period_end=period_end,
+                total_commissions=row['commissions'],
+                total_cod_collected=row['cod'],
+                deductions=row['deductions'],
+                net_payout=row['commissions'] - row['deductions'],
+            ))
+        # A concurrent run may insert the same hub first; the unique constraint keeps one of them
+        HubPayout.objects.bulk_create(payouts, batch_size=1000, ignore_conflicts=True)
+        return period.count() - len(existing)
@@ -0,0 +1,184 @@
+"""
+Background image renditions for Yanzi Parcels
+Uploaded photos are stored as-is and the request returns straight away; a
+small thread pool then writes recompressed WebP and JPEG copies at a few
+sizes, without EXIF (which carries the GPS position of the phone that took
+the picture). Originals are never rewritten, since pickup and delivery photos
+are proof of handover.
+
+Each model keeps a `renditions` JSON field shaped like
+{'photo': {'source': 'job/photos/a.jpg', 'thumb': {'webp': name, 'jpeg': name}, ...}}
+and copies count only while `source` still matches the field's file.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from core.models import Courier, Job
+
+
+# Longest edge in pixels of each rendition
+SIZES = {
+    'thumb': 200,
+    'medium': 800,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+# Image fields that get renditions, per model
+IMAGE_FIELDS = {
+    Job: ('photo', 'pickup_photo', 'delivery_photo'),
+    Courier: ('profile_photo',),
+}
+
+
+def pending_fields(instance):
+    """Image fields whose current file has no renditions yet"""
+    renditions = instance.renditions or {}
+    return [
+        field for field in IMAGE_FIELDS.get(type(instance), ())
+        if getattr(instance, field) and renditions.get(field, {}).get('source') != getattr(instance, field).name
+    ]
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    # Threads do not survive a fork, so each worker process gets its own pool
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='image-renditions'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def schedule(instance, fields=None):
+    """Make renditions for the instance's new photos once the current transaction commits"""
+    fields = pending_fields(instance) if fields is None else fields
+    if not fields:
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: executor().submit(_run, model, pk, fields))
+
+
+def _run(model, pk, fields):
+    close_old_connections()
+    try:
+        process(model, pk, fields)
+    except Exception as e:
+        print(f"Error making image renditions for {model.__name__} {pk}: {e}")
+    finally:
+        close_old_connections()
+
+
+def process(model, pk, fields):
+    """Make and record renditions for `fields` of one object; returns how many fields were done"""
+    instance = model.objects.filter(pk=pk).only('pk', 'renditions', *fields).first()
+    if instance is None:
+        return 0
+
+    made = {}
+    for field in fields:
+        file = getattr(instance, field)
+        if not file:
+            continue
+        try:
+            made[field] = {'source': file.name, **render(file)}
+        except Exception as e:
+            # Recorded without copies so it is not retried; clients fall back to the original
+            print(f"Error rendering {file.name}: {e}")
+            made[field] = {'source': file.name}
+
+    with transaction.atomic():
+        current = model.objects.select_for_update().filter(pk=pk).only('renditions', *fields).first()
+        if current is None:
+            return 0
+        renditions = dict(current.renditions or {})
+        stale = []
+        for field, entry in made.items():
+            # The photo may have been replaced while this one was being rendered
+            if getattr(current, field).name != entry['source']:
+                stale.append(entry)
+                continue
+            previous = renditions.get(field)
+            if previous and previous.get('source') != entry['source']:
+                stale.append(previous)
+            renditions[field] = entry
+        model.objects.filter(pk=pk).update(renditions=renditions)
+
+    for entry in stale:
+        delete(entry)
+    return len(made)
+
+
+def render(file):
+    """Write every size and format of an image; returns {size: {format: storage name}}"""
+    base, _ = os.path.splitext(file.name)
+    file.open('rb')
+    try:
+        with Image.open(file) as image:
+            # Let the JPEG decoder scale down while decoding, far cheaper than a full-size load
+            image.draft('RGB', (max(SIZES.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+            names = {}
+            # Largest first, so each smaller size is resized from the previous one
+            for size, edge in sorted(SIZES.items(), key=lambda item: -item[1]):
+                image.thumbnail((edge, edge), Image.LANCZOS)
+                names[size] = {
+                    extension: _save(image, f'renditions/{base}_{size}.{extension}', image_format, options)
+                    for extension, (image_format, options) in FORMATS.items()
+                }
+            return names
+    finally:
+        file.close()
+
+
+def _save(image, name, image_format, options):
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        flattened = Image.new('RGB', image.size, (255, 255, 255))
+        flattened.paste(image, mask=image.getchannel('A'))
+        image = flattened
+    content = BytesIO()
+    # No exif= argument, so none of the original metadata is written
+    image.save(content, image_format, **options)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content.getvalue()))
+
+
+def delete(entry):
+    """Remove the files of a renditions entry"""
+    for size in SIZES:
+        for name in entry.get(size, {}).values():
+            default_storage.delete(name)
+
+
+def rendition_urls(instance, field):
+    """{size: {format: url}} for a photo, or None until its renditions exist"""
+    file = getattr(instance, field)
+    entry = (instance.renditions or {}).get(field)
+    if not file or not entry or entry.get('source') != file.name or not all(size in entry for size in SIZES):
+        return None
+    return {
+        size: {extension: default_storage.url(name) for extension, name in entry[size].items()}
+        for size in SIZES
+    }
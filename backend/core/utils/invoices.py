@@ -0,0 +1,119 @@
+"""
+Business invoicing for Yanzi Parcels
+Month-end billing is one pass over every account: a single query reads the
+delivered items each business has not been billed for up to the end of the
+period, VAT is applied in Python and the invoices are written with bulk
+inserts, together with one BusinessInvoiceItem per billed item so the line
+items always add up to the subtotal. A business is invoiced at most once per
+period and an item is billed at most once, so a rerun only fills gaps, and an
+item delivered into a period that was already invoiced goes on the next one.
+
+Item costs already carry the business discount (bulk_import.ItemBuilder.price
+quotes them discounted and the courier job is priced from that quote), so an
+invoice records the discount it reflects but does not take it off again.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, When
+from django.utils import timezone
+
+from core.models import BulkDeliveryItem, BusinessAccount, BusinessInvoice, BusinessInvoiceItem
+
+
+VAT_RATE = Decimal('0.16')
+CENT = Decimal('0.01')
+
+# What a delivered item is billed at: its actual cost, or the estimate if none was recorded
+BILLED_COST = Case(
+    When(actual_cost__gt=0, then=F('actual_cost')),
+    default=F('estimated_cost'),
+    output_field=DecimalField(max_digits=10, decimal_places=2),
+)
+
+
+def charges(subtotal, discount_percentage):
+    """
+    (discount, tax, total) for a subtotal of already discounted item costs.
+    The discount is what was taken off the list prices, for the record only;
+    VAT is charged on the subtotal and the total is subtotal plus VAT.
+    """
+    subtotal = Decimal(subtotal)
+    rate = Decimal(str(discount_percentage)) / 100
+    discount = (subtotal * rate / (1 - rate)).quantize(CENT, ROUND_HALF_UP) if rate < 1 else Decimal('0')
+    tax = (subtotal * VAT_RATE).quantize(CENT, ROUND_HALF_UP)
+    return discount, tax, subtotal + tax
+
+
+def invoice_number(business_id, period_start):
+    return f'INV-{period_start:%Y%m%d}-{business_id.hex[:12].upper()}'
+
+
+def unbilled_items(period_end):
+    """Delivered items not on any invoice yet, up to the end of the date, annotated with billed_cost"""
+    until = timezone.make_aware(datetime.combine(period_end + timedelta(days=1), time.min))
+    return BulkDeliveryItem.objects.filter(
+        status=BulkDeliveryItem.STATUS_DELIVERED, completed_at__lt=until, invoice_line__isnull=True
+    ).annotate(billed_cost=BILLED_COST)
+
+
+def invoice_items(invoice):
+    """The items billed on an invoice, annotated with the billed_cost frozen at generation"""
+    return BulkDeliveryItem.objects.filter(invoice_line__invoice=invoice).annotate(
+        billed_cost=F('invoice_line__billed_cost')
+    )
+
+
+def generate_invoices(period_start, period_end, businesses=None):
+    """
+    Create draft invoices for every business with unbilled deliveries up to
+    the end of the period that does not have one for it yet. `businesses`
+    optionally narrows it to a queryset or ids. Returns the number of
+    invoices created.
+    """
+    items = unbilled_items(period_end)
+    period = BusinessInvoice.objects.filter(period_start=period_start, period_end=period_end)
+    if businesses is not None:
+        items = items.filter(bulk_order__business__in=businesses)
+        period = period.filter(business__in=businesses)
+
+    today = timezone.localdate()
+    with transaction.atomic():
+        existing = set(period.values_list('business_id', flat=True))
+        # Subtotals are summed from the same rows the lines are written from, so they cannot disagree
+        invoices, lines = {}, []
+        rows = items.values_list('id', 'bulk_order__business_id', 'billed_cost').order_by()
+        for item_id, business_id, cost in rows.iterator(chunk_size=2000):
+            if business_id in existing:
+                continue
+            if business_id not in invoices:
+                invoices[business_id] = BusinessInvoice(
+                    business_id=business_id,
+                    invoice_number=invoice_number(business_id, period_start),
+                    period_start=period_start,
+                    period_end=period_end,
+                    subtotal=Decimal('0'),
+                )
+            invoices[business_id].subtotal += cost
+            lines.append((invoices[business_id].id, item_id, cost))
+
+        terms = BusinessAccount.objects.filter(pk__in=list(invoices)).values_list(
+            'pk', 'discount_percentage', 'payment_terms'
+        )
+        for business_id, discount_percentage, payment_terms in terms:
+            invoice = invoices[business_id]
+            invoice.discount_amount, invoice.tax_amount, invoice.total_amount = charges(
+                invoice.subtotal, discount_percentage
+            )
+            invoice.due_date = today + timedelta(days=payment_terms)
+
+        # A concurrent run may insert the same business first; the unique constraint keeps one of them
+        BusinessInvoice.objects.bulk_create(invoices.values(), batch_size=1000, ignore_conflicts=True)
+        ours = set(period.values_list('pk', flat=True)) & {invoice.pk for invoice in invoices.values()}
+        BusinessInvoiceItem.objects.bulk_create(
+            (BusinessInvoiceItem(invoice_id=invoice_id, item_id=item_id, billed_cost=cost)
+             for invoice_id, item_id, cost in lines if invoice_id in ours),
+            batch_size=1000,
+        )
+        return len(ours)
@@ -0,0 +1,111 @@
+"""
+Ledger engine for Yanzi Parcels
+Moves money on wallets, business credit accounts and hub earnings by appending
+an entry and adjusting the stored balance with a single conditional UPDATE
+"""
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import (
+    Wallet, WalletTransaction, BusinessCredit, BusinessCreditTransaction,
+    Hub, HubTransaction,
+)
+
+
+class InsufficientBalance(ValueError):
+    """Raised when a debit would take a balance below zero"""
+
+
+class Ledger:
+    """
+    An account model holding a running balance, plus the append-only entry
+    model recording every movement on it.
+
+    Balances are never read, modified and written back in Python. Each posting
+    is one `UPDATE ... SET balance = balance + amount WHERE balance >= -amount`,
+    so concurrent postings cannot lose updates and the row lock is held only
+    for the UPDATE and the entry INSERT.
+    """
+
+    def __init__(self, account_model, balance_field, entry_model, account_field,
+                 credit_total=None, debit_total=None, tracks_balance=True):
+        self.account_model = account_model
+        self.balance_field = balance_field
+        self.entry_model = entry_model
+        self.account_field = account_field
+        self.credit_total = credit_total  # Lifetime total of credits, if the account keeps one
+        self.debit_total = debit_total  # Lifetime total of debits, if the account keeps one
+        self.tracks_balance = tracks_balance  # Entries have balance_before/balance_after
+
+    def _coerce(self, amount):
+        """Match the amount to the balance column's type"""
+        field = self.account_model._meta.get_field(self.balance_field)
+        if isinstance(field, models.DecimalField):
+            return Decimal(str(amount))
+        return float(amount)
+
+    def post(self, account_id, amount, allow_overdraft=False, **entry_fields):
+        """
+        Add amount to the account (a negative amount debits it) and append an
+        entry recording it. The entry stores the absolute amount; pass its
+        transaction type and description as entry_fields.
+
+        Returns:
+            The saved entry
+
+        Raises:
+            InsufficientBalance: a debit larger than the balance
+            account_model.DoesNotExist: no such account
+        """
+        amount = self._coerce(amount)
+        balance = self.balance_field
+
+        changes = {balance: F(balance) + amount}
+        if amount >= 0 and self.credit_total:
+            changes[self.credit_total] = F(self.credit_total) + amount
+        if amount < 0 and self.debit_total:
+            changes[self.debit_total] = F(self.debit_total) - amount
+        # update() skips auto_now, so stamp it ourselves
+        if any(field.name == 'updated_at' for field in self.account_model._meta.fields):
+            changes['updated_at'] = timezone.now()
+
+        rows = self.account_model.objects.filter(pk=account_id)
+        with transaction.atomic():
+            guarded = rows if amount >= 0 or allow_overdraft else rows.filter(**{f'{balance}__gte': -amount})
+            if not guarded.update(**changes):
+                if not rows.exists():
+                    raise self.account_model.DoesNotExist
+                raise InsufficientBalance("Insufficient balance")
+
+            # The UPDATE holds the row lock until commit, so this is our own result
+            balance_after = rows.values_list(balance, flat=True).get()
+
+            entry = self.entry_model(**{self.account_field + '_id': account_id}, **entry_fields)
+            entry.amount = abs(amount)
+            if self.tracks_balance:
+                entry.balance_before = balance_after - amount
+                entry.balance_after = balance_after
+            entry.save()
+        return entry
+
+    def credit(self, account_id, amount, **entry_fields):
+        return self.post(account_id, abs(amount), **entry_fields)
+
+    def debit(self, account_id, amount, allow_overdraft=False, **entry_fields):
+        return self.post(account_id, -abs(amount), allow_overdraft=allow_overdraft, **entry_fields)
+
+
+WALLETS = Ledger(
+    Wallet, 'balance', WalletTransaction, 'wallet',
+    credit_total='total_earned', debit_total='total_spent', tracks_balance=False,
+)
+
+BUSINESS_CREDIT = Ledger(
+    BusinessCredit, 'balance', BusinessCreditTransaction, 'credit_account',
+    credit_total='total_purchased', debit_total='total_used',
+)
+
+HUB_EARNINGS = Ledger(Hub, 'total_earnings', HubTransaction, 'hub')
@@ -0,0 +1,164 @@
+"""
+Media file responses for Yanzi Parcels
+Media URLs handed out by the API carry an expiry and an HMAC of the file name
+and that expiry, so browsers can load them from <img> tags without a token and
+serving one needs no database lookup. Once a download has been authorized the
+bytes are normally handed to the web server (nginx X-Accel-Redirect or
+X-Sendfile) so no Python worker is held while they go out. Without one,
+FileResponse streams the file itself with conditional GET and single
+byte-range support; under gunicorn both full and ranged responses go out
+through sendfile().
+"""
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import http_date, quote_etag
+
+from core.storage import is_blob
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Blob names change whenever their content does, so clients may keep them for good
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+CACHE_CONTROL = 'private, max-age=3600'
+
+
+def signature(name, expires):
+    return salted_hmac('core.utils.media', f'{name}:{expires}', algorithm='sha256').hexdigest()
+
+
+def signed_query(name, now=None):
+    """
+    Query string granting access to `name` for MEDIA_URL_SECONDS to twice that.
+    The expiry is rounded to the window, so a file keeps the same URL (and
+    browser cache entry) for a whole window rather than a new one per response.
+    """
+    window = getattr(settings, 'MEDIA_URL_SECONDS', 3600)
+    expires = (int(now or time.time()) // window + 2) * window
+    return urlencode({'expires': expires, 'signature': signature(name, expires)})
+
+
+def has_valid_signature(name, expires, given):
+    """Whether `expires` and `given` come from signed_query() for `name` and have not run out"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    return expires > time.time() and constant_time_compare(signature(name, expires), given or '')
+
+
+class FileRange:
+    """Read-only view of the next `length` bytes of an open file"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # gunicorn's sendfile() starts at the file's current offset and stops at Content-Length
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) for a single `bytes=` range, inclusive; None to send the whole
+    file (no header, or several ranges); ValueError if it cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final `last` bytes
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def media_response(request, name):
+    """Response that sends the stored file `name` to an already authorized client"""
+    try:
+        path = default_storage.path(name)
+    except Exception:
+        raise Http404
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', '')
+
+    if mode == 'accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(name)
+    elif mode == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = file_response(request, path, content_type)
+
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if is_blob(name) else CACHE_CONTROL
+    return response
+
+
+def file_response(request, path, content_type):
+    """Stream a file with ETag/Last-Modified validation and Range support"""
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+
+    size = stat.st_size
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{size:x}')
+    last_modified = int(stat.st_mtime)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional  # 304 Not Modified or 412 Precondition Failed
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range in (etag, http_date(last_modified)):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(file, content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,240 @@
+"""
+Courier payouts for Yanzi Parcels
+A run locks and claims every unpaid transaction of the selected couriers,
+totals them per courier with one grouped query and sends the
+couriers' shares to the provider in chunks, several requests at a time.
+Each chunk is sent under a sender_batch_id derived from the batch, so the
+provider refuses to pay the same chunk twice and a batch whose chunks failed
+can simply be sent again. A chunk the provider reports as already sent was
+paid by an earlier run that never recorded it, and is marked sent.
+"""
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.models import CourierPayoutBatch, CourierPayoutItem, Transaction
+
+
+COURIER_SHARE = Decimal('0.8')
+CLAIM_BATCH_SIZE = 10000  # Transaction ids per claiming UPDATE
+
+
+class PayoutError(Exception):
+    """The provider rejected a payout request"""
+
+
+class DuplicateBatch(PayoutError):
+    """The provider already has a payout with this sender_batch_id"""
+
+
+def is_duplicate_batch(error):
+    """Whether a PayPal error response says the sender_batch_id was used before"""
+    for detail in (error or {}).get('details') or []:
+        if str(detail.get('field', '')).upper() == 'SENDER_BATCH_ID' or 'already exists' in str(detail.get('issue', '')):
+            return True
+    return False
+
+
+class PayPalPayoutClient:
+    def __init__(self):
+        from paypalrestsdk import Api
+        self.api = Api({
+            'mode': settings.PAYPAL_MODE,
+            'client_id': settings.PAYPAL_CLIENT_ID,
+            'client_secret': settings.PAYPAL_CLIENT_SECRET,
+        })
+
+    def send(self, sender_batch_id, items):
+        """Submit one payout request; returns the provider's batch id"""
+        from paypalrestsdk import Payout
+        payout = Payout({
+            'sender_batch_header': {
+                'sender_batch_id': sender_batch_id,
+                'email_subject': 'You have a payment',
+            },
+            'items': items,
+        }, api=self.api)
+        # Within PayPal's idempotency window a repeated request id is answered with the original batch
+        payout.request_id = sender_batch_id
+        if not payout.create():
+            if is_duplicate_batch(payout.error):
+                raise DuplicateBatch(payout.error)
+            raise PayoutError(payout.error)
+        return payout.batch_header.payout_batch_id
+
+    def find(self, sender_batch_id):
+        """Provider batch id of an earlier payout; the Payouts API cannot search by sender_batch_id"""
+        return None
+
+
+class FakePayoutClient:
+    """
+    Keeps payouts in memory instead of sending money, for development and
+    tests. Like PayPal, a repeated sender_batch_id is refused with
+    DuplicateBatch instead of paying again; ids in `fail` are rejected.
+    """
+
+    def __init__(self, fail=()):
+        self.batches = {}  # sender_batch_id -> (provider batch id, items)
+        self.requests = 0
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def send(self, sender_batch_id, items):
+        with self._lock:
+            self.requests += 1
+            if sender_batch_id in self.fail:
+                raise PayoutError(f'Payout {sender_batch_id} rejected')
+            if sender_batch_id in self.batches:
+                raise DuplicateBatch(f'Batch with sender_batch_id {sender_batch_id} already exists')
+            self.batches[sender_batch_id] = (f'FAKE-{len(self.batches) + 1:06d}', items)
+            return self.batches[sender_batch_id][0]
+
+    def find(self, sender_batch_id):
+        with self._lock:
+            batch = self.batches.get(sender_batch_id)
+            return batch[0] if batch else None
+
+
+_fake_client = FakePayoutClient()
+
+
+def get_client():
+    if getattr(settings, 'PAYOUT_BACKEND', 'paypal') == 'fake':
+        return _fake_client
+    return PayPalPayoutClient()
+
+
+def create_batch(courier_ids, created_by=None, chunk_size=None):
+    """
+    Claim the unpaid transactions of `courier_ids` (ids or a values_list
+    queryset) and record what each courier is owed. Returns None if there is
+    nothing to pay.
+    """
+    chunk_size = chunk_size or getattr(settings, 'PAYOUT_CHUNK_SIZE', 1000)
+    with transaction.atomic():
+        batch = CourierPayoutBatch.objects.create(
+            created_by=created_by, currency=getattr(settings, 'PAYOUT_CURRENCY', 'USD')
+        )
+        # Lock the unpaid rows first: a concurrent run waits here and then no longer sees them
+        claimable = list(Transaction.objects.select_for_update(of=('self',)).filter(
+            status=Transaction.IN_STATUS,
+            payout_batch__isnull=True,
+            job__courier_id__in=courier_ids,
+        ).exclude(job__courier__paypal_email='').values_list('id', flat=True))
+        claimed = 0
+        for start in range(0, len(claimable), CLAIM_BATCH_SIZE):
+            claimed += Transaction.objects.filter(
+                id__in=claimable[start:start + CLAIM_BATCH_SIZE], payout_batch__isnull=True
+            ).update(payout_batch=batch)
+        if not claimed:
+            batch.delete()
+            return None
+
+        totals = Transaction.objects.filter(payout_batch=batch).values(
+            'job__courier_id', 'job__courier__paypal_email'
+        ).annotate(total=Sum('amount'), count=Count('id')).order_by('job__courier_id')
+
+        items = []
+        unpaid = []
+        for row in totals:
+            amount = (Decimal(str(row['total'])) * COURIER_SHARE).quantize(Decimal('0.01'))
+            if amount <= 0:
+                unpaid.append(row['job__courier_id'])
+                continue
+            items.append(CourierPayoutItem(
+                batch=batch,
+                courier_id=row['job__courier_id'],
+                paypal_email=row['job__courier__paypal_email'],
+                amount=amount,
+                transaction_count=row['count'],
+                chunk=len(items) // chunk_size,
+            ))
+        if unpaid:
+            Transaction.objects.filter(payout_batch=batch, job__courier_id__in=unpaid).update(payout_batch=None)
+        if not items:
+            batch.delete()
+            return None
+
+        CourierPayoutItem.objects.bulk_create(items, batch_size=1000)
+        batch.total_amount = sum(item.amount for item in items)
+        batch.courier_count = len(items)
+        batch.save(update_fields=['total_amount', 'courier_count'])
+    return batch
+
+
+def send_batch(batch, client=None, workers=None):
+    """
+    Send every chunk of the batch that has not gone out yet, `workers`
+    requests at a time, and mark what was paid. Returns the batch status.
+    """
+    client = client or get_client()
+    workers = workers or getattr(settings, 'PAYOUT_WORKERS', 4)
+
+    chunks = defaultdict(list)
+    for item in batch.items.exclude(status=CourierPayoutItem.STATUS_SENT).values(
+        'id', 'chunk', 'courier_id', 'paypal_email', 'amount'
+    ):
+        chunks[item['chunk']].append(item)
+
+    def send(chunk):
+        sender_batch_id = f'{batch.id.hex}-{chunk}'
+        payload = [{
+            'recipient_type': 'EMAIL',
+            'amount': {'value': f"{item['amount']:.2f}", 'currency': batch.currency},
+            'receiver': item['paypal_email'],
+            'note': 'Thank you',
+            'sender_item_id': str(item['courier_id']),
+        } for item in chunks[chunk]]
+        try:
+            return chunk, client.send(sender_batch_id, payload), ''
+        except DuplicateBatch:
+            # Paid by an earlier run that failed before recording it. Where the provider's id
+            # cannot be looked up, the sender_batch_id is what identifies the payout there
+            try:
+                provider_batch_id = client.find(sender_batch_id)
+            except Exception:
+                provider_batch_id = None
+            return chunk, provider_batch_id or sender_batch_id, ''
+        except Exception as e:
+            return chunk, None, str(e) or e.__class__.__name__
+
+    # Threads only talk to the provider; the database is updated from this thread
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(send, sorted(chunks)))
+    else:
+        results = []
+
+    for chunk, provider_batch_id, error in results:
+        item_ids = [item['id'] for item in chunks[chunk]]
+        with transaction.atomic():
+            if provider_batch_id:
+                CourierPayoutItem.objects.filter(id__in=item_ids).update(
+                    status=CourierPayoutItem.STATUS_SENT, provider_batch_id=provider_batch_id, error=''
+                )
+                Transaction.objects.filter(
+                    payout_batch=batch, job__courier_id__in=[item['courier_id'] for item in chunks[chunk]]
+                ).update(status=Transaction.OUT_STATUS)
+            else:
+                CourierPayoutItem.objects.filter(id__in=item_ids).update(
+                    status=CourierPayoutItem.STATUS_FAILED, error=error
+                )
+
+    statuses = dict(batch.items.values_list('status').annotate(count=Count('id')))
+    sent = statuses.get(CourierPayoutItem.STATUS_SENT, 0)
+    if sent == sum(statuses.values()):
+        batch.status = CourierPayoutBatch.STATUS_COMPLETED
+        batch.completed_at = timezone.now()
+    elif sent:
+        batch.status = CourierPayoutBatch.STATUS_PARTIAL
+    else:
+        batch.status = CourierPayoutBatch.STATUS_FAILED
+    batch.save(update_fields=['status', 'completed_at'])
+    return batch.status
@@ -0,0 +1,188 @@
+"""
+Tier delivery quotas for business accounts
+Monthly usage lives in a cache counter so a quota check is a single cache
+read. Increments are also collected per process and added to
+BusinessMonthlyUsage every few seconds by a background thread, which is what
+the counter is reloaded from when the cache loses it. The thread is only used
+once CoreConfig.ready() starts the counter (with USAGE_FLUSH_ASYNC); until
+then increments are saved as they are made.
+
+The counters are only shared between workers when the cache is (Redis, via
+REDIS_URL). With the default in-memory cache every process counts on its own,
+so a business can go over its quota by up to one limit per worker process.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.models import BusinessAccount, BusinessMonthlyUsage
+
+
+TIER_LIMITS = {
+    BusinessAccount.TIER_STARTER: 50,
+    BusinessAccount.TIER_GROWTH: 200,
+    BusinessAccount.TIER_ENTERPRISE: None,  # Unlimited
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when a business has no deliveries left this month"""
+
+    def __init__(self, usage):
+        super().__init__('Monthly delivery quota reached')
+        self.usage = usage
+
+
+def current_month():
+    return timezone.localdate().replace(day=1)
+
+
+class UsageCounter:
+    """Cache-backed monthly delivery counters with periodic persistence"""
+
+    def __init__(self, flush_seconds, cache_seconds):
+        self.flush_seconds = flush_seconds
+        self.cache_seconds = cache_seconds
+        self.pending = Counter()  # (business_id, month) -> deliveries not yet persisted
+        self._lock = threading.Lock()
+        self._pid = None
+        self.background = False
+
+    def start(self):
+        """Save increments from a background thread from now on, and what is left at exit"""
+        self.background = True
+        atexit.register(self.flush)
+
+    def _key(self, business_id, month):
+        return f'business_usage:{business_id}:{month:%Y-%m}'
+
+    def get(self, business_id, month):
+        key = self._key(business_id, month)
+        value = cache.get(key)
+        if value is None:
+            persisted = BusinessMonthlyUsage.objects.filter(
+                business_id=business_id, month=month
+            ).values_list('deliveries', flat=True).first() or 0
+            # add() keeps a value another request loaded (and incremented) meanwhile
+            cache.add(key, persisted + self.pending[(business_id, month)], self.cache_seconds)
+            value = cache.get(key, persisted)
+        return value
+
+    def add(self, business_id, month, count):
+        """Add to the counter and return the new total"""
+        key = self._key(business_id, month)
+        self.get(business_id, month)
+        try:
+            total = cache.incr(key, count)
+        except ValueError:
+            # Expired between the read and the increment
+            cache.add(key, self.get(business_id, month) + count, self.cache_seconds)
+            total = cache.get(key)
+
+        if self.background and self._pid != os.getpid():
+            self._start()
+        with self._lock:
+            self.pending[(business_id, month)] += count
+        if not self.background:
+            self.flush()
+        return total
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.pending = Counter()  # A forked child must not persist its parent's deltas again
+            threading.Thread(target=self._run, name='usage-flusher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Persist pending increments; returns the number of counters written"""
+        with self._lock:
+            pending, self.pending = self.pending, Counter()
+        pending = {key: count for key, count in pending.items() if count}
+        if not pending:
+            return 0
+
+        try:
+            for (business_id, month), count in pending.items():
+                BusinessMonthlyUsage.record(business_id, month, count)
+        except Exception as e:
+            print(f"Error saving business usage: {e}")
+            with self._lock:
+                self.pending.update(pending)
+            return 0
+        return len(pending)
+
+
+counter = UsageCounter(
+    flush_seconds=getattr(settings, 'USAGE_FLUSH_SECONDS', 10),
+    cache_seconds=getattr(settings, 'USAGE_CACHE_SECONDS', 300),
+)
+
+
+def usage(business):
+    """This month's usage for the business, in the shape returned by the usage endpoint"""
+    month = current_month()
+    limit = TIER_LIMITS.get(business.tier)
+    used = counter.get(business.id, month)
+    next_month = month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+    return {
+        'tier': business.tier,
+        'tier_display': business.get_tier_display(),
+        'month': month.strftime('%Y-%m'),
+        'limit': limit,
+        'used': used,
+        'remaining': None if limit is None else max(limit - used, 0),
+        'resets_on': next_month,
+    }
+
+
+def check(business):
+    """Raise QuotaExceeded if the business has no deliveries left this month"""
+    limit = TIER_LIMITS.get(business.tier)
+    if limit is not None and counter.get(business.id, current_month()) >= limit:
+        raise QuotaExceeded(usage(business))
+
+
+def consume(business, count=1, partial=False):
+    """
+    Count deliveries against the quota and return how many were allowed.
+    Without `partial`, either all are allowed or QuotaExceeded is raised;
+    with it, as many as fit are taken.
+    """
+    month = current_month()
+    limit = TIER_LIMITS.get(business.tier)
+    total = counter.add(business.id, month, count)
+    if limit is None or total <= limit:
+        return count
+
+    # Increment first and give back the excess, so concurrent requests cannot both squeeze in
+    granted = max(count - (total - limit), 0)
+    if not partial:
+        granted = 0
+    counter.add(business.id, month, granted - count)
+    if not granted:
+        raise QuotaExceeded(usage(business))
+    return granted
+
+
+def release(business, count):
+    """Return deliveries that were consumed but never created"""
+    if count:
+        counter.add(business.id, current_month(), -count)
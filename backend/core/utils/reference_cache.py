@@ -0,0 +1,104 @@
+"""
+Response cache for reference-data endpoints
+Payloads are cached under a data version that signals bump whenever the
+underlying models change, so entries never need to be deleted one by one.
+Each process also keeps the last payload it served per version, so a warm
+request costs one cache read and no queries. Responses carry an ETag and
+Cache-Control so app clients can revalidate with If-None-Match and get a 304.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# Last payload served per (name, variant): (version, etag, data)
+_local = {}
+
+
+def _version_key(name):
+    return f'reference_version:{name}'
+
+
+def version(name):
+    """Current data version of `name`"""
+    key = _version_key(name)
+    value = cache.get(key)
+    if value is None:
+        # Start from the clock so a version dropped from the cache is never handed out again.
+        # The version expires too, which bounds staleness when the cache is per process.
+        cache.add(key, time.time_ns(), getattr(settings, 'REFERENCE_CACHE_SECONDS', 3600))
+        value = cache.get(key)
+    return value
+
+
+def bump(name):
+    """Invalidate every cached payload of `name` once the current transaction commits"""
+    def _bump():
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            pass  # Not cached, so the next read starts a fresh version anyway
+    transaction.on_commit(_bump)
+
+
+def _etag(data):
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return quote_etag(hashlib.md5(content.encode()).hexdigest())
+
+
+def _not_modified(request, etag):
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in etags or etag in [value.removeprefix('W/') for value in etags]
+
+
+def cached_reference(name, vary=None, static=False, private=False):
+    """
+    Cache the payload returned by an APIView get().
+
+    `vary(request)` returns a string for endpoints whose payload depends on
+    the caller. `static` payloads are built from code rather than the
+    database; they are kept per process only and never go stale. `private`
+    stops shared HTTP caches storing the response.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            variant = vary(request) if vary else ''
+            current = 0 if static else version(name)
+            entry = _local.get((name, variant))
+            if entry is None or entry[0] != current:
+                key = f'reference:{name}:{current}:{variant}'
+                entry = None if static else cache.get(key)
+                if entry is None:
+                    response = get(view, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    entry = (current, _etag(response.data), response.data)
+                    if not static:
+                        cache.set(key, entry, getattr(settings, 'REFERENCE_CACHE_SECONDS', 3600))
+                _local[(name, variant)] = entry
+
+            _, etag, data = entry
+            if _not_modified(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data)
+            response['ETag'] = etag
+            patch_cache_control(
+                response,
+                max_age=getattr(settings, 'REFERENCE_MAX_AGE', 300),
+                **{'private' if private else 'public': True},
+            )
+            return response
+        return wrapper
+    return decorator
@@ -15,6 +15,8 @@ import {
   Smile
 } from 'lucide-react'
 import { chatAPI } from '../services/api'
+import { chatSocketUrl } from '../services/websocket'
+import { useAuthStore } from '../stores/authStore'
 
 export default function ChatBox({ 
   jobId, 
@@ -34,17 +36,56 @@ export default function ChatBox({
   const [calling, setCalling] = useState(false)
   const messagesEndRef = useRef(null)
   const inputRef = useRef(null)
+  const cursorRef = useRef(null)
+  const socketRef = useRef(null)
 
   // Load initial data
   useEffect(() => {
+    cursorRef.current = null
     loadChatData()
     loadQuickMessages()
+    const socket = openChatSocket()
     
-    // Poll for new messages every 5 seconds
-    const interval = setInterval(loadMessages, 5000)
-    return () => clearInterval(interval)
+    // Poll for new messages every 5 seconds while the live socket is down
+    const interval = setInterval(() => {
+      if (socketRef.current?.readyState !== WebSocket.OPEN) loadMessages()
+    }, 5000)
+    return () => {
+      clearInterval(interval)
+      socket.close()
+    }
   }, [jobId])
 
+  const openChatSocket = () => {
+    const socket = new WebSocket(chatSocketUrl(jobId, useAuthStore.getState().accessToken))
+    const ownType = isCustomer ? 'customer' : 'courier'
+
+    socket.onmessage = (event) => {
+      const data = JSON.parse(event.data)
+      if (data.type === 'message') {
+        appendMessages([data.message])
+        cursorRef.current = data.message.id
+        if (data.message.sender_type !== ownType) {
+          socket.send(JSON.stringify({ type: 'read', message_ids: [data.message.id] }))
+        }
+      } else if (data.type === 'read') {
+        const read = new Set(data.message_ids)
+        setMessages(prev => prev.map(m => read.has(m.id) ? { ...m, is_read: true } : m))
+      }
+    }
+
+    socketRef.current = socket
+    return socket
+  }
+
+  // Messages we sent are already in the list
+  const appendMessages = (newMessages) => {
+    setMessages(prev => {
+      const seen = new Set(prev.map(m => m.id))
+      return [...prev, ...newMessages.filter(m => !seen.has(m.id))]
+    })
+  }
+
   // Scroll to bottom when messages change
   useEffect(() => {
     scrollToBottom()
@@ -57,11 +98,12 @@ export default function ChatBox({
   const loadChatData = async () => {
     try {
       const [messagesRes, infoRes] = await Promise.all([
-        chatAPI.getMessages(jobId),
+        chatAPI.syncMessages(jobId),
         chatAPI.getChatInfo(jobId)
       ])
       setMessages(messagesRes.data.messages || [])
       setCanChat(messagesRes.data.can_chat)
+      cursorRef.current = messagesRes.data.cursor
       setChatInfo(infoRes.data)
     } catch (error) {
       console.error('Failed to load chat:', error)
@@ -72,8 +114,10 @@ export default function ChatBox({
 
   const loadMessages = async () => {
     try {
-      const response = await chatAPI.getMessages(jobId)
-      setMessages(response.data.messages || [])
+      const response = await chatAPI.syncMessages(jobId, cursorRef.current)
+      const newMessages = response.data.messages || []
+      if (newMessages.length) appendMessages(newMessages)
+      cursorRef.current = response.data.cursor
       setCanChat(response.data.can_chat)
     } catch (error) {
       // Silent fail for polling
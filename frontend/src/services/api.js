@@ -181,6 +181,9 @@ export const chatAPI = {
   // Get messages for a job
   getMessages: (jobId) => api.get(`/chat/${jobId}/messages/`),
   
+  // Get only messages newer than the cursor, plus the unread count
+  syncMessages: (jobId, after) => api.get(`/chat/${jobId}/sync/`, { params: after ? { after } : {} }),
+  
   // Send a message
   sendMessage: (jobId, content, isQuickMessage = false) => 
     api.post(`/chat/${jobId}/messages/`, { content, is_quick_message: isQuickMessage }),
@@ -191,6 +194,9 @@ export const chatAPI = {
   // Get unread message count
   getUnreadCount: (jobId) => api.get(`/chat/${jobId}/unread/`),
   
+  // Get unread counts for all active chats in one call
+  getAllUnreadCounts: () => api.get('/chat/unread/'),
+  
   // Mark all messages as read
   markAsRead: (jobId) => api.post(`/chat/${jobId}/read/`),
   
@@ -90,5 +90,14 @@ class WebSocketService {
   }
 }
 
+// URL for a job's live chat socket, authenticated with the JWT access token
+export const chatSocketUrl = (jobId, token) => {
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+  const host = window.location.host.includes('localhost') 
+    ? 'localhost:8000' 
+    : window.location.host
+  return `${protocol}//${host}/ws/chat/${jobId}/?token=${encodeURIComponent(token)}`
+}
+
 export const wsService = new WebSocketService()
 export default wsService